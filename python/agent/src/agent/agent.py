@@ -2,12 +2,12 @@
 Main agent loop
 Tool-calling agent with LLM integration
 """
-import requests
 import json
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional
 from .config import config
 from .tool_manager import tool_manager
 from .mcp_client import mcp_client
+from mcp_cheatsheet import Deadline, LLMError
 
 
 class CheatSheetAgent:
@@ -34,36 +34,23 @@ class CheatSheetAgent:
         Returns:
             LLM response content
         """
-        headers = {
-            "Authorization": f"Bearer {self.config.api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "model": self.config.llm.model,
-            "messages": messages,
-            "temperature": temperature or self.config.llm.temperature,
-            "max_tokens": self.config.llm.max_tokens
-        }
-        
-        response = requests.post(
-            self.config.llm.openrouter_url, 
-            headers=headers, 
-            json=payload
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            return result.get('choices', [{}])[0].get('message', {}).get('content', '')
-        else:
-            raise Exception(f"LLM API call failed: {response.status_code} - {response.text}")
+        # Model, max_tokens and default temperature come from the 'agent' route
+        payload = {"messages": messages}
+        if temperature:
+            payload["temperature"] = temperature
+        
+        try:
+            return self.mcp.llm.complete(payload, tool='agent')
+        except LLMError as e:
+            raise Exception(f"LLM API call failed: {e.status_code} - {e.body}") from e
     
-    def generate_quizzes(self, num_quizzes: int = 10) -> List[dict]:
+    def generate_quizzes(self, num_quizzes: int = 10, deadline: Optional[Deadline] = None) -> List[dict]:
         """
         Generate quizzes based on current knowledge state
         
         Args:
             num_quizzes: Number of quizzes to generate
+            deadline: Request deadline
         
         Returns:
             List of quiz questions
@@ -82,17 +69,44 @@ class CheatSheetAgent:
         print(f"[AGENT] Generating quizzes for concepts...")
         quizzes = self.tool_manager.generate_quiz_for_concepts(
             concept_refs, 
-            max_count=num_quizzes
+            max_count=num_quizzes, 
+            deadline=deadline
         )
         
         print(f"[AGENT] Successfully generated {len(quizzes)} quizzes")
         return quizzes
     
+    def stream_quizzes(self, num_quizzes: int = 10, deadline: Optional[Deadline] = None) -> Iterator[dict]:
+        """
+        Generate quizzes, yielding progress events as each one is ready
+        
+        Args:
+            num_quizzes: Number of quizzes to generate
+            deadline: Request deadline
+        
+        Yields:
+            Events from ToolManager.iter_quizzes_for_concepts, or a single
+            {'event': 'error', ...} if there is nothing to quiz
+        """
+        concept_refs = self.mcp.database_search()
+        print(f"[AGENT] Found {len(concept_refs)} concept references")
+        
+        if not concept_refs:
+            yield {'event': 'error', 'error': 'No concepts found'}
+            return
+        
+        yield from self.tool_manager.iter_quizzes_for_concepts(
+            concept_refs, max_count=num_quizzes, deadline=deadline
+        )
+    
     def evaluate_quiz_answer(
         self, 
         user_answer: str, 
         correct_answer: any, 
-        concept_id: str
+        concept_id: str, 
+        is_correct: Optional[bool] = None, 
+        concept: Optional[dict] = None, 
+        deadline: Optional[Deadline] = None
     ) -> dict:
         """
         Evaluate a quiz answer and determine next action
@@ -101,6 +115,9 @@ class CheatSheetAgent:
             user_answer: User's submitted answer
             correct_answer: Expected correct answer
             concept_id: Concept reference
+            is_correct: Grade of a choice question graded client-side
+            concept: Concept dict with title and content
+            deadline: Request deadline
         
         Returns:
             Evaluation result with next decision
@@ -108,7 +125,10 @@ class CheatSheetAgent:
         return self.tool_manager.evaluate_and_update(
             user_answer, 
             correct_answer, 
-            concept_id
+            concept_id, 
+            is_correct=is_correct, 
+            concept=concept, 
+            deadline=deadline
         )
     
     def get_explanation(self, concept_id: str) -> dict:
@@ -123,6 +143,20 @@ class CheatSheetAgent:
         """
         return self.mcp.generate_explaination(concept_id)
     
+    def stream_explanation(self, concept_id: str, deadline: Optional[Deadline] = None) -> Iterator[str]:
+        """
+        Stream an explanation for a concept as the LLM writes it
+        
+        Args:
+            concept_id: Concept reference
+            deadline: Request deadline
+        
+        Yields:
+            Explanation text deltas
+        """
+        with self.mcp.deadline(deadline):
+            yield from self.mcp.stream_explaination(concept_id)
+    
     def initialize_learning_session(self) -> dict:
         """
         Initialize a new learning session
@@ -153,36 +187,9 @@ class CheatSheetAgent:
         Returns:
             Processing result
         """
-        from datetime import datetime
-        from mcp_cheatsheet.models import Concept
-        
-        added_count = 0
-        skipped_count = 0
-        timestamp = datetime.now().isoformat() + 'Z'
-        
-        for concept_data in concepts:
-            # Check for duplicates
-            if self.mcp.check_duplicate(course_name, concept_data['title']):
-                skipped_count += 1
-                continue
-            
-            # Generate ID
-            concept_id = self.mcp.generate_concept_id(course_name, timestamp)
-            
-            # Create concept
-            concept = Concept(
-                concept_id=concept_id,
-                title=concept_data['title'],
-                content=[concept_data['content']],
-                timestamp=timestamp,
-                freshness=0.0
-            )
-            
-            # Add to database
-            if self.mcp.add_concept(course_name, concept):
-                added_count += 1
-            else:
-                skipped_count += 1
+        results = self.mcp.add_concepts(course_name, concepts)
+        added_count = sum(1 for r in results if r['status'] == 'added')
+        skipped_count = len(results) - added_count
         
         # Update knowledge distribution
         self.mcp.distribute_data()
@@ -190,7 +197,8 @@ class CheatSheetAgent:
         return {
             'added_count': added_count,
             'skipped_count': skipped_count,
-            'course_name': course_name
+            'course_name': course_name,
+            'results': results
         }
     
     def get_next_quiz_recommendation(self) -> Optional[dict]:
@@ -3,20 +3,91 @@ Configuration for CheatSheet Agent
 LLM & rate limit config
 """
 import os
-from dataclasses import dataclass
+import sys
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Optional
 from dotenv import load_dotenv
 
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..', 'mcp_cheatsheet', 'src'))
+
+from mcp_cheatsheet.model_router import DEFAULT_MODEL, DEFAULT_ROUTES
+
 load_dotenv()
 
 
+@dataclass
+class ModelRoute:
+    """Model and request options for one LLM tool"""
+    model: Optional[str] = None  # None: LLMConfig.model
+    max_tokens: Optional[int] = None  # None: provider default
+    temperature: Optional[float] = None  # None: provider default
+    prompt_price: Optional[float] = None  # USD per 1M prompt tokens, for cost stats OpenRouter doesn't report
+    completion_price: Optional[float] = None  # USD per 1M completion tokens
+    
+    def to_dict(self) -> dict:
+        return {k: v for k, v in asdict(self).items() if v is not None}
+
+
+def routes_from_env() -> Dict[str, ModelRoute]:
+    """
+    Route overrides from CHEATSHEET_MODEL_<TOOL>, CHEATSHEET_MAX_TOKENS_<TOOL> and
+    CHEATSHEET_TEMPERATURE_<TOOL> (e.g. CHEATSHEET_MODEL_INSTANT_FEEDBACK) for the
+    tools in mcp_cheatsheet.model_router.DEFAULT_ROUTES
+    """
+    routes = {}
+    for tool in DEFAULT_ROUTES:
+        suffix = tool.upper()
+        max_tokens = os.getenv(f'CHEATSHEET_MAX_TOKENS_{suffix}')
+        temperature = os.getenv(f'CHEATSHEET_TEMPERATURE_{suffix}')
+        route = ModelRoute(
+            model=os.getenv(f'CHEATSHEET_MODEL_{suffix}') or None,
+            max_tokens=int(max_tokens) if max_tokens else None,
+            temperature=float(temperature) if temperature else None
+        )
+        if route.to_dict():
+            routes[tool] = route
+    return routes
+
+
 @dataclass
 class LLMConfig:
     """LLM configuration"""
     api_key: str
-    model: str = "openai/gpt-4o"
-    temperature: float = 0.7
-    max_tokens: int = 4000
+    model: str = DEFAULT_MODEL  # model of routes that don't name one
+    temperature: float = DEFAULT_ROUTES['agent']['temperature']  # agent loop ('agent' route)
+    max_tokens: int = DEFAULT_ROUTES['agent']['max_tokens']  # agent loop ('agent' route)
+    routes: Dict[str, ModelRoute] = field(default_factory=dict)  # per-tool overrides of DEFAULT_ROUTES
     openrouter_url: str = "https://openrouter.ai/api/v1/chat/completions"
+    prompt_token_budget: int = 6000  # token budget for getSystemPrompt payloads
+    pool_size: int = 10  # keep-alive connections shared by all LLM calls
+    quiz_batch_size: int = 10  # concepts per quiz generation call
+    cache_enabled: bool = True  # answer identical requests from the response cache
+    cache_size: int = 512  # in-memory cached responses
+    cache_disk: bool = False  # also persist cached responses under data/llm_cache
+    combined_assessment: bool = True  # grade, give feedback and log progress in one LLM call
+    request_timeout: float = 20.0  # seconds to answer an evaluation, explanation or next-quiz request
+    generation_timeout: float = 90.0  # seconds to answer a quiz generation or PDF upload request
+    call_timeout: float = 60.0  # read timeout of an LLM call (also bounds background calls)
+    connect_timeout: float = 5.0  # connect timeout of an LLM call
+    hedge_percentile: float = 95.0  # resend a call slower than this percentile of recent latency (0 = off)
+    breaker_failures: int = 5  # failed calls within breaker_window that trip the circuit breaker (0 = off)
+    breaker_window: float = 30.0  # seconds failures are counted over
+    breaker_cooldown: float = 30.0  # seconds LLM calls are skipped once the breaker trips
+    quiz_engine: str = "llm"  # 'llm' (template questions as fallback) or 'template' (offline first)
+    quiz_templates: bool = True  # fall back to template questions when the LLM fails
+    
+    def route_table(self) -> Dict[str, dict]:
+        """
+        Route options for ModelRouter, merged over DEFAULT_ROUTES
+        
+        temperature and max_tokens configure the 'agent' route; entries in
+        routes override them.
+        """
+        table = {'agent': {'temperature': self.temperature, 'max_tokens': self.max_tokens}}
+        for tool, route in self.routes.items():
+            table[tool] = {**table.get(tool, {}), **route.to_dict()}
+        return table
 
 
 @dataclass
@@ -24,6 +95,29 @@ class RateLimitConfig:
     """Rate limiting configuration"""
     max_requests_per_minute: int = 20
     max_requests_per_hour: int = 500
+    max_concurrent_requests: int = 4  # LLM calls kept in flight by batch operations
+    max_retries: int = 3  # retries of a throttled (429/5xx) request, with backoff
+
+
+@dataclass
+class StorageConfig:
+    """Storage configuration"""
+    backend: str = "json"  # 'json' or 'sqlite'
+    cache_enabled: bool = True
+    progress_journal: bool = True  # append-only cur_progress journal (json backend)
+    sqlite_path: Optional[str] = None  # defaults to <data_dir>/cheatsheet.db
+    quiz_bank: bool = True  # serve stored quiz variants from data/quiz_bank.json
+    quiz_bank_variants: int = 3  # unseen variants kept per concept and quiz type
+    log_write_behind: bool = True  # generate progress logs in the background (data/log_jobs.json)
+    log_workers: int = 2  # log generation threads
+
+
+@dataclass
+class GraderConfig:
+    """Local short-answer grading configuration"""
+    enabled: bool = True  # grade clear-cut short answers without the LLM
+    accept_threshold: float = 0.8  # local score (0-1) at or above which an answer is correct
+    reject_threshold: float = 0.15  # local score at or below which an answer is incorrect
 
 
 @dataclass
@@ -51,10 +145,57 @@ class Config:
         )
         
         # LLM configuration
-        self.llm = LLMConfig(api_key=self.api_key)
+        self.llm = LLMConfig(
+            api_key=self.api_key,
+            model=os.getenv('CHEATSHEET_MODEL', DEFAULT_MODEL),
+            routes=routes_from_env(),
+            pool_size=int(os.getenv('CHEATSHEET_LLM_POOL_SIZE', '10')),
+            quiz_batch_size=int(os.getenv('CHEATSHEET_QUIZ_BATCH_SIZE', '10')),
+            cache_enabled=os.getenv('CHEATSHEET_LLM_CACHE', '1') != '0',
+            cache_size=int(os.getenv('CHEATSHEET_LLM_CACHE_SIZE', '512')),
+            cache_disk=os.getenv('CHEATSHEET_LLM_CACHE_DISK', '0') != '0',
+            combined_assessment=os.getenv('CHEATSHEET_COMBINED_ASSESSMENT', '1') != '0',
+            request_timeout=float(os.getenv('CHEATSHEET_REQUEST_TIMEOUT', '20')),
+            generation_timeout=float(os.getenv('CHEATSHEET_GENERATION_TIMEOUT', '90')),
+            call_timeout=float(os.getenv('CHEATSHEET_LLM_TIMEOUT', '60')),
+            connect_timeout=float(os.getenv('CHEATSHEET_LLM_CONNECT_TIMEOUT', '5')),
+            hedge_percentile=float(os.getenv('CHEATSHEET_HEDGE_PERCENTILE', '95')),
+            breaker_failures=int(os.getenv('CHEATSHEET_BREAKER_FAILURES', '5')),
+            breaker_window=float(os.getenv('CHEATSHEET_BREAKER_WINDOW', '30')),
+            breaker_cooldown=float(os.getenv('CHEATSHEET_BREAKER_COOLDOWN', '30')),
+            quiz_engine=os.getenv('CHEATSHEET_QUIZ_ENGINE', 'llm'),
+            quiz_templates=os.getenv('CHEATSHEET_QUIZ_TEMPLATES', '1') != '0'
+        )
+        if os.getenv('CHEATSHEET_TEMPERATURE'):
+            self.llm.temperature = float(os.getenv('CHEATSHEET_TEMPERATURE'))
+        if os.getenv('CHEATSHEET_MAX_TOKENS'):
+            self.llm.max_tokens = int(os.getenv('CHEATSHEET_MAX_TOKENS'))
         
         # Rate limiting
-        self.rate_limit = RateLimitConfig()
+        self.rate_limit = RateLimitConfig(
+            max_requests_per_minute=int(os.getenv('CHEATSHEET_RATE_LIMIT_PER_MINUTE', '20')),
+            max_requests_per_hour=int(os.getenv('CHEATSHEET_RATE_LIMIT_PER_HOUR', '500')),
+            max_concurrent_requests=int(os.getenv('CHEATSHEET_LLM_CONCURRENCY', '4'))
+        )
+        
+        # Storage
+        self.storage = StorageConfig(
+            backend=os.getenv('CHEATSHEET_DB_BACKEND', 'json'),
+            cache_enabled=os.getenv('CHEATSHEET_DB_CACHE', '1') != '0',
+            progress_journal=os.getenv('CHEATSHEET_PROGRESS_JOURNAL', '1') != '0',
+            sqlite_path=os.getenv('CHEATSHEET_SQLITE_PATH') or None,
+            quiz_bank=os.getenv('CHEATSHEET_QUIZ_BANK', '1') != '0',
+            quiz_bank_variants=int(os.getenv('CHEATSHEET_QUIZ_BANK_VARIANTS', '3')),
+            log_write_behind=os.getenv('CHEATSHEET_LOG_WRITE_BEHIND', '1') != '0',
+            log_workers=int(os.getenv('CHEATSHEET_LOG_WORKERS', '2'))
+        )
+        
+        # Local grading
+        self.grader = GraderConfig(
+            enabled=os.getenv('CHEATSHEET_LOCAL_GRADER', '1') != '0',
+            accept_threshold=float(os.getenv('CHEATSHEET_GRADER_ACCEPT', '0.8')),
+            reject_threshold=float(os.getenv('CHEATSHEET_GRADER_REJECT', '0.15'))
+        )
         
         # Server
         self.server = ServerConfig()
@@ -20,10 +20,44 @@ class MCPClient:
         self.server = MCPCheatSheetServer(
             data_dir=config.data_dir,
             api_key=config.api_key,
-            openrouter_url=config.llm.openrouter_url
+            openrouter_url=config.llm.openrouter_url,
+            db_cache=config.storage.cache_enabled,
+            db_backend=config.storage.backend,
+            sqlite_path=config.storage.sqlite_path,
+            progress_journal=config.storage.progress_journal,
+            prompt_token_budget=config.llm.prompt_token_budget,
+            llm_pool_size=config.llm.pool_size,
+            llm_model=config.llm.model,
+            model_routes=config.llm.route_table(),
+            llm_timeout=config.llm.call_timeout,
+            llm_connect_timeout=config.llm.connect_timeout,
+            llm_hedge_percentile=config.llm.hedge_percentile or None,
+            breaker_failures=config.llm.breaker_failures,
+            breaker_window=config.llm.breaker_window,
+            breaker_cooldown=config.llm.breaker_cooldown,
+            llm_cache=config.llm.cache_enabled,
+            llm_cache_size=config.llm.cache_size,
+            llm_cache_disk=config.llm.cache_disk,
+            quiz_bank=config.storage.quiz_bank,
+            quiz_bank_variants=config.storage.quiz_bank_variants,
+            rate_limit_per_minute=config.rate_limit.max_requests_per_minute,
+            rate_limit_per_hour=config.rate_limit.max_requests_per_hour,
+            rate_limit_retries=config.rate_limit.max_retries,
+            log_write_behind=config.storage.log_write_behind,
+            log_workers=config.storage.log_workers,
+            local_grader=config.grader.enabled,
+            grader_accept=config.grader.accept_threshold,
+            grader_reject=config.grader.reject_threshold,
+            quiz_engine=config.llm.quiz_engine,
+            quiz_templates=config.llm.quiz_templates
         )
         self.tools = self.server.get_tools()
         self.database = self.server.get_database()
+        self.llm = self.server.llm  # shared pooled OpenRouter client
+    
+    def deadline(self, deadline):
+        """Bound the LLM calls tools make in this thread by a request Deadline (None for no bound)"""
+        return self.llm.deadline(deadline)
     
     # ============ Tool Access Methods ============
     
@@ -39,9 +73,9 @@ class MCPClient:
         """Call getCurProgress tool"""
         return self.server.get_cur_progress()
     
-    def get_system_prompt(self):
+    def get_system_prompt(self, token_budget=None):
         """Call getSystemPrompt tool"""
-        return self.server.get_system_prompt()
+        return self.server.get_system_prompt(token_budget)
     
     def evaluate_answer(self, user_answer, correct_answer, concept_id):
         """Call evaluateAnswer tool"""
@@ -50,6 +84,17 @@ class MCPClient:
             return result.to_dict()
         return result
     
+    def stream_evaluation(self, user_answer, concept_id, expected_answer=None):
+        """Call evaluateAnswer with the feedback streamed"""
+        for kind, value in self.server.stream_evaluation(user_answer, concept_id, expected_answer):
+            if kind == 'result' and hasattr(value, 'to_dict'):
+                value = value.to_dict()
+            yield kind, value
+    
+    def stream_instant_feedback(self, concept, is_correct, user_answer):
+        """Stream feedback text for a pre-graded choice answer"""
+        return self.server.stream_instant_feedback(concept, is_correct, user_answer)
+    
     def update_freshness_and_log(self, concept_id, evaluation_result):
         """Call updateFreshnessAndLog tool"""
         from mcp_cheatsheet.models import EvaluationResult
@@ -59,6 +104,20 @@ class MCPClient:
         
         return self.server.update_freshness_and_log(concept_id, evaluation_result)
     
+    def assess_answer(self, user_answer, concept_id, is_correct=None, expected_answer=None):
+        """Call assessAnswer tool (evaluate + feedback + log in one LLM call)"""
+        result = self.server.assess_answer(user_answer, concept_id, is_correct, expected_answer)
+        if hasattr(result, 'to_dict'):
+            return result.to_dict()
+        return result
+    
+    def stream_assessment(self, user_answer, concept_id, is_correct=None, expected_answer=None):
+        """Call assessAnswer with the feedback streamed"""
+        for kind, value in self.server.stream_assessment(user_answer, concept_id, is_correct, expected_answer):
+            if kind == 'result' and hasattr(value, 'to_dict'):
+                value = value.to_dict()
+            yield kind, value
+    
     def decide_next(self, cur_progress):
         """Call decideNext tool"""
         result = self.server.decide_next(cur_progress)
@@ -70,6 +129,10 @@ class MCPClient:
         """Call generateExplaination tool"""
         return self.server.generate_explaination(concept_id)
     
+    def stream_explaination(self, concept_id):
+        """Call generateExplaination with the text streamed"""
+        return self.server.stream_explaination(concept_id)
+    
     def generate_que_single_choice(self, concept_id):
         """Call generateQue_singleChoice tool"""
         result = self.server.generate_que_single_choice(concept_id)
@@ -91,6 +154,11 @@ class MCPClient:
             return result.to_dict()
         return result
     
+    def generate_quiz_batch(self, requests):
+        """Generate quizzes for several (concept_id, quiz_type) pairs in one LLM call"""
+        results = self.server.generate_quiz_batch(requests)
+        return [result.to_dict() if result and hasattr(result, 'to_dict') else result for result in results]
+    
     # ============ Database Access Methods ============
     
     def get_courses(self):
@@ -101,10 +169,18 @@ class MCPClient:
         """Add a concept to database"""
         return self.database.add_concept(course_name, concept)
     
+    def add_concepts(self, course_name, concepts, timestamp=None):
+        """Add a batch of concepts to database in one transaction"""
+        return self.database.add_concepts(course_name, concepts, timestamp)
+    
     def get_concept(self, concept_ref):
         """Get a concept by reference"""
         return self.database.get_concept(concept_ref)
     
+    def get_concepts(self, concept_refs):
+        """Get several concepts by reference in one batch"""
+        return self.database.get_concepts(concept_refs)
+    
     def generate_concept_id(self, course_name, timestamp):
         """Generate unique concept ID"""
         return self.database.generate_concept_id(course_name, timestamp)
@@ -112,6 +188,43 @@ class MCPClient:
     def check_duplicate(self, course_name, title):
         """Check if concept already exists"""
         return self.database.check_duplicate(course_name, title)
+    
+    def get_db_cache_stats(self):
+        """Get database cache hit/miss counters"""
+        return self.database.cache_stats()
+    
+    def get_prompt_cache_stats(self):
+        """Get system prompt memoization counters"""
+        return self.tools.prompt_builder.stats()
+    
+    def get_llm_stats(self):
+        """Get LLM connection reuse and latency stats"""
+        return self.llm.stats()
+    
+    def get_rate_limit_stats(self):
+        """Get rate limiter queue depth and throttling counters (None if unlimited)"""
+        scheduler = self.llm.scheduler
+        return scheduler.stats() if scheduler is not None else None
+    
+    def get_quiz_bank_stats(self):
+        """Get quiz bank size and hit/miss counters (None if disabled)"""
+        quiz_bank = self.server.quiz_bank
+        return quiz_bank.stats() if quiz_bank is not None else None
+    
+    def get_quiz_template_stats(self):
+        """Get template quiz generator counters (None if disabled)"""
+        quiz_templates = self.server.quiz_templates
+        return quiz_templates.stats() if quiz_templates is not None else None
+    
+    def get_grader_stats(self):
+        """Get the share of short answers graded without the LLM (None if disabled)"""
+        grader = self.server.grader
+        return grader.stats() if grader is not None else None
+    
+    def get_log_queue_stats(self):
+        """Get pending and completed progress log jobs (None if logs are written inline)"""
+        log_queue = self.server.log_queue
+        return log_queue.stats() if log_queue is not None else None
 
 
 # Global MCP client instance
@@ -0,0 +1,158 @@
+"""
+Speculative quiz prefetching
+Generates the question decide_next picked while the user reads feedback
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from typing import Optional
+from .mcp_client import mcp_client
+from mcp_cheatsheet.rate_limit import BACKGROUND
+
+
+class QuizPrefetcher:
+    """
+    One short-lived prefetch slot per session
+    
+    schedule() starts generating the quiz named by a next_decision in the
+    background. take() hands it over if the client asks for the same
+    target and quiz type. A new decision replaces the slot: a queued job
+    is cancelled and a running one has its result discarded.
+    """
+    
+    QUIZ_TYPES = ('single_choice', 'multi_choice', 'short_answer')
+    
+    def __init__(self, mcp, ttl: float = 300.0, max_sessions: int = 256, workers: int = 2):
+        """
+        Args:
+            mcp: MCPClient used to generate quizzes
+            ttl: Seconds a prefetched quiz stays valid
+            max_sessions: Slots kept before the oldest are dropped
+            workers: Background generation threads
+        """
+        self.mcp = mcp
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        
+        self._slots: OrderedDict = OrderedDict()  # session -> (target, quiz type, future, created)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='quiz-prefetch')
+        
+        self.scheduled = 0
+        self.hits = 0
+        self.misses = 0
+        self.cancelled = 0
+        self.discarded = 0
+    
+    def schedule(self, session_id: str, decision: dict) -> bool:
+        """
+        Start prefetching the quiz a decision points at
+        
+        Args:
+            session_id: Client session the slot belongs to
+            decision: next_decision dict with target_ref and preferred_quiz_type
+        
+        Returns:
+            True if a new prefetch was started
+        """
+        target_ref = decision.get('target_ref') if decision else None
+        quiz_type = decision.get('preferred_quiz_type') if decision else None
+        
+        with self._lock:
+            self._prune()
+            slot = self._slots.get(session_id)
+            if slot and slot[:2] == (target_ref, quiz_type):
+                return False  # same speculation already in place
+            
+            if slot:
+                self._drop(self._slots.pop(session_id))
+            if not target_ref or quiz_type not in self.QUIZ_TYPES:
+                return False
+            
+            future = self._executor.submit(self._generate, target_ref, quiz_type)
+            self._slots[session_id] = (target_ref, quiz_type, future, time.monotonic())
+            while len(self._slots) > self.max_sessions:
+                self._drop(self._slots.popitem(last=False)[1])
+            self.scheduled += 1
+        print(f"[PREFETCH] Prefetching {quiz_type} quiz for {target_ref} (session {session_id})")
+        return True
+    
+    def take(self, session_id: str, target_ref: str, quiz_type: str, timeout: float = 60.0) -> Optional[dict]:
+        """
+        Claim a session's prefetched quiz if it matches the request
+        
+        Waits for an in-flight prefetch, which is never slower than starting
+        a new generation.
+        
+        Returns:
+            Quiz dict, or None if nothing usable was prefetched
+        """
+        with self._lock:
+            slot = self._slots.get(session_id)
+            if not slot or slot[:2] != (target_ref, quiz_type) or self._expired(slot):
+                self.misses += 1
+                return None
+            del self._slots[session_id]
+        
+        try:
+            quiz = slot[2].result(timeout=timeout)
+        except TimeoutError:
+            quiz = None
+        except Exception as e:
+            print(f"[PREFETCH] Prefetch failed for {target_ref}: {e}")
+            quiz = None
+        
+        with self._lock:
+            if quiz:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return quiz
+    
+    def discard(self, session_id: str):
+        """Drop a session's slot"""
+        with self._lock:
+            slot = self._slots.pop(session_id, None)
+            if slot:
+                self._drop(slot)
+    
+    def _generate(self, target_ref: str, quiz_type: str) -> Optional[dict]:
+        # Speculative work: yield to requests a user is waiting on
+        with self.mcp.llm.priority(BACKGROUND):
+            if quiz_type == 'single_choice':
+                return self.mcp.generate_que_single_choice(target_ref)
+            if quiz_type == 'multi_choice':
+                return self.mcp.generate_que_multi_choice(target_ref)
+            return self.mcp.generate_que_short_answer(target_ref)
+    
+    def _expired(self, slot) -> bool:
+        return time.monotonic() - slot[3] > self.ttl
+    
+    def _prune(self):
+        """Drop expired slots (lock held)"""
+        for session_id in [s for s, slot in self._slots.items() if self._expired(slot)]:
+            self._drop(self._slots.pop(session_id))
+    
+    def _drop(self, slot):
+        """Cancel a replaced slot's job, or discard its result if already running (lock held)"""
+        if slot[2].cancel():
+            self.cancelled += 1
+        else:
+            self.discarded += 1
+    
+    def stats(self) -> dict:
+        """Get prefetch hit/miss counters"""
+        with self._lock:
+            return {
+                'slots': len(self._slots),
+                'scheduled': self.scheduled,
+                'hits': self.hits,
+                'misses': self.misses,
+                'cancelled': self.cancelled,
+                'discarded': self.discarded
+            }
+
+
+# Global quiz prefetcher instance
+quiz_prefetcher = QuizPrefetcher(mcp_client)
@@ -2,8 +2,20 @@
 MCP tool aggregation
 Manages and coordinates tool calls
 """
-from typing import Dict, List, Optional, Callable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Callable
+from .config import config
 from .mcp_client import mcp_client
+from .prefetch import quiz_prefetcher
+from mcp_cheatsheet import Deadline
+
+
+# Quiz generation tool suffixes -> quiz type names used by the MCP tools
+QUIZ_TYPES = {
+    'singleChoice': 'single_choice',
+    'multiChoice': 'multi_choice',
+    'shortAnswer': 'short_answer'
+}
 
 
 class ToolManager:
@@ -12,6 +24,7 @@ class ToolManager:
     def __init__(self):
         """Initialize tool manager"""
         self.mcp = mcp_client
+        self.prefetcher = quiz_prefetcher
         self._register_tools()
     
     def _register_tools(self):
@@ -25,6 +38,7 @@ class ToolManager:
             
             # Quiz evaluation tools
             'evaluateAnswer': self.mcp.evaluate_answer,
+            'assessAnswer': self.mcp.assess_answer,
             'updateFreshnessAndLog': self.mcp.update_freshness_and_log,
             'decideNext': self.mcp.decide_next,
             
@@ -33,6 +47,7 @@ class ToolManager:
             'generateQue_singleChoice': self.mcp.generate_que_single_choice,
             'generateQue_multiChoice': self.mcp.generate_que_multi_choice,
             'generateQue_shortAnswer': self.mcp.generate_que_short_answer,
+            'generateQuizBatch': self.mcp.generate_quiz_batch,
         }
     
     def call_tool(self, tool_name: str, **kwargs):
@@ -65,70 +80,328 @@ class ToolManager:
     
     # ============ High-level tool operations ============
     
-    def generate_quiz_for_concepts(self, concept_refs: List[str], max_count: int = 10) -> List[dict]:
+    def generate_quiz_for_concepts(
+        self, 
+        concept_refs: List[str], 
+        max_count: int = 10, 
+        concurrency: Optional[int] = None, 
+        batch_size: Optional[int] = None, 
+        deadline: Optional[Deadline] = None
+    ) -> List[dict]:
         """
         Generate quizzes for multiple concepts
         
+        Concepts are grouped into batches that are each generated with one
+        LLM call, and several calls are kept in flight at once (bounded by
+        concurrency and the configured rate limit), so the whole set takes
+        about as long as its slowest call.
+        
         Args:
             concept_refs: List of concept references
             max_count: Maximum number of quizzes to generate
+            concurrency: Maximum calls in flight (defaults to
+                rate_limit.max_concurrent_requests; 1 generates sequentially)
+            batch_size: Concepts per LLM call (defaults to
+                llm.quiz_batch_size; 1 makes one call per concept)
+            deadline: Request deadline; calls still pending when it passes
+                fall back to template questions
         
         Returns:
-            List of quiz questions
+            List of quiz questions, in concept_refs order
+        """
+        refs = concept_refs[:max_count]
+        batches = self._plan_quiz_batches(refs, batch_size)
+        
+        workers = max(1, min(concurrency or config.rate_limit.max_concurrent_requests, len(batches)))
+        print(f"\n[TOOL_MANAGER] Generating quizzes for {len(refs)} concepts "
+              f"({len(batches)} calls, {workers} in flight)...")
+        
+        if workers == 1:
+            results = [self._generate_quiz_batch(batch, deadline) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='quiz-gen') as pool:
+                # map() yields results in submission order
+                results = list(pool.map(lambda batch: self._generate_quiz_batch(batch, deadline), batches))
+        
+        quizzes = [quiz for batch in results for quiz in batch if quiz]
+        print(f"[TOOL_MANAGER] Total quizzes generated: {len(quizzes)}")
+        return quizzes
+    
+    def iter_quizzes_for_concepts(
+        self, 
+        concept_refs: List[str], 
+        max_count: int = 10, 
+        concurrency: Optional[int] = None, 
+        batch_size: Optional[int] = None, 
+        deadline: Optional[Deadline] = None
+    ) -> Iterator[dict]:
+        """
+        Generate quizzes for multiple concepts, yielding each as it is ready
+        
+        The first concept gets a call of its own so the first question
+        arrives after a single short round trip; the rest are batched as in
+        generate_quiz_for_concepts.
+        
+        Args:
+            concept_refs: List of concept references
+            max_count: Maximum number of quizzes to generate
+            concurrency: Maximum calls in flight
+            batch_size: Concepts per LLM call after the first
+            deadline: Request deadline shared by every batch
+        
+        Yields:
+            Event dicts, in this order:
+            {'event': 'start', 'total': n}
+            {'event': 'quiz', 'index': i, 'quiz': {...}} or
+            {'event': 'failed', 'index': i, 'concept_ref': ref}, each followed by
+            {'event': 'progress', 'done': k, 'failed': f, 'total': n}
+            {'event': 'done', 'count': k, 'failed': f, 'total': n}
         """
-        print(f"\n[TOOL_MANAGER] Generating quizzes for {min(len(concept_refs), max_count)} concepts...")
+        refs = concept_refs[:max_count]
+        batches = self._plan_quiz_batches(refs, batch_size, first_batch_size=1)
+        workers = max(1, min(concurrency or config.rate_limit.max_concurrent_requests, len(batches)))
+        print(f"\n[TOOL_MANAGER] Streaming quizzes for {len(refs)} concepts "
+              f"({len(batches)} calls, {workers} in flight)...")
+        
+        yield {'event': 'start', 'total': len(refs)}
+        done = failed = 0
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='quiz-gen')
+        futures: dict = {}
+        try:
+            futures = {pool.submit(self._generate_quiz_batch, batch, deadline): batch for batch in batches}
+            for future in as_completed(futures):
+                for (i, ref, _, _), quiz in zip(futures[future], future.result()):
+                    if quiz:
+                        done += 1
+                        yield {'event': 'quiz', 'index': i, 'quiz': quiz}
+                    else:
+                        failed += 1
+                        yield {'event': 'failed', 'index': i, 'concept_ref': ref}
+                    yield {'event': 'progress', 'done': done, 'failed': failed, 'total': len(refs)}
+        finally:
+            # Stop queued batches if the consumer went away early
+            # (shutdown's cancel_futures needs Python 3.9)
+            for future in futures:
+                future.cancel()
+            pool.shutdown(wait=False)
+        
+        print(f"[TOOL_MANAGER] Streamed {done} quizzes ({failed} failed)")
+        yield {'event': 'done', 'count': done, 'failed': failed, 'total': len(refs)}
+    
+    @staticmethod
+    def _plan_quiz_batches(
+        refs: List[str], 
+        batch_size: Optional[int] = None, 
+        first_batch_size: Optional[int] = None
+    ) -> List[List[tuple]]:
+        """Assign quiz types round-robin and split the jobs into LLM calls"""
+        batch_size = max(1, batch_size or config.llm.quiz_batch_size)
         
-        quizzes = []
         quiz_types = ['singleChoice', 'multiChoice', 'shortAnswer']
+        jobs = [(i, ref, quiz_types[i % 3], len(refs)) for i, ref in enumerate(refs)]
         
-        for i, ref in enumerate(concept_refs[:max_count]):
-            quiz_type = quiz_types[i % 3]
-            print(f"[TOOL_MANAGER] Generating {quiz_type} quiz for concept {i+1}/{min(len(concept_refs), max_count)}: {ref}")
+        batches = []
+        if first_batch_size and jobs:
+            batches.append(jobs[:first_batch_size])
+            jobs = jobs[first_batch_size:]
+        batches += [jobs[i:i + batch_size] for i in range(0, len(jobs), batch_size)]
+        return batches
+    
+    def _generate_quiz_batch(self, batch: List[tuple], deadline: Optional[Deadline] = None) -> List[Optional[dict]]:
+        """Generate the quizzes for one batch of jobs, None for failures"""
+        # Worker threads don't inherit the caller's deadline; bind it here
+        with self.mcp.deadline(deadline):
+            if len(batch) == 1:
+                return [self._generate_quiz(*batch[0])]
             
+            print(f"[TOOL_MANAGER] Generating {len(batch)} quizzes in one call: {[job[1] for job in batch]}")
             try:
-                if quiz_type == 'singleChoice':
-                    quiz = self.mcp.generate_que_single_choice(ref)
-                elif quiz_type == 'multiChoice':
-                    quiz = self.mcp.generate_que_multi_choice(ref)
-                else:
-                    quiz = self.mcp.generate_que_short_answer(ref)
-                
-                if quiz:
-                    print(f"[TOOL_MANAGER] Successfully generated quiz for {ref}")
-                    quizzes.append(quiz)
-                else:
-                    print(f"[TOOL_MANAGER] Warning: No quiz returned for {ref}")
+                return self.mcp.generate_quiz_batch([(ref, QUIZ_TYPES[quiz_type]) for _, ref, quiz_type, _ in batch])
             except Exception as e:
-                print(f"[TOOL_MANAGER] Error generating quiz for {ref}: {e}")
+                print(f"[TOOL_MANAGER] Error generating quiz batch: {e}")
+                return [None] * len(batch)
+    
+    def _generate_quiz(self, i: int, ref: str, quiz_type: str, total: int) -> Optional[dict]:
+        """Generate one quiz, or None on failure"""
+        print(f"[TOOL_MANAGER] Generating {quiz_type} quiz for concept {i+1}/{total}: {ref}")
         
-        print(f"[TOOL_MANAGER] Total quizzes generated: {len(quizzes)}")
-        return quizzes
+        try:
+            if quiz_type == 'singleChoice':
+                quiz = self.mcp.generate_que_single_choice(ref)
+            elif quiz_type == 'multiChoice':
+                quiz = self.mcp.generate_que_multi_choice(ref)
+            else:
+                quiz = self.mcp.generate_que_short_answer(ref)
+            
+            if quiz:
+                print(f"[TOOL_MANAGER] Successfully generated quiz for {ref}")
+                return quiz
+            print(f"[TOOL_MANAGER] Warning: No quiz returned for {ref}")
+        except Exception as e:
+            print(f"[TOOL_MANAGER] Error generating quiz for {ref}: {e}")
+        return None
     
-    def evaluate_and_update(self, user_answer: str, correct_answer: any, concept_id: str) -> dict:
+    def next_quiz(
+        self, 
+        session_id: Optional[str], 
+        target_ref: str, 
+        quiz_type: str, 
+        deadline: Optional[Deadline] = None
+    ) -> Optional[dict]:
+        """
+        Get the quiz a next_decision asked for
+        
+        Served from the session's prefetch slot when the speculation matches,
+        otherwise generated now.
+        
+        Args:
+            session_id: Client session (None skips the prefetch slot)
+            target_ref: Concept reference from next_decision
+            quiz_type: Quiz type from next_decision
+            deadline: Request deadline (also bounds the wait for a prefetch)
+        
+        Returns:
+            Quiz question dict, or None if generation failed
+        """
+        wait = {'timeout': deadline.remaining()} if deadline is not None else {}
+        quiz = self.prefetcher.take(session_id, target_ref, quiz_type, **wait) if session_id else None
+        if quiz:
+            print(f"[TOOL_MANAGER] Served prefetched {quiz_type} quiz for {target_ref}")
+            return quiz
+        
+        tool_types = {name: tool_type for tool_type, name in QUIZ_TYPES.items()}
+        if quiz_type not in tool_types:
+            raise ValueError(f"Unknown quiz type '{quiz_type}'. Available types: {list(tool_types.keys())}")
+        with self.mcp.deadline(deadline):
+            return self._generate_quiz(0, target_ref, tool_types[quiz_type], 1)
+    
+    def evaluate_and_update(
+        self, 
+        user_answer: str, 
+        correct_answer: any, 
+        concept_id: str, 
+        is_correct: Optional[bool] = None, 
+        concept: Optional[dict] = None, 
+        deadline: Optional[Deadline] = None
+    ) -> dict:
         """
         Evaluate answer and update progress in one call
         
+        Uses the combined assessAnswer tool (one LLM call for grade, feedback
+        and log) unless config.llm.combined_assessment is off, in which case
+        evaluateAnswer (or instant feedback) and updateFreshnessAndLog run
+        separately.
+        
         Args:
             user_answer: User's submitted answer
             correct_answer: Expected correct answer
             concept_id: Concept reference
+            is_correct: Grade of a choice question graded client-side (None
+                for short answers)
+            concept: Concept dict with title and content (looked up if omitted)
+            deadline: Request deadline; LLM steps it cuts short use their
+                local fallbacks
         
         Returns:
             Evaluation result with next decision
         """
-        # Evaluate answer
-        evaluation = self.mcp.evaluate_answer(user_answer, correct_answer, concept_id)
-        
-        # Update progress
-        self.mcp.update_freshness_and_log(concept_id, evaluation)
+        with self.mcp.deadline(deadline):
+            if config.llm.combined_assessment:
+                evaluation = self.mcp.assess_answer(user_answer, concept_id, is_correct, correct_answer)
+            else:
+                if is_correct is None:
+                    evaluation = self.mcp.evaluate_answer(user_answer, correct_answer, concept_id)
+                else:
+                    feedback = self.mcp.tools._generate_instant_feedback(
+                        self._concept_dict(concept_id, concept), is_correct, user_answer
+                    )
+                    evaluation = self._graded_evaluation(is_correct, feedback)
+                
+                # Update progress
+                self.mcp.update_freshness_and_log(concept_id, evaluation)
+            
+            # Decide next action
+            cur_progress = self.mcp.get_cur_progress()
+            next_decision = self.mcp.decide_next(cur_progress)
+            
+            return {
+                'evaluation': evaluation,
+                'next_decision': next_decision
+            }
+    
+    def stream_evaluate_and_update(
+        self, 
+        user_answer: str, 
+        concept_id: str, 
+        is_correct: Optional[bool] = None, 
+        concept: Optional[dict] = None, 
+        correct_answer: any = None, 
+        deadline: Optional[Deadline] = None
+    ) -> Iterator[tuple]:
+        """
+        evaluate_and_update with the evaluation feedback streamed
         
-        # Decide next action
-        cur_progress = self.mcp.get_cur_progress()
-        next_decision = self.mcp.decide_next(cur_progress)
+        Args:
+            user_answer: User's submitted answer
+            concept_id: Concept reference
+            is_correct: Grade of a choice question graded client-side (None
+                for short answers)
+            concept: Concept dict with title and content (looked up if omitted)
+            correct_answer: Expected answer of a short-answer quiz
+            deadline: Request deadline; a stream it cuts short finishes with
+                the local fallback feedback
         
+        Yields:
+            ('feedback', delta) while the feedback is written, then
+            ('result', {'evaluation', 'next_decision'}) once progress is updated
+        """
+        with self.mcp.deadline(deadline):
+            evaluation = None
+            if config.llm.combined_assessment:
+                for kind, value in self.mcp.stream_assessment(user_answer, concept_id, is_correct, correct_answer):
+                    if kind == 'result':
+                        evaluation = value
+                    else:
+                        yield kind, value
+            else:
+                if is_correct is None:
+                    for kind, value in self.mcp.stream_evaluation(user_answer, concept_id, correct_answer):
+                        if kind == 'result':
+                            evaluation = value
+                        else:
+                            yield kind, value
+                else:
+                    parts = []
+                    for delta in self.mcp.stream_instant_feedback(
+                        self._concept_dict(concept_id, concept), is_correct, user_answer
+                    ):
+                        parts.append(delta)
+                        yield 'feedback', delta
+                    evaluation = self._graded_evaluation(is_correct, ''.join(parts).strip().strip('"').strip())
+                
+                self.mcp.update_freshness_and_log(concept_id, evaluation)
+            
+            cur_progress = self.mcp.get_cur_progress()
+            next_decision = self.mcp.decide_next(cur_progress)
+            
+            yield 'result', {
+                'evaluation': evaluation,
+                'next_decision': next_decision
+            }
+    
+    def _concept_dict(self, concept_id: str, concept: Optional[dict]) -> dict:
+        if concept:
+            return concept
+        found = self.mcp.database.get_concept(concept_id)
+        return {'title': found.title, 'content': found.content} if found else {}
+    
+    @staticmethod
+    def _graded_evaluation(is_correct: bool, feedback: str) -> dict:
+        """Evaluation dict for a choice question graded client-side"""
         return {
-            'evaluation': evaluation,
-            'next_decision': next_decision
+            'score': 100 if is_correct else 0,
+            'is_correct': is_correct,
+            'feedback': feedback
         }
     
     def get_learning_context(self) -> dict:
@@ -2,15 +2,15 @@
 Flask web server for CheatSheet
 Provides web UI and API endpoints
 """
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template, stream_with_context
 from flask_cors import CORS
-import requests
 import json
 import re
 import base64
 import os
 from .config import config
 from .agent import agent
+from mcp_cheatsheet import Deadline, DeadlineExceeded, LLMError
 
 
 # Initialize Flask app
@@ -29,6 +29,25 @@ def encode_pdf_to_base64(pdf_file):
     return base64.b64encode(pdf_file.read()).decode('utf-8')
 
 
+def request_deadline(budget: float = None) -> Deadline:
+    """Start the deadline every LLM call made for this request shares"""
+    return Deadline(budget if budget is not None else config.llm.request_timeout)
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def sse_response(events) -> Response:
+    """Stream an iterator of SSE messages without proxy buffering"""
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 # ============ Web UI Routes ============
 
 @app.route('/')
@@ -61,11 +80,6 @@ def upload_pdf():
         data_url = f"data:application/pdf;base64,{base64_pdf}"
         
         # Prepare OpenRouter API request
-        headers = {
-            "Authorization": f"Bearer {config.api_key}",
-            "Content-Type": "application/json"
-        }
-        
         messages = [
             {
                 "role": "user",
@@ -73,7 +87,7 @@ def upload_pdf():
                     {
                         "type": "text",
                         "text": """Please analyze this document and extract the key concepts, topics, and important information.
-                        
+
 Return the result in JSON format as a list of concepts. Each concept should have:
 - "title": A concise title for the concept (2-5 words)
 - "content": A clear description or explanation of the concept (1-3 sentences)
@@ -114,51 +128,50 @@ Extract 5-15 key concepts depending on the document length and complexity. Focus
         ]
         
         payload = {
-            "model": config.llm.model,
             "messages": messages,
             "plugins": plugins
         }
         
         # Make API request
-        response = requests.post(config.llm.openrouter_url, headers=headers, json=payload)
-        
-        if response.status_code == 200:
-            result = response.json()
-            content = result.get('choices', [{}])[0].get('message', {}).get('content', '')
-            
-            # Try to parse the JSON response
-            try:
-                # Remove markdown code blocks if present
-                json_match = re.search(r'```(?:json)?\s*(\[.*?\])\s*```', content, re.DOTALL)
-                if json_match:
-                    json_str = json_match.group(1)
-                else:
-                    # If no code blocks, try to find JSON array directly
-                    json_match = re.search(r'(\[.*\])', content, re.DOTALL)
-                    json_str = json_match.group(1) if json_match else content
-                
-                concepts = json.loads(json_str)
-                
-                return jsonify({
-                    'success': True,
-                    'concepts': concepts,
-                    'filename': file.filename
-                })
-            except (json.JSONDecodeError, AttributeError) as e:
-                # If parsing fails, return the raw content
-                return jsonify({
-                    'success': True,
-                    'concepts': [],
-                    'raw_content': content,
-                    'filename': file.filename,
-                    'warning': 'Could not parse JSON response'
-                })
-        else:
+        try:
+            with agent.mcp.deadline(request_deadline(config.llm.generation_timeout)):
+                content = agent.mcp.llm.complete(payload, tool='pdf_extraction')
+        except DeadlineExceeded as e:
+            return jsonify({'error': f'API request timed out: {e}'}), 504
+        except LLMError as e:
             return jsonify({
-                'error': f'API request failed: {response.status_code}',
-                'details': response.text
+                'error': f'API request failed: {e.status_code or e}',
+                'details': e.body
             }), 500
+        
+        # Try to parse the JSON response
+        try:
+            # Remove markdown code blocks if present
+            json_match = re.search(r'```(?:json)?\s*(\[.*?\])\s*```', content, re.DOTALL)
+            if json_match:
+                json_str = json_match.group(1)
+            else:
+                # If no code blocks, try to find JSON array directly
+                json_match = re.search(r'(\[.*\])', content, re.DOTALL)
+                json_str = json_match.group(1) if json_match else content
+            
+            concepts = json.loads(json_str)
             
+            return jsonify({
+                'success': True,
+                'concepts': concepts,
+                'filename': file.filename
+            })
+        except (json.JSONDecodeError, AttributeError) as e:
+            # If parsing fails, return the raw content
+            return jsonify({
+                'success': True,
+                'concepts': [],
+                'raw_content': content,
+                'filename': file.filename,
+                'warning': 'Could not parse JSON response'
+            })
+    
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -196,7 +209,7 @@ def save_concepts():
             'success': True,
             **result
         })
-        
+    
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -214,7 +227,9 @@ def generate_quizzes():
         print(f"\n[API] Generating {num_quizzes} quizzes...")
         
         # Generate quizzes using agent
-        quizzes = agent.generate_quizzes(num_quizzes=num_quizzes)
+        quizzes = agent.generate_quizzes(
+            num_quizzes=num_quizzes, deadline=request_deadline(config.llm.generation_timeout)
+        )
         
         print(f"[API] Generated {len(quizzes) if quizzes else 0} quizzes")
         
@@ -227,7 +242,7 @@ def generate_quizzes():
             'quizzes': quizzes,
             'count': len(quizzes)
         })
-        
+    
     except Exception as e:
         print(f"\n[ERROR] Failed to generate quizzes: {str(e)}")
         import traceback
@@ -235,6 +250,25 @@ def generate_quizzes():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/generate_quizzes/stream', methods=['GET'])
+def generate_quizzes_stream():
+    """Stream quizzes as SSE events as soon as each one is generated"""
+    num_quizzes = request.args.get('num_quizzes', 10, type=int)
+    deadline = request_deadline(config.llm.generation_timeout)
+    print(f"\n[API] Streaming {num_quizzes} quizzes...")
+    
+    def events():
+        try:
+            for event in agent.stream_quizzes(num_quizzes=num_quizzes, deadline=deadline):
+                name = event.pop('event')
+                yield sse_event(name, event)
+        except Exception as e:
+            print(f"\n[ERROR] Failed to stream quizzes: {str(e)}")
+            yield sse_event('error', {'error': str(e)})
+    
+    return sse_response(events())
+
+
 @app.route('/api/evaluate_answer', methods=['POST'])
 def evaluate_answer():
     """Evaluate user's answer"""
@@ -245,55 +279,39 @@ def evaluate_answer():
         concept = data.get('concept')
         quiz_type = data.get('quiz_type', 'short_answer')
         is_correct_preeval = data.get('is_correct')  # Pre-evaluated for choice questions
+        expected_answer = data.get('expected_answer')  # Lets short answers be graded locally
+        session_id = data.get('session_id')  # per-tab id; prefetching needs one
         
         if not user_answer or not concept:
             return jsonify({'error': 'Missing required data'}), 400
         
         print(f"\n[API] Evaluating {quiz_type} answer for {concept_ref}")
         
-        # For choice questions, use pre-evaluated result but generate intelligent feedback
-        if quiz_type in ['single_choice', 'multi_choice'] and is_correct_preeval is not None:
-            from mcp_cheatsheet.models import EvaluationResult
-            
-            # Generate intelligent feedback using LLM
-            intelligent_feedback = agent.mcp.tools._generate_instant_feedback(
-                concept=concept,
-                is_correct=is_correct_preeval,
-                user_answer=user_answer
-            )
-            
-            evaluation = EvaluationResult(
-                score=100 if is_correct_preeval else 0,
-                is_correct=is_correct_preeval,
-                feedback=intelligent_feedback
-            )
-            
-            # Update progress (will generate detailed log)
-            agent.mcp.update_freshness_and_log(concept_ref, evaluation)
-            
-            # Decide next
-            cur_progress = agent.mcp.get_cur_progress()
-            next_decision = agent.mcp.decide_next(cur_progress)
-            
-            result = {
-                'evaluation': evaluation.to_dict(),
-                'next_decision': next_decision.to_dict() if hasattr(next_decision, 'to_dict') else next_decision
-            }
-        else:
-            # For short answer, use agent's LLM evaluation
-            result = agent.evaluate_quiz_answer(
-                user_answer=user_answer,
-                correct_answer=None,
-                concept_id=concept_ref
-            )
+        # Choice questions are graded client-side; the LLM only writes feedback and the log
+        if quiz_type not in ['single_choice', 'multi_choice']:
+            is_correct_preeval = None
+        
+        result = agent.evaluate_quiz_answer(
+            user_answer=user_answer,
+            correct_answer=expected_answer,
+            concept_id=concept_ref,
+            is_correct=is_correct_preeval,
+            concept=concept,
+            deadline=request_deadline()
+        )
         
         print(f"[API] Evaluation complete: {result.get('evaluation', {}).get('is_correct', False)}")
         
+        # Generate the next question while the user reads the feedback (only
+        # clients that send a session_id fetch it back through /api/next_quiz)
+        if session_id:
+            agent.tool_manager.prefetcher.schedule(session_id, result.get('next_decision'))
+        
         return jsonify({
             'success': True,
             **result
         })
-        
+    
     except Exception as e:
         print(f"[ERROR] Failed to evaluate answer: {e}")
         import traceback
@@ -301,11 +319,111 @@ def evaluate_answer():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/evaluate_answer/stream', methods=['POST'])
+def evaluate_answer_stream():
+    """
+    Evaluate user's answer, streaming the feedback as SSE
+    
+    Emits 'token' events with feedback text as the LLM writes it, then one
+    'result' event with the same body /api/evaluate_answer returns.
+    """
+    data = request.get_json()
+    user_answer = data.get('user_answer')
+    concept_ref = data.get('concept_ref')
+    concept = data.get('concept')
+    quiz_type = data.get('quiz_type', 'short_answer')
+    is_correct_preeval = data.get('is_correct')
+    expected_answer = data.get('expected_answer')
+    session_id = data.get('session_id')  # per-tab id; prefetching needs one
+    
+    if not user_answer or not concept:
+        return jsonify({'error': 'Missing required data'}), 400
+    
+    print(f"\n[API] Evaluating {quiz_type} answer for {concept_ref} (streamed)")
+    
+    if quiz_type not in ['single_choice', 'multi_choice']:
+        is_correct_preeval = None
+    deadline = request_deadline()
+    
+    def events():
+        try:
+            result = None
+            for kind, value in agent.tool_manager.stream_evaluate_and_update(
+                user_answer, concept_ref, is_correct=is_correct_preeval, concept=concept, 
+                correct_answer=expected_answer, deadline=deadline
+            ):
+                if kind == 'feedback':
+                    yield sse_event('token', {'text': value})
+                else:
+                    result = value
+            
+            print(f"[API] Evaluation complete: {result.get('evaluation', {}).get('is_correct', False)}")
+            if session_id:
+                agent.tool_manager.prefetcher.schedule(session_id, result.get('next_decision'))
+            yield sse_event('result', {'success': True, **result})
+        
+        except Exception as e:
+            print(f"[ERROR] Failed to evaluate answer: {e}")
+            import traceback
+            traceback.print_exc()
+            yield sse_event('error', {'error': str(e)})
+    
+    return sse_response(events())
+
+
+@app.route('/api/explanation/stream', methods=['GET'])
+def explanation_stream():
+    """Stream an explanation of a concept as SSE 'token' events"""
+    concept_ref = request.args.get('concept_ref')
+    if not concept_ref:
+        return jsonify({'error': 'Missing concept_ref'}), 400
+    deadline = request_deadline()
+    
+    def events():
+        try:
+            for delta in agent.stream_explanation(concept_ref, deadline):
+                yield sse_event('token', {'text': delta})
+            yield sse_event('done', {})
+        except Exception as e:
+            print(f"[ERROR] Failed to stream explanation: {e}")
+            yield sse_event('error', {'error': str(e)})
+    
+    return sse_response(events())
+
+
+@app.route('/api/next_quiz', methods=['POST'])
+def next_quiz():
+    """Get the quiz picked by the last next_decision (prefetched when possible)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        target_ref = data.get('target_ref')
+        quiz_type = data.get('quiz_type')
+        session_id = data.get('session_id')  # same id as sent with the answer
+        
+        if not target_ref or not quiz_type:
+            return jsonify({'error': 'Missing target_ref or quiz_type'}), 400
+        
+        quiz = agent.tool_manager.next_quiz(session_id, target_ref, quiz_type, deadline=request_deadline())
+        if not quiz:
+            return jsonify({'error': f'Could not generate quiz for {target_ref}'}), 404
+        
+        return jsonify({
+            'success': True,
+            'quiz': quiz
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/system_prompt', methods=['GET'])
 def system_prompt():
     """Get system prompt with resolved knowledge"""
     try:
-        prompt_data = agent.mcp.get_system_prompt()
+        # Optional ?token_budget=N overrides the configured budget
+        token_budget = request.args.get('token_budget', type=int)
+        prompt_data = agent.mcp.get_system_prompt(token_budget)
         return jsonify({
             'success': True,
             'prompt_data': prompt_data
@@ -314,6 +432,26 @@ def system_prompt():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/stats', methods=['GET'])
+def stats():
+    """Get runtime performance counters"""
+    try:
+        return jsonify({
+            'success': True,
+            'db_cache': agent.mcp.get_db_cache_stats(),
+            'system_prompt': agent.mcp.get_prompt_cache_stats(),
+            'llm': agent.mcp.get_llm_stats(),
+            'quiz_bank': agent.mcp.get_quiz_bank_stats(),
+            'quiz_templates': agent.mcp.get_quiz_template_stats(),
+            'rate_limit': agent.mcp.get_rate_limit_stats(),
+            'log_queue': agent.mcp.get_log_queue_stats(),
+            'local_grader': agent.mcp.get_grader_stats(),
+            'prefetch': agent.tool_manager.prefetcher.stats()
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 # ============ Main ============
 
 def run_server():
@@ -1,8 +1,20 @@
 """
 CheatSheet MCP Server - Education domain Model Context Protocol server
 """
-from .server import MCPCheatSheetServer
+from .server import MCPCheatSheetServer, create_database
+from .concept_index import ConceptIndex
+from .circuit_breaker import CircuitBreaker
 from .database import Database
+from .deadline import Deadline
+from .job_queue import JobQueue
+from .llm_cache import LLMCache
+from .llm_client import CircuitOpen, DeadlineExceeded, LLMClient, LLMError
+from .local_grader import LocalGrader
+from .model_router import ModelRouter
+from .quiz_bank import QuizBank
+from .rate_limit import RateLimitScheduler
+from .sqlite_database import SQLiteDatabase
+from .template_quiz import TemplateQuizGenerator
 from .tools import CheatSheetTools
 from .models import (
     Concept, Course, UserProfile, KnowledgeDistribution,
@@ -11,7 +23,23 @@ from .models import (
 
 __all__ = [
     'MCPCheatSheetServer',
+    'create_database',
+    'CircuitBreaker',
+    'CircuitOpen',
+    'ConceptIndex',
     'Database',
+    'Deadline',
+    'DeadlineExceeded',
+    'JobQueue',
+    'LLMCache',
+    'LLMClient',
+    'LLMError',
+    'LocalGrader',
+    'ModelRouter',
+    'QuizBank',
+    'RateLimitScheduler',
+    'SQLiteDatabase',
+    'TemplateQuizGenerator',
     'CheatSheetTools',
     'Concept',
     'Course',
@@ -0,0 +1,110 @@
+"""
+Circuit breaker for LLM calls
+Stops sending requests to a failing provider for a cooldown period
+"""
+import threading
+import time
+from collections import deque
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """
+    Trips after a burst of failures and rejects calls for a cooldown
+    
+    closed    - calls go through; failures within the window are counted
+    open      - calls are rejected until the cooldown has passed
+    half_open - one probe call goes through; success closes the circuit,
+                failure opens it for another cooldown. A probe that never
+                reports back is replaced after a cooldown.
+    """
+    
+    def __init__(self, failure_threshold: int = 5, window: float = 30.0, cooldown: float = 30.0):
+        """
+        Args:
+            failure_threshold: Failures within the window that open the circuit
+            window: Seconds failures are counted over
+            cooldown: Seconds the circuit stays open before a probe
+        """
+        self.failure_threshold = failure_threshold
+        self.window = window
+        self.cooldown = cooldown
+        
+        self._lock = threading.Lock()
+        self._failures = deque()  # monotonic times of recent failures
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_started = None
+        
+        self.trips = 0
+        self.rejected = 0
+    
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+    
+    def allow(self) -> bool:
+        """Check whether a call may be sent now (claims the probe when half-open)"""
+        now = time.monotonic()
+        with self._lock:
+            if self._state == OPEN and now - self._opened_at >= self.cooldown:
+                self._state = HALF_OPEN
+                self._probe_started = None
+            
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and (
+                    self._probe_started is None or now - self._probe_started >= self.cooldown):
+                self._probe_started = now
+                return True
+            
+            self.rejected += 1
+            return False
+    
+    def record_success(self):
+        with self._lock:
+            if self._state == CLOSED:
+                return  # failures still count until they leave the window
+            print("[LLM] Circuit closed: provider is answering again")
+            self._state = CLOSED
+            self._failures.clear()
+            self._probe_started = None
+    
+    def record_failure(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._open(now)
+                return
+            
+            self._failures.append(now)
+            while self._failures and now - self._failures[0] > self.window:
+                self._failures.popleft()
+            if self._state == CLOSED and len(self._failures) >= self.failure_threshold:
+                self._open(now)
+    
+    def _open(self, now: float):
+        """Open the circuit (lock held)"""
+        self._state = OPEN
+        self._opened_at = now
+        self._failures.clear()
+        self._probe_started = None
+        self.trips += 1
+        print(f"[LLM] Circuit opened: skipping LLM calls for {self.cooldown:.0f}s")
+    
+    def stats(self) -> dict:
+        """Get circuit state and trip counters"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                'state': self._state,
+                'recent_failures': sum(1 for t in self._failures if now - t <= self.window),
+                'trips': self.trips,
+                'rejected': self.rejected,
+                'open_for_s': max(0.0, self.cooldown - (now - self._opened_at)) if self._state == OPEN else 0.0
+            }
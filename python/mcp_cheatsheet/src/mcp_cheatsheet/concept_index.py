@@ -0,0 +1,176 @@
+"""
+Per-course concept similarity index
+TF-IDF vectors of every concept and each concept's nearest neighbours in its course
+"""
+import heapq
+import re
+import threading
+from typing import Dict, List, Optional
+from .models import Concept
+from .quiz_bank import concept_hash
+from .text_similarity import TfidfModel, cosine
+
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+
+def concept_text(concept: Concept) -> str:
+    return ' '.join([concept.title, *(concept.content or [])])
+
+
+def split_sentences(concept: Concept, min_words: int = 5) -> List[str]:
+    """Sentences of a concept's content long enough to quiz on"""
+    sentences = []
+    for line in concept.content or []:
+        for sentence in _SENTENCE_END.split(line.strip()):
+            sentence = sentence.strip()
+            if len(sentence.split()) >= min_words:
+                sentences.append(sentence)
+    return sentences
+
+
+class CourseIndex:
+    """
+    Concepts of one course and their TF-IDF model
+    
+    Building one only fits the model. Sentences, vectors and each concept's
+    nearest neighbours are computed on first use; neighbours are scored
+    only against concepts sharing one of the concept's top terms (found
+    through an inverted index) and cached per concept.
+    """
+    
+    CANDIDATE_TERMS = 12  # top-weighted terms used to find neighbour candidates
+    
+    def __init__(self, course_name: str, concepts: Dict[str, Concept], neighbours: int = 8):
+        """
+        Args:
+            course_name: Course the concepts belong to
+            concepts: Concept ref -> Concept
+            neighbours: Most similar concepts kept per concept
+        """
+        self.course_name = course_name
+        self.concepts = concepts
+        self.neighbour_count = neighbours
+        self.model = TfidfModel(concept_text(c) for c in concepts.values())
+        
+        self._lock = threading.Lock()
+        self._sentences: Optional[Dict[str, List[str]]] = None
+        self._vectors: Optional[Dict[str, Dict[str, float]]] = None
+        self._postings: Dict[str, List[str]] = {}  # term -> refs containing it, in ref order
+        self._neighbours: Dict[str, List[str]] = {}
+    
+    @property
+    def sentences(self) -> Dict[str, List[str]]:
+        """Concept ref -> sentences long enough to quiz on"""
+        if self._sentences is None:
+            self._sentences = {ref: split_sentences(c) for ref, c in self.concepts.items()}
+        return self._sentences
+    
+    def _ensure_vectors(self):
+        """Vectorize every concept and build the inverted index (lock held)"""
+        if self._vectors is not None:
+            return
+        vectors = {}
+        postings: Dict[str, List[str]] = {}
+        for ref in sorted(self.concepts):
+            vector = self.model.vector(concept_text(self.concepts[ref]))
+            vectors[ref] = vector
+            for term in vector:
+                postings.setdefault(term, []).append(ref)
+        self._postings = postings
+        self._vectors = vectors
+    
+    def neighbours_of(self, concept_ref: str) -> List[str]:
+        """Refs of the concepts most similar to a concept, best first (ties by ref)"""
+        with self._lock:
+            cached = self._neighbours.get(concept_ref)
+            if cached is not None:
+                return cached
+            if concept_ref not in self.concepts:
+                return []
+            self._ensure_vectors()
+            
+            vector = self._vectors[concept_ref]
+            top_terms = sorted(vector, key=lambda term: (-vector[term], term))[:self.CANDIDATE_TERMS]
+            candidates = self._candidates(concept_ref, top_terms)
+            if len(candidates) < self.neighbour_count:
+                candidates = self._candidates(concept_ref, vector)
+            if len(candidates) < self.neighbour_count:
+                # Too few related concepts: unrelated ones still make distractors
+                candidates = set(self.concepts) - {concept_ref}
+            
+            # nlargest is stable, so candidates in ref order break ties by ref
+            scored = ((cosine(vector, self._vectors[ref]), ref) for ref in sorted(candidates))
+            neighbours = [ref for _, ref in heapq.nlargest(
+                self.neighbour_count, scored, key=lambda item: item[0]
+            )]
+            self._neighbours[concept_ref] = neighbours
+            return neighbours
+    
+    def _candidates(self, concept_ref: str, terms) -> set:
+        """Other concepts containing any of the terms (lock held)"""
+        candidates = set()
+        for term in terms:
+            candidates.update(self._postings.get(term, ()))
+        candidates.discard(concept_ref)
+        return candidates
+    
+    def similar(self, concept_ref: str) -> List[Concept]:
+        """Concepts of the course most similar to a concept, best first"""
+        return [self.concepts[ref] for ref in self.neighbours_of(concept_ref)]
+
+
+class ConceptIndex:
+    """
+    CourseIndex per course, built on first use
+    
+    A course is re-indexed when any of its concepts is added, removed or
+    edited (checked with concept_hash on lookups after the database's
+    concepts_version changes, so progress writes never trigger a check).
+    """
+    
+    def __init__(self, database, neighbours: int = 8):
+        """
+        Args:
+            database: Database or SQLiteDatabase
+            neighbours: Most similar concepts kept per concept
+        """
+        self.db = database
+        self.neighbours = neighbours
+        self._courses: Dict[str, tuple] = {}  # course -> (signature, CourseIndex)
+        self._verified: Dict[str, object] = {}  # course -> concepts_version its index was checked at
+        self._lock = threading.Lock()
+        self.builds = 0
+    
+    def course(self, course_name: str) -> Optional[CourseIndex]:
+        """Index of a course, or None if it has no concepts"""
+        version = self.db.concepts_version()
+        with self._lock:
+            cached = self._courses.get(course_name)
+            if cached and self._verified.get(course_name) == version:
+                return cached[1]
+        
+        course = self.db.get_course(course_name)
+        if not course or not course.concepts:
+            return None
+        
+        signature = tuple(sorted((cid, concept_hash(c)) for cid, c in course.concepts.items()))
+        with self._lock:
+            cached = self._courses.get(course_name)
+            if not cached or cached[0] != signature:
+                concepts = {f"COURSES/{course_name}/{cid}": c for cid, c in course.concepts.items()}
+                cached = (signature, CourseIndex(course_name, concepts, self.neighbours))
+                self._courses[course_name] = cached
+                self.builds += 1
+            self._verified[course_name] = version
+            return cached[1]
+    
+    def for_concept(self, concept_ref: str) -> Optional[CourseIndex]:
+        """Index of the course a concept ref belongs to"""
+        parts = concept_ref.split('/')
+        if len(parts) != 3 or parts[0] != 'COURSES':
+            return None
+        index = self.course(parts[1])
+        if index is None or concept_ref not in index.concepts:
+            return None
+        return index
@@ -1,66 +1,236 @@
 """
 JSON database manager for CheatSheet
 """
+import bisect
 import json
 import os
-from typing import Dict, List, Optional
-from datetime import datetime
+import threading
+import time
+import unicodedata
+from typing import Callable, Dict, List, Optional
+from datetime import datetime, timezone
 from .models import (
     Concept, Course, UserProfile, KnowledgeDistribution, 
     ProgressEntry
 )
+from .journal import ProgressJournal
+from .storage import FileLock, atomic_write_json, file_signature
+
+
+DAY_SECONDS = 24 * 60 * 60
+
+
+def timestamp_to_epoch(timestamp: str) -> Optional[int]:
+    """Convert an ISO timestamp (e.g. '2025-01-11T00:00:00Z') to epoch seconds"""
+    if not timestamp:
+        return None
+    concept_date = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+    if concept_date.tzinfo is None:
+        concept_date = concept_date.replace(tzinfo=timezone.utc)
+    return int(concept_date.timestamp())
+
+
+def group_refs_by_course(concept_refs: List[str]) -> Dict[str, List[tuple]]:
+    """Group 'COURSES/<course>/<concept-id>' refs into course -> [(ref, concept_id)]"""
+    groups: Dict[str, List[tuple]] = {}
+    for concept_ref in concept_refs:
+        parts = concept_ref.split('/')
+        if len(parts) == 3 and parts[0] == 'COURSES':
+            groups.setdefault(parts[1], []).append((concept_ref, parts[2]))
+    return groups
 
 
 class Database:
     """Manages JSON file-based database operations"""
     
-    def __init__(self, data_dir: str):
+    def __init__(self, data_dir: str, cached: bool = False, journaled: bool = False):
+        """
+        Args:
+            data_dir: Directory holding db.json, cur_progress.json and
+                knowledge_distributed_map.json
+            cached: Keep parsed documents in memory and reload them only when
+                the file on disk changes (mtime, size or inode)
+            journaled: Record progress updates in an append-only journal
+                (cur_progress.journal) instead of rewriting cur_progress.json
+        """
         self.data_dir = data_dir
         self.db_path = os.path.join(data_dir, 'db.json')
         self.knowledge_map_path = os.path.join(data_dir, 'knowledge_distributed_map.json')
         self.progress_path = os.path.join(data_dir, 'cur_progress.json')
+        self.progress_journal_path = os.path.join(data_dir, 'cur_progress.journal')
+        
+        # Advisory locks serializing read-modify-write cycles across threads
+        # and worker processes sharing this data directory
+        self._file_locks = {
+            path: FileLock(path)
+            for path in (self.db_path, self.knowledge_map_path, self.progress_path)
+        }
+        
+        self.cached = cached
+        self._cache: Dict[str, tuple] = {}  # path -> (file signature, parsed document)
+        self._cache_lock = threading.RLock()
+        self._cache_hits = 0
+        self._cache_misses = 0
+        
+        # Secondary indexes over db.json, rebuilt lazily when the file changes
+        self._index_signature: Optional[tuple] = None
+        self._title_index: Dict[str, set] = {}  # course -> normalized titles
+        self._seq_index: Dict[str, Dict[str, int]] = {}  # course -> ID prefix -> max sequence
+        # Concept refs sorted by (epoch timestamp, course position, position in course),
+        # i.e. by timestamp with ties in db.json order
+        self._time_keys: List[tuple] = []
+        self._time_refs: List[str] = []
+        self._course_positions: Dict[str, int] = {}
+        self._concept_counts: Dict[str, int] = {}  # course -> concepts indexed so far
+        self._time_version = 0  # bumped whenever the time index changes
+        
+        # Last computed knowledge distribution and the index state it came from
+        self._distribution: Optional[KnowledgeDistribution] = None
+        self._distribution_key: Optional[tuple] = None
+        self._distribution_signature: Optional[tuple] = None
+        
+        self.journal: Optional[ProgressJournal] = None
+        if journaled:
+            self.journal = ProgressJournal(
+                self.progress_path, 
+                self.progress_journal_path, 
+                self.lock(self.progress_path)
+            )
+    
+    # ============ Locking ============
+    
+    def lock(self, path: str) -> FileLock:
+        """
+        Get the re-entrant lock for one of the data files
+        
+        Hold it around any load -> modify -> save sequence. Acquire it before,
+        never while holding, the internal cache lock.
+        """
+        return self._file_locks[path]
+    
+    # ============ Cache Operations ============
+    
+    @staticmethod
+    def _file_signature(path: str) -> Optional[tuple]:
+        """Identify the current on-disk version of a file"""
+        return file_signature(path)
+    
+    def _read_json(self, path: str):
+        """
+        Read and parse a JSON file, serving it from memory in cached mode.
+        
+        In cached mode the returned document is shared with the cache, so
+        callers must either treat it as read-only or write it back through
+        the matching save method.
+        
+        Raises:
+            FileNotFoundError: If the file does not exist
+            json.JSONDecodeError: If the file is not valid JSON
+        """
+        if not self.cached:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        
+        with self._cache_lock:
+            signature = self._file_signature(path)
+            cached = self._cache.get(path)
+            if signature is not None and cached is not None and cached[0] == signature:
+                self._cache_hits += 1
+                return cached[1]
+            
+            self._cache_misses += 1
+            self._cache.pop(path, None)
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            # Re-stat after reading so a concurrent writer is detected next time
+            if self._file_signature(path) == signature:
+                self._cache[path] = (signature, data)
+            return data
+    
+    def _write_json(self, path: str, data):
+        """Atomically replace a document on disk and write it through the cache"""
+        with self.lock(path), self._cache_lock:
+            atomic_write_json(path, data)
+            if self.cached:
+                self._cache[path] = (self._file_signature(path), data)
+    
+    def data_version(self) -> tuple:
+        """
+        Token that changes whenever any data file changes (in any process)
+        
+        Suitable as a memoization key for results derived from the database.
+        """
+        return tuple(
+            self._file_signature(path)
+            for path in (self.db_path, self.knowledge_map_path, 
+                         self.progress_path, self.progress_journal_path)
+        )
+    
+    def concepts_version(self) -> Optional[tuple]:
+        """Token that changes whenever db.json (courses, concepts, profile) changes"""
+        return self._file_signature(self.db_path)
+    
+    def invalidate_cache(self):
+        """Drop every cached document so the next read goes to disk"""
+        with self._cache_lock:
+            self._cache.clear()
+    
+    def cache_stats(self) -> dict:
+        """Get cache hit/miss counters"""
+        # Read before taking the cache lock (file locks come first)
+        journal_pending = self.journal.pending_records() if self.journal is not None else None
+        with self._cache_lock:
+            lookups = self._cache_hits + self._cache_misses
+            return {
+                'backend': 'json',
+                'enabled': self.cached,
+                'hits': self._cache_hits,
+                'misses': self._cache_misses,
+                'hit_rate': self._cache_hits / lookups if lookups else 0.0,
+                'cached_files': [os.path.basename(p) for p in self._cache],
+                'journal_pending_records': journal_pending
+            }
     
     # ============ Database Operations ============
     
     def load_db(self) -> dict:
         """Load main database"""
         try:
-            with open(self.db_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return self._read_json(self.db_path)
         except FileNotFoundError:
             return {"USER_PROFILE": {}, "COURSES": {}}
     
     def save_db(self, db: dict):
         """Save main database"""
-        with open(self.db_path, 'w', encoding='utf-8') as f:
-            json.dump(db, f, ensure_ascii=False, indent=2)
+        self._write_json(self.db_path, db)
     
     def load_knowledge_map(self) -> KnowledgeDistribution:
         """Load knowledge distribution map"""
         try:
-            with open(self.knowledge_map_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return KnowledgeDistribution.from_dict(data)
+            data = self._read_json(self.knowledge_map_path)
+            return KnowledgeDistribution.from_dict(data)
         except FileNotFoundError:
             return KnowledgeDistribution()
     
     def save_knowledge_map(self, knowledge_map: KnowledgeDistribution):
         """Save knowledge distribution map"""
-        with open(self.knowledge_map_path, 'w', encoding='utf-8') as f:
-            json.dump(knowledge_map.to_dict(), f, ensure_ascii=False, indent=2)
+        self._write_json(self.knowledge_map_path, knowledge_map.to_dict())
     
     def load_progress(self) -> dict:
         """Load current progress"""
+        if self.journal is not None:
+            return self.journal.load()
         try:
-            with open(self.progress_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return self._read_json(self.progress_path)
         except (FileNotFoundError, json.JSONDecodeError):
             return {"AI_FEEDBACK": {}}
     
     def save_progress(self, progress: dict):
         """Save current progress"""
-        with open(self.progress_path, 'w', encoding='utf-8') as f:
-            json.dump(progress, f, ensure_ascii=False, indent=2)
+        if self.journal is not None:
+            self.journal.replace(progress)
+            return
+        self._write_json(self.progress_path, progress)
     
     # ============ User Profile Operations ============
     
@@ -72,9 +242,9 @@ class Database:
     
     def save_user_profile(self, profile: UserProfile):
         """Save user profile"""
-        db = self.load_db()
-        db['USER_PROFILE'] = profile.to_dict()
-        self.save_db(db)
+        with self.lock(self.db_path):
+            db = self.load_db()
+            self.save_db({**db, 'USER_PROFILE': profile.to_dict()})
     
     # ============ Course Operations ============
     
@@ -98,11 +268,10 @@ class Database:
     
     def save_course(self, course: Course):
         """Save a course"""
-        db = self.load_db()
-        if 'COURSES' not in db:
-            db['COURSES'] = {}
-        db['COURSES'][course.name] = course.to_dict()
-        self.save_db(db)
+        with self.lock(self.db_path):
+            db = self.load_db()
+            courses = {**db.get('COURSES', {}), course.name: course.to_dict()}
+            self.save_db({**db, 'COURSES': courses})
     
     def course_exists(self, course_name: str) -> bool:
         """Check if course exists"""
@@ -113,21 +282,19 @@ class Database:
     
     def add_concept(self, course_name: str, concept: Concept) -> bool:
         """Add a concept to a course"""
-        db = self.load_db()
-        
-        if 'COURSES' not in db:
-            db['COURSES'] = {}
-        
-        if course_name not in db['COURSES']:
-            db['COURSES'][course_name] = {}
-        
-        # Check for duplicates
-        if self.check_duplicate(course_name, concept.title):
-            return False
-        
-        db['COURSES'][course_name][concept.concept_id] = concept.to_dict()
-        self.save_db(db)
-        return True
+        with self.lock(self.db_path), self._cache_lock:
+            # Check for duplicates
+            if self.check_duplicate(course_name, concept.title):
+                return False
+            
+            # Change copies: the loaded document is the cached one until the write succeeds
+            db = self.load_db()
+            courses = dict(db.get('COURSES', {}))
+            course_concepts = dict(courses.get(course_name, {}))
+            course_concepts[concept.concept_id] = concept.to_dict()
+            courses[course_name] = course_concepts
+            self._commit_concepts({**db, 'COURSES': courses}, course_name, [concept])
+            return True
     
     def get_concept(self, concept_ref: str) -> Optional[Concept]:
         """Get a concept by reference (e.g., 'COURSES/COURSE_NAME/concept-id')"""
@@ -145,28 +312,200 @@ class Database:
         
         return Concept.from_dict(concept_id, concept_data)
     
+    def get_concepts(self, concept_refs: List[str]) -> Dict[str, Concept]:
+        """
+        Resolve many concept references against one snapshot of the database
+        
+        Args:
+            concept_refs: References like 'COURSES/COURSE_NAME/concept-id'
+        
+        Returns:
+            Dict of ref -> Concept in input order; unresolvable refs are omitted
+        """
+        courses = self.load_db().get('COURSES', {})
+        resolved = {}
+        for course_name, refs in group_refs_by_course(concept_refs).items():
+            course_concepts = courses.get(course_name, {})
+            for concept_ref, concept_id in refs:
+                concept_data = course_concepts.get(concept_id)
+                if concept_data:
+                    resolved[concept_ref] = Concept.from_dict(concept_id, concept_data)
+        return {ref: resolved[ref] for ref in concept_refs if ref in resolved}
+    
+    def add_concepts(
+        self, 
+        course_name: str, 
+        concepts: List[dict], 
+        timestamp: Optional[str] = None
+    ) -> List[dict]:
+        """
+        Add several concepts to a course in a single load/save transaction
+        
+        Duplicate checks, ID assignment and insertion all run against one
+        snapshot of the database, which is written back once at the end.
+        
+        Args:
+            course_name: Name of the course
+            concepts: List of concept dicts with title and content
+            timestamp: ISO timestamp shared by the batch (defaults to now)
+        
+        Returns:
+            One result dict per input concept, in input order, with
+            status 'added' (and the new concept_id) or 'skipped' (and a reason)
+        """
+        if timestamp is None:
+            timestamp = datetime.now().isoformat() + 'Z'
+        
+        with self.lock(self.db_path), self._cache_lock:
+            self._ensure_indexes()
+            db = self.load_db()
+            # Add to a copy: the loaded document is the cached one until the write succeeds
+            course_concepts = dict(db.get('COURSES', {}).get(course_name, {}))
+            # Titles and sequence numbers claimed by this batch so far
+            batch_titles = set()
+            batch_seq: Dict[str, int] = {}
+            
+            results = []
+            added = []
+            for concept_data in concepts:
+                title = (concept_data.get('title') or '').strip()
+                if not title:
+                    results.append({'title': title, 'status': 'skipped', 'reason': 'missing title'})
+                    continue
+                
+                key = self.normalize_title(title)
+                if key in batch_titles or key in self._title_index.get(course_name, ()):
+                    results.append({'title': title, 'status': 'skipped', 'reason': 'duplicate'})
+                    continue
+                
+                prefix = self._concept_id_prefix(course_name, timestamp)
+                seq = batch_seq.get(prefix, self._seq_index.get(course_name, {}).get(prefix, 0)) + 1
+                batch_seq[prefix] = seq
+                batch_titles.add(key)
+                
+                content = concept_data.get('content', [])
+                concept = Concept(
+                    concept_id=f"{prefix}{seq:03d}",
+                    title=title,
+                    content=content if isinstance(content, list) else [content],
+                    timestamp=timestamp,
+                    freshness=0.0
+                )
+                course_concepts[concept.concept_id] = concept.to_dict()
+                added.append(concept)
+                results.append({'title': title, 'status': 'added', 'concept_id': concept.concept_id})
+            
+            if added:
+                courses = {**db.get('COURSES', {}), course_name: course_concepts}
+                self._commit_concepts({**db, 'COURSES': courses}, course_name, added)
+            return results
+    
     def check_duplicate(self, course_name: str, title: str) -> bool:
         """Check if a concept with this title already exists in the course"""
-        db = self.load_db()
-        course_concepts = db.get('COURSES', {}).get(course_name, {})
-        
-        title_lower = title.lower()
-        for concept_data in course_concepts.values():
-            if concept_data.get('title', '').lower() == title_lower:
-                return True
-        return False
+        with self._cache_lock:
+            self._ensure_indexes()
+            return self.normalize_title(title) in self._title_index.get(course_name, ())
     
     def generate_concept_id(self, course_name: str, timestamp: str) -> str:
         """Generate unique concept ID"""
+        with self._cache_lock:
+            self._ensure_indexes()
+            prefix = self._concept_id_prefix(course_name, timestamp)
+            seq = self._seq_index.get(course_name, {}).get(prefix, 0)
+            return f"{prefix}{seq + 1:03d}"
+    
+    # ============ Concept Indexes ============
+    
+    @staticmethod
+    def normalize_title(title: str) -> str:
+        """Normalize a concept title for duplicate detection"""
+        return unicodedata.normalize('NFKC', title).casefold().strip()
+    
+    @staticmethod
+    def _concept_id_prefix(course_name: str, timestamp: str) -> str:
+        """Concept ID prefix shared by a course's concepts on one date"""
         date_str = timestamp.split('T')[0]
-        db = self.load_db()
-        course_concepts = db.get('COURSES', {}).get(course_name, {})
+        return f"{course_name.lower()[:2]}-{date_str}-"
+    
+    def _ensure_indexes(self):
+        """
+        Rebuild the title, ID-sequence and timestamp indexes if db.json
+        changed since they were last built. Must be called with the cache
+        lock held.
+        """
+        signature = self._file_signature(self.db_path)
+        if signature is not None and signature == self._index_signature:
+            return
+        
+        title_index: Dict[str, set] = {}
+        seq_index: Dict[str, Dict[str, int]] = {}
+        timed = []
+        course_positions, concept_counts = {}, {}
+        for course_position, (course_name, course_concepts) in enumerate(self.load_db().get('COURSES', {}).items()):
+            titles = title_index.setdefault(course_name, set())
+            for position, (concept_id, concept_data) in enumerate(course_concepts.items()):
+                titles.add(self.normalize_title(concept_data.get('title', '')))
+                self._index_concept_id(seq_index.setdefault(course_name, {}), concept_id)
+                
+                epoch = self._parse_epoch(concept_data.get('timestamp', ''))
+                if epoch is not None:
+                    timed.append(((epoch, course_position, position), f"COURSES/{course_name}/{concept_id}"))
+            course_positions[course_name] = course_position
+            concept_counts[course_name] = len(course_concepts)
+        timed.sort()
+        
+        self._title_index = title_index
+        self._seq_index = seq_index
+        self._time_keys = [key for key, _ in timed]
+        self._time_refs = [ref for _, ref in timed]
+        self._course_positions = course_positions
+        self._concept_counts = concept_counts
+        self._time_version += 1
+        self._index_signature = signature
+    
+    @staticmethod
+    def _parse_epoch(timestamp: str) -> Optional[int]:
+        """Epoch seconds of a concept timestamp (None if missing or malformed)"""
+        try:
+            return timestamp_to_epoch(timestamp)
+        except ValueError:
+            return None
+    
+    @staticmethod
+    def _index_concept_id(course_seq: Dict[str, int], concept_id: str):
+        """Record a concept ID's sequence number under its prefix"""
+        head, _, tail = concept_id.rpartition('-')
+        if head and tail.isdigit():
+            prefix = f"{head}-"
+            course_seq[prefix] = max(course_seq.get(prefix, 0), int(tail))
+    
+    def _commit_concepts(self, db: dict, course_name: str, concepts: List[Concept]):
+        """Save db.json after inserting concepts and update indexes in place"""
+        indexes_current = self._index_signature is not None and \
+            self._index_signature == self._file_signature(self.db_path)
         
-        # Count existing concepts for this date
-        prefix = f"{course_name.lower()[:2]}-{date_str}-"
-        count = sum(1 for key in course_concepts.keys() if key.startswith(prefix))
+        self.save_db(db)
+        
+        if not indexes_current:
+            self._index_signature = None
+            return
         
-        return f"{prefix}{count + 1:03d}"
+        titles = self._title_index.setdefault(course_name, set())
+        course_seq = self._seq_index.setdefault(course_name, {})
+        course_position = self._course_positions.setdefault(course_name, len(self._course_positions))
+        for concept in concepts:
+            titles.add(self.normalize_title(concept.title))
+            self._index_concept_id(course_seq, concept.concept_id)
+            
+            epoch = self._parse_epoch(concept.timestamp)
+            if epoch is not None:
+                key = (epoch, course_position, self._concept_counts.get(course_name, 0))
+                i = bisect.bisect_right(self._time_keys, key)
+                self._time_keys.insert(i, key)
+                self._time_refs.insert(i, f"COURSES/{course_name}/{concept.concept_id}")
+            self._concept_counts[course_name] = self._concept_counts.get(course_name, 0) + 1
+        self._time_version += 1
+        self._index_signature = self._file_signature(self.db_path)
     
     # ============ Knowledge Distribution ============
     
@@ -174,54 +513,101 @@ class Database:
         """
         Distribute concepts to TODAY, SHORT_TERM, and LONG_TERM 
         based on timestamps
-        """
-        db = self.load_db()
-        knowledge_map = KnowledgeDistribution()
-        
-        from datetime import timezone
-        current_date = datetime.now(timezone.utc)
         
-        for course_name, concepts in db.get('COURSES', {}).items():
-            for concept_id, concept_data in concepts.items():
-                concept_ref = f"COURSES/{course_name}/{concept_id}"
-                timestamp_str = concept_data.get('timestamp', '')
+        Buckets are slices of the timestamp-sorted concept index cut at
+        now-1d and now-31d (whole days, as before). Future timestamps stay in
+        SHORT_TERM. The result is only recomputed when concepts were inserted
+        or a concept crossed a boundary, and the map file is only rewritten
+        when its contents change.
+        """
+        with self.lock(self.knowledge_map_path):
+            with self._cache_lock:
+                self._ensure_indexes()
+                
+                now = int(time.time())
+                keys = self._time_keys
+                i_long = bisect.bisect_right(keys, (now - 31 * DAY_SECONDS, float('inf')))
+                i_today = bisect.bisect_right(keys, (now - DAY_SECONDS, float('inf')))
+                i_now = bisect.bisect_right(keys, (now, float('inf')))
+                distribution_key = (self._time_version, i_long, i_today, i_now)
+                
+                if distribution_key == self._distribution_key and \
+                        self._file_signature(self.knowledge_map_path) == self._distribution_signature:
+                    return self._distribution
                 
-                if timestamp_str:
-                    concept_date = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-                    days_diff = (current_date - concept_date).days
-                    
-                    # TODAY: concepts added today
-                    if days_diff == 0:
-                        knowledge_map.today.append(concept_ref)
+                refs = self._time_refs
+                knowledge_map = KnowledgeDistribution(
+                    # TODAY: concepts added within the last day
+                    today=refs[i_today:i_now],
                     # SHORT_TERM: concepts from the last 30 days
-                    elif days_diff <= 30:
-                        knowledge_map.short_term.append(concept_ref)
+                    short_term=refs[i_long:i_today] + refs[i_now:],
                     # LONG_TERM: older concepts
-                    else:
-                        knowledge_map.long_term.append(concept_ref)
-        
-        self.save_knowledge_map(knowledge_map)
-        return knowledge_map
+                    long_term=refs[:i_long]
+                )
+            
+            if knowledge_map != self.load_knowledge_map():
+                self.save_knowledge_map(knowledge_map)
+            
+            self._distribution = knowledge_map
+            self._distribution_key = distribution_key
+            self._distribution_signature = self._file_signature(self.knowledge_map_path)
+            return knowledge_map
     
     # ============ Progress Operations ============
     
     def get_progress_entry(self, concept_ref: str) -> Optional[ProgressEntry]:
         """Get progress entry for a concept"""
-        progress = self.load_progress()
-        entry_data = progress.get('AI_FEEDBACK', {}).get(concept_ref)
+        if self.journal is not None:
+            entry_data = self.journal.get_entry(concept_ref)
+        else:
+            entry_data = self.load_progress().get('AI_FEEDBACK', {}).get(concept_ref)
         if not entry_data:
             return None
         return ProgressEntry.from_dict(entry_data)
     
     def update_progress(self, concept_ref: str, entry: ProgressEntry):
         """Update progress for a concept"""
-        progress = self.load_progress()
+        if self.journal is not None:
+            self.journal.set_entry(concept_ref, entry.to_dict())
+            return
+        
+        with self.lock(self.progress_path):
+            progress = self.load_progress()
+            feedback = {**progress.get('AI_FEEDBACK', {}), concept_ref: entry.to_dict()}
+            self.save_progress({**progress, 'AI_FEEDBACK': feedback})
+    
+    def modify_progress_entry(
+        self, 
+        concept_ref: str, 
+        updater: Callable[[Optional[ProgressEntry]], ProgressEntry]
+    ) -> ProgressEntry:
+        """
+        Atomically read, update and save the progress entry for a concept
+        
+        The progress file stays locked for the whole cycle, so concurrent
+        workers updating the same data directory cannot lose each other's
+        changes.
         
-        if 'AI_FEEDBACK' not in progress:
-            progress['AI_FEEDBACK'] = {}
+        Args:
+            concept_ref: Concept reference
+            updater: Receives the current entry (None if missing) and returns
+                the entry to store
         
-        progress['AI_FEEDBACK'][concept_ref] = entry.to_dict()
-        self.save_progress(progress)
+        Returns:
+            The stored entry
+        """
+        with self.lock(self.progress_path):
+            current = self.get_progress_entry(concept_ref)
+            known_lines = len(current.log) if current else 0
+            entry = updater(current)
+            
+            if self.journal is not None and current is not None \
+                    and entry.log[:known_lines] == current.log[:known_lines]:
+                # Append-only change: journal just the new log lines
+                self.journal.append(concept_ref, entry.freshness, entry.log[known_lines:])
+            else:
+                self.update_progress(concept_ref, entry)
+            return entry
     
     def get_all_concepts_refs(self) -> List[str]:
         """Get all concept references"""
@@ -0,0 +1,46 @@
+"""
+Request deadlines
+A time budget created per HTTP request and shared by every LLM call it makes
+"""
+import time
+from typing import Optional, Tuple
+
+
+class Deadline:
+    """
+    Point in time by which a request must be answered
+    
+    Each LLM call made on the request's behalf uses the remaining budget as
+    its timeout, so a chain of calls cannot take longer than the budget.
+    """
+    
+    def __init__(self, budget: float):
+        """
+        Args:
+            budget: Seconds from now until the deadline
+        """
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+    
+    def remaining(self) -> float:
+        """Seconds left (0 once expired)"""
+        return max(0.0, self.expires_at - time.monotonic())
+    
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+    
+    def timeout(self, connect: float, read: Optional[float] = None) -> Tuple[float, float]:
+        """
+        (connect, read) timeout for one HTTP call, capped by the remaining budget
+        
+        Args:
+            connect: Connect timeout without a deadline
+            read: Read timeout without a deadline (None for no cap)
+        """
+        # requests rejects a zero timeout; a call this late fails on its first read
+        remaining = max(self.remaining(), 0.001)
+        return min(connect, remaining), min(read, remaining) if read is not None else remaining
+    
+    def __repr__(self) -> str:
+        return f"Deadline(budget={self.budget}, remaining={self.remaining():.2f})"
@@ -0,0 +1,383 @@
+"""
+Durable write-behind job queue
+Jobs are stored in a JSON file before they run, so work survives a restart
+"""
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from queue import Queue
+from typing import Callable, Optional
+from .storage import FileLock, atomic_write_json, file_signature
+
+
+class JobQueue:
+    """
+    Background jobs persisted in a JSON file and run by worker threads
+    
+    submit() writes the job to disk and returns immediately. A worker passes
+    its payload to the handler and marks the job done once the handler returns.
+    A handler that raises is retried with exponential backoff; on the last
+    attempt it is called with final=True and should fall back rather than
+    raise.
+    
+    Several processes may share the job file. A job is leased to the queue
+    that submits it (owner id and lease expiry are written with it); a worker
+    only rewrites the lease when less than half of it is left. Other queues
+    leave leased jobs alone until the lease runs out. Jobs with no live
+    lease (left by a stopped process, or one that hung past its lease) are
+    picked up at startup and by a periodic sweep.
+    
+    Finished jobs are deleted in batches: when the queue goes idle, every
+    DELETE_BATCH jobs, and in flush() and close(). A process stopped between
+    a handler returning and the batch being written handles those jobs again.
+    
+    Document layout:
+        {"JOBS": {"<id>": {"payload": {...}, "attempts": 0, "created": 1700000000.0,
+                           "owner": "host:pid:queue", "lease_until": 1700000300.0}}}
+    """
+    
+    DELETE_BATCH = 32  # finished jobs deleted in one write
+    
+    def __init__(
+        self,
+        path: str,
+        workers: int = 2,
+        max_attempts: int = 5,
+        retry_delay: float = 5.0,
+        name: str = 'jobs',
+        lease: float = 300.0
+    ):
+        """
+        Args:
+            path: Job file path
+            workers: Worker threads
+            max_attempts: Attempts per job, including the final fallback one
+            retry_delay: Delay before the first retry in seconds (doubles each retry)
+            name: Thread name prefix and log tag
+            lease: Seconds a claimed job stays reserved for its owner (longer
+                than any one handler call)
+        """
+        self.path = path
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.name = name
+        self.lease = lease
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        
+        self._lock = FileLock(path)
+        self._doc: Optional[dict] = None
+        self._signature: Optional[tuple] = None
+        
+        self._queue: Queue = Queue()
+        self._threads = []
+        self._timers = set()
+        self._queued_ids = set()  # jobs this queue holds in memory (queued, running or on a timer)
+        self._finished = set()  # jobs done but still in the file until the next batched delete
+        self._stop_sweep = threading.Event()
+        self._handler: Optional[Callable[[dict, bool], None]] = None
+        self._idle = threading.Condition()
+        self._running = 0
+        
+        self.submitted = 0
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+        self.replayed = 0
+        self.claim_conflicts = 0
+        self._delay_total = 0.0
+    
+    # ============ Storage ============
+    
+    def _load(self) -> dict:
+        """Get the job document, re-reading it only if the file changed (lock held)"""
+        signature = file_signature(self.path)
+        if self._doc is None or signature != self._signature:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._doc = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                self._doc = {"JOBS": {}}
+            self._signature = signature
+        return self._doc
+    
+    def _save(self, doc: dict):
+        """Write the job document (lock held)"""
+        atomic_write_json(self.path, doc)
+        self._doc = doc
+        self._signature = file_signature(self.path)
+    
+    def _update_job(self, job_id: str, job: Optional[dict]):
+        """Store a job, or delete it if job is None"""
+        with self._lock:
+            doc = self._load()
+            jobs = dict(doc['JOBS'])
+            if job is None:
+                jobs.pop(job_id, None)
+            else:
+                jobs[job_id] = job
+            self._save({**doc, 'JOBS': jobs})
+    
+    def _claimable(self, job: dict, now: float) -> bool:
+        """Check whether this queue may take a job (ours, unleased, lease expired or owner gone)"""
+        owner = job.get('owner')
+        return owner in (None, self.owner) or job.get('lease_until', 0) <= now \
+            or not self._owner_alive(owner)
+    
+    @staticmethod
+    def _owner_alive(owner: str) -> bool:
+        """Check a lease owner's process (only decidable for processes on this host)"""
+        host, _, rest = owner.partition(':')
+        pid = rest.partition(':')[0]
+        if os.name != 'posix' or host != socket.gethostname() or not pid.isdigit():
+            return True
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+    
+    def _claim(self, job_id: str) -> Optional[dict]:
+        """Lease a job to this queue, or None if it is gone or leased elsewhere"""
+        with self._lock:
+            doc = self._load()
+            job = doc['JOBS'].get(job_id)
+            now = time.time()
+            if job is None or not self._claimable(job, now):
+                return None
+            if job.get('owner') == self.owner and job.get('lease_until', 0) - now > self.lease / 2:
+                # Leased to us on submit (or for a retry) and far from expiry: no write needed
+                return job
+            job = {**job, 'owner': self.owner, 'lease_until': now + self.lease}
+            self._save({**doc, 'JOBS': {**doc['JOBS'], job_id: job}})
+            return job
+    
+    def _delete_finished(self):
+        """Delete every finished job from the file in one write"""
+        with self._lock:
+            with self._idle:
+                finished, self._finished = self._finished, set()
+            if not finished:
+                return
+            try:
+                doc = self._load()
+                jobs = {job_id: job for job_id, job in doc['JOBS'].items() if job_id not in finished}
+                self._save({**doc, 'JOBS': jobs})
+            except Exception:
+                with self._idle:
+                    self._finished |= finished
+                raise
+    
+    # ============ Queue Operations ============
+    
+    def start(self, handler: Callable[[dict, bool], None]):
+        """
+        Start the workers and re-queue jobs left over from a previous run
+        
+        Args:
+            handler: Called as handler(payload, final) for each job
+        """
+        self._handler = handler
+        pending = self._enqueue_abandoned()
+        if pending:
+            print(f"[{self.name.upper()}] Resuming {pending} pending job(s)")
+        
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        
+        self._stop_sweep.clear()
+        sweeper = threading.Thread(target=self._sweep, name=f"{self.name}-sweep", daemon=True)
+        sweeper.start()
+        self._threads.append(sweeper)
+    
+    def _enqueue_abandoned(self) -> int:
+        """Queue jobs on disk that no live lease covers and this queue doesn't hold"""
+        with self._idle:
+            held = self._queued_ids | self._finished
+        with self._lock:
+            now = time.time()
+            job_ids = [
+                job_id for job_id, job in self._load()['JOBS'].items()
+                if job_id not in held and self._claimable(job, now)
+            ]
+        for job_id in job_ids:
+            self._enqueue(job_id)
+        with self._idle:
+            self.replayed += len(job_ids)
+        return len(job_ids)
+    
+    def _sweep(self):
+        """Periodically pick up jobs whose owner stopped before finishing them"""
+        while not self._stop_sweep.wait(self.lease / 2):
+            try:
+                reclaimed = self._enqueue_abandoned()
+                if reclaimed:
+                    print(f"[{self.name.upper()}] Reclaimed {reclaimed} job(s) with expired leases")
+            except Exception as e:
+                print(f"[{self.name.upper()}] Sweep failed: {e}")
+    
+    def submit(self, payload: dict) -> str:
+        """
+        Persist a job and queue it
+        
+        Args:
+            payload: JSON-serializable job data passed to the handler
+        
+        Returns:
+            Job id
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._update_job(job_id, {
+            'payload': payload, 'attempts': 0, 'created': now,
+            'owner': self.owner, 'lease_until': now + self.lease
+        })
+        with self._idle:
+            self.submitted += 1
+        self._enqueue(job_id)
+        return job_id
+    
+    def _enqueue(self, job_id: str):
+        with self._idle:
+            self._running += 1
+            self._queued_ids.add(job_id)
+        self._queue.put(job_id)
+    
+    def _done(self, job_id: str, waiting: bool):
+        with self._idle:
+            self._running -= 1
+            if not waiting:
+                self._queued_ids.discard(job_id)
+            self._idle.notify_all()
+    
+    def _work(self):
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            waiting = False
+            try:
+                waiting = self._run(job_id)
+            finally:
+                self._done(job_id, waiting)
+            
+            with self._idle:
+                batch_ready = len(self._finished) >= self.DELETE_BATCH or \
+                    (self._running == 0 and self._finished)
+            if batch_ready:
+                try:
+                    self._delete_finished()
+                except Exception as e:
+                    print(f"[{self.name.upper()}] Deleting finished jobs failed: {e}")
+    
+    def _run(self, job_id: str) -> bool:
+        """Run one job; returns True if it was left waiting for a retry"""
+        job = self._claim(job_id)
+        if job is None:
+            # Finished, or claimed by another process sharing the file
+            with self._idle:
+                self.claim_conflicts += 1
+            return False
+        
+        final = job['attempts'] + 1 >= self.max_attempts
+        try:
+            self._handler(job['payload'], final)
+        except Exception as e:
+            attempts = job['attempts'] + 1
+            if final:
+                print(f"[{self.name.upper()}] Job {job_id} failed after {attempts} attempts, dropping: {e}")
+                with self._idle:
+                    self._finished.add(job_id)
+                    self.failed += 1
+                return False
+            
+            delay = self.retry_delay * (2 ** (attempts - 1))
+            print(f"[{self.name.upper()}] Job {job_id} failed ({e}); retrying in {delay:.1f}s")
+            # Keep the lease through the backoff so other processes don't take the retry
+            self._update_job(job_id, {
+                **job, 'attempts': attempts, 'lease_until': time.time() + delay + self.lease
+            })
+            with self._idle:
+                self.retried += 1
+            self._retry_later(job_id, delay)
+            return True
+        
+        with self._idle:
+            self._finished.add(job_id)
+            self.completed += 1
+            self._delay_total += time.time() - job['created']
+        return False
+    
+    def _retry_later(self, job_id: str, delay: float):
+        def fire():
+            self._timers.discard(timer)
+            with self._idle:
+                self._queued_ids.discard(job_id)
+            self._enqueue(job_id)
+        
+        timer = threading.Timer(delay, fire)
+        timer.daemon = True
+        self._timers.add(timer)
+        timer.start()
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until no job is queued or running (retries waiting on a timer
+        don't count), then delete finished jobs from the file
+        
+        Returns:
+            True if the queue went idle within the timeout
+        """
+        with self._idle:
+            idle = self._idle.wait_for(lambda: self._running == 0, timeout=timeout)
+        self._delete_finished()
+        return idle
+    
+    def stats(self) -> dict:
+        """Get pending job count and completion counters"""
+        with self._lock:
+            job_ids = set(self._load()['JOBS'])
+        with self._idle:
+            pending = len(job_ids - self._finished)
+            return {
+                'pending': pending,
+                'queued': self._running,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'retried': self.retried,
+                'failed': self.failed,
+                'replayed': self.replayed,
+                'claim_conflicts': self.claim_conflicts,
+                'avg_delay_s': self._delay_total / self.completed if self.completed else 0.0
+            }
+    
+    def close(self):
+        """Stop the workers (queued jobs are finished first; retries stay on disk)"""
+        self._stop_sweep.set()
+        for timer in list(self._timers):
+            timer.cancel()
+        for _ in range(self.workers):
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self._delete_finished()
+        
+        # Release the leases of retries cut short so the next process takes them at once
+        with self._idle:
+            waiting, self._queued_ids = self._queued_ids, set()
+        if waiting:
+            with self._lock:
+                doc = self._load()
+                jobs = dict(doc['JOBS'])
+                for job_id in waiting:
+                    if job_id in jobs and jobs[job_id].get('owner') == self.owner:
+                        jobs[job_id] = {**jobs[job_id], 'owner': None, 'lease_until': 0}
+                self._save({**doc, 'JOBS': jobs})
@@ -0,0 +1,256 @@
+"""
+Append-only journal for cur_progress.json
+Progress updates append one compact record instead of rewriting the file
+"""
+import json
+import os
+import threading
+from typing import List, Optional
+from .storage import FileLock, atomic_write_json, file_signature
+
+
+class ProgressJournal:
+    """
+    Snapshot + journal storage for learning progress
+    
+    The snapshot is cur_progress.json (plus a JOURNAL_SEQ marker); every
+    update appends one JSON line to the journal. Readers materialize the
+    current state from the snapshot and replay only the journal tail they
+    have not seen yet. compact() folds the journal into a new snapshot.
+    
+    The materialized state is private and updated in place, so applying a
+    record costs only the size of that record. load() hands out a copy made
+    once per change; get_entry() copies a single entry.
+    """
+    
+    SEQ_KEY = 'JOURNAL_SEQ'
+    
+    def __init__(self, snapshot_path: str, journal_path: str, lock: FileLock):
+        """
+        Args:
+            snapshot_path: Path of cur_progress.json
+            journal_path: Path of the append-only journal file
+            lock: Lock shared with every writer of the snapshot
+        """
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self._lock = lock
+        
+        self._state: Optional[dict] = None
+        self._view: Optional[dict] = None  # read-only copy of _state, made on demand
+        self._seq = 0  # last applied record
+        self._snapshot_seq = 0  # last record folded into the snapshot
+        self._snapshot_signature: Optional[tuple] = None
+        self._journal_ino: Optional[int] = None
+        self._journal_offset = 0
+        
+        self._compactor: Optional[threading.Thread] = None
+        self._stop_compactor = threading.Event()
+    
+    # ============ Reading ============
+    
+    def load(self) -> dict:
+        """Get the current progress document (read-only)"""
+        with self._lock:
+            self._sync()
+            if self._view is None:
+                self._view = {
+                    **self._state,
+                    'AI_FEEDBACK': {
+                        ref: self._copy_entry(entry)
+                        for ref, entry in self._state['AI_FEEDBACK'].items()
+                    }
+                }
+            return self._view
+    
+    def get_entry(self, concept_ref: str) -> Optional[dict]:
+        """Get a copy of one progress entry (None if missing)"""
+        with self._lock:
+            self._sync()
+            entry = self._state['AI_FEEDBACK'].get(concept_ref)
+            return self._copy_entry(entry) if entry is not None else None
+    
+    @property
+    def seq(self) -> int:
+        """Sequence number of the last applied record"""
+        with self._lock:
+            self._sync()
+            return self._seq
+    
+    def pending_records(self) -> int:
+        """Number of journal records not yet folded into the snapshot"""
+        with self._lock:
+            self._sync()
+            return self._seq - self._snapshot_seq
+    
+    def _sync(self):
+        """Catch up with the snapshot and journal on disk (lock held)"""
+        snapshot_signature = file_signature(self.snapshot_path)
+        try:
+            journal_stat = os.stat(self.journal_path)
+        except FileNotFoundError:
+            journal_stat = None
+        journal_ino = journal_stat.st_ino if journal_stat else None
+        journal_size = journal_stat.st_size if journal_stat else 0
+        
+        if (self._state is None
+                or snapshot_signature != self._snapshot_signature
+                or journal_ino != self._journal_ino
+                or journal_size < self._journal_offset):
+            self._reload_snapshot(snapshot_signature, journal_ino)
+        
+        if journal_size > self._journal_offset:
+            self._replay_tail()
+    
+    def _reload_snapshot(self, snapshot_signature: Optional[tuple], journal_ino: Optional[int]):
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            state = {"AI_FEEDBACK": {}}
+        
+        self._seq = self._snapshot_seq = state.pop(self.SEQ_KEY, 0)
+        self._set_state(state)
+        self._snapshot_signature = snapshot_signature
+        self._journal_ino = journal_ino
+        self._journal_offset = 0
+    
+    def _replay_tail(self):
+        with open(self.journal_path, 'rb') as f:
+            f.seek(self._journal_offset)
+            data = f.read()
+        
+        complete = data.rfind(b'\n') + 1
+        for line in data[:complete].splitlines():
+            if line.strip():
+                self._apply(json.loads(line))
+        self._journal_offset += complete
+        
+        if complete < len(data):
+            # Writers hold the lock, so a trailing partial line is a torn write
+            # from a crashed process: drop it before anyone appends after it
+            os.truncate(self.journal_path, self._journal_offset)
+    
+    def _apply(self, record: dict):
+        """Apply one journal record to the state in place"""
+        seq = record.get('seq', 0)
+        if seq <= self._seq:
+            return  # already folded into the snapshot
+        
+        concept_ref = record['ref']
+        feedback = self._state['AI_FEEDBACK']
+        if 'entry' in record:
+            feedback[concept_ref] = self._copy_entry(record['entry'])
+        else:
+            entry = feedback.setdefault(concept_ref, {'log': []})
+            entry['freshness'] = record['freshness']
+            entry.setdefault('log', []).extend(record.get('append', []))
+        
+        self._view = None
+        self._seq = seq
+    
+    def _set_state(self, progress: dict):
+        """Take a private copy of a progress document as the state"""
+        self._state = {k: v for k, v in progress.items() if k not in (self.SEQ_KEY, 'AI_FEEDBACK')}
+        self._state['AI_FEEDBACK'] = {
+            ref: self._copy_entry(entry) for ref, entry in progress.get('AI_FEEDBACK', {}).items()
+        }
+        self._view = None
+    
+    @staticmethod
+    def _copy_entry(entry: dict) -> dict:
+        return {**entry, 'log': list(entry.get('log', []))}
+    
+    # ============ Writing ============
+    
+    def set_entry(self, concept_ref: str, entry: dict):
+        """Record a full replacement of one progress entry"""
+        self._append({'ref': concept_ref, 'entry': entry})
+    
+    def append(self, concept_ref: str, freshness: float, log_lines: List[str]):
+        """Record a new freshness value and appended log lines for one entry"""
+        self._append({'ref': concept_ref, 'freshness': freshness, 'append': log_lines})
+    
+    def _append(self, record: dict):
+        with self._lock:
+            self._sync()
+            record = {'seq': self._seq + 1, **record}
+            line = (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+            
+            with open(self.journal_path, 'ab') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+                journal_ino = os.fstat(f.fileno()).st_ino
+            
+            self._apply(record)
+            self._journal_ino = journal_ino
+            self._journal_offset += len(line)
+    
+    def replace(self, progress: dict):
+        """Replace the whole progress document"""
+        with self._lock:
+            self._sync()
+            self._set_state(progress)
+            self._write_snapshot()
+    
+    def compact(self) -> bool:
+        """
+        Fold the journal into a new snapshot
+        
+        Returns:
+            True if there was anything to compact
+        """
+        with self._lock:
+            self._sync()
+            if self._seq == self._snapshot_seq and self._journal_offset == 0:
+                return False
+            self._write_snapshot()
+            print(f"[JOURNAL] Compacted progress journal at seq {self._seq}")
+            return True
+    
+    def _write_snapshot(self):
+        """Write the state as the new snapshot and empty the journal (lock held)"""
+        atomic_write_json(self.snapshot_path, {**self._state, self.SEQ_KEY: self._seq})
+        # A crash here leaves records that the new snapshot already covers;
+        # replay skips them by sequence number
+        if os.path.exists(self.journal_path):
+            os.truncate(self.journal_path, 0)
+        
+        self._snapshot_seq = self._seq
+        self._snapshot_signature = file_signature(self.snapshot_path)
+        self._journal_offset = 0
+    
+    # ============ Background Compaction ============
+    
+    def start_compactor(self, interval: float = 30.0, min_records: int = 200):
+        """
+        Start a daemon thread that compacts the journal periodically
+        
+        Args:
+            interval: Seconds between checks
+            min_records: Compact once at least this many records are pending
+        """
+        if self._compactor is not None:
+            return
+        
+        def run():
+            while not self._stop_compactor.wait(interval):
+                try:
+                    if self.pending_records() >= min_records:
+                        self.compact()
+                except Exception as e:
+                    print(f"[JOURNAL] Compaction failed: {e}")
+        
+        self._stop_compactor.clear()
+        self._compactor = threading.Thread(target=run, name='progress-compactor', daemon=True)
+        self._compactor.start()
+    
+    def stop_compactor(self):
+        """Stop the background compactor thread"""
+        if self._compactor is None:
+            return
+        self._stop_compactor.set()
+        self._compactor.join()
+        self._compactor = None
+
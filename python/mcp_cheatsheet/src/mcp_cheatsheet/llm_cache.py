@@ -0,0 +1,235 @@
+"""
+Content-addressed cache for LLM responses
+In-memory LRU tier plus an optional on-disk tier, with per-tool TTLs
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+from .storage import atomic_write_json
+
+
+# Seconds a response stays valid, per tool (0 disables caching for the tool)
+DEFAULT_TTLS = {
+    'quiz': 24 * 3600,
+    'quiz_batch': 24 * 3600,
+    'evaluate': 7 * 24 * 3600,
+    'instant_feedback': 24 * 3600,
+    'explanation': 7 * 24 * 3600,
+    'intelligent_log': 0,  # depends on the learner's history; must vary
+    'assessment': 0,  # includes a log line, same reason
+    'agent': 0,
+    'pdf_extraction': 30 * 24 * 3600,
+}
+DEFAULT_TTL = 3600
+
+# Request options that don't change the completion
+IGNORED_KEYS = ('stream',)
+
+
+def payload_key(payload: dict) -> str:
+    """
+    Hash a chat completion payload
+    
+    Covers model, messages, temperature, max_tokens and any other request
+    options (e.g. PDF parser plugins), so byte-identical requests share a key.
+    """
+    keyed = {k: v for k, v in payload.items() if k not in IGNORED_KEYS}
+    encoded = json.dumps(keyed, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """
+    Two-tier cache of completion contents keyed by payload hash
+    
+    The memory tier is an LRU bounded by entry count. The disk tier (if a
+    directory is given) stores one small JSON file per key and is pruned
+    oldest-first once it exceeds its entry limit. Each entry expires after
+    the TTL of the tool that produced it.
+    """
+    
+    def __init__(
+        self,
+        max_entries: int = 512,
+        disk_dir: Optional[str] = None,
+        max_disk_entries: int = 5000,
+        ttls: Optional[Dict[str, int]] = None
+    ):
+        """
+        Args:
+            max_entries: Memory tier size
+            disk_dir: Directory for the disk tier (None for memory only)
+            max_disk_entries: Disk tier size
+            ttls: Per-tool TTL overrides in seconds (0 disables a tool)
+        """
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.max_disk_entries = max_disk_entries
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        
+        self._memory: OrderedDict = OrderedDict()  # key -> (expires, content)
+        self._lock = threading.Lock()
+        self._disk_writes = 0
+        self._counters: Dict[str, dict] = {}  # tool -> hit/miss counters
+        
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+    
+    def ttl(self, tool: str) -> int:
+        """TTL in seconds for a tool's responses"""
+        return self.ttls.get(tool, DEFAULT_TTL)
+    
+    # ============ Lookup ============
+    
+    def get(self, key: str, tool: str = 'default') -> Optional[str]:
+        """
+        Look up a cached completion
+        
+        Args:
+            key: payload_key() of the request
+            tool: Tool name for per-tool counters
+        
+        Returns:
+            Cached content, or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    self._count(tool, 'memory_hits')
+                    return entry[1]
+                del self._memory[key]
+        
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is not None and entry['expires'] > now:
+                self._remember(key, entry['expires'], entry['content'])
+                self._count(tool, 'disk_hits')
+                return entry['content']
+            self._count(tool, 'misses')
+        return None
+    
+    def put(self, key: str, content: str, tool: str = 'default'):
+        """Store a completion under the tool's TTL (no-op if the TTL is 0)"""
+        ttl = self.ttl(tool)
+        if ttl <= 0:
+            return
+        expires = time.time() + ttl
+        
+        with self._lock:
+            self._remember(key, expires, content)
+            self._count(tool, 'stores')
+        
+        if self.disk_dir:
+            try:
+                atomic_write_json(self._disk_path(key), {
+                    'tool': tool, 'expires': expires, 'content': content
+                })
+            except OSError as e:
+                print(f"[LLM_CACHE] Failed to write disk entry: {e}")
+                return
+            with self._lock:
+                self._disk_writes += 1
+                prune = self._disk_writes % 100 == 0
+            if prune:
+                self._prune_disk()
+    
+    def clear(self):
+        """Drop every entry from both tiers"""
+        with self._lock:
+            self._memory.clear()
+        if self.disk_dir:
+            for name in os.listdir(self.disk_dir):
+                if name.endswith('.json'):
+                    _unlink(os.path.join(self.disk_dir, name))
+    
+    def _remember(self, key: str, expires: float, content: str):
+        """Insert into the memory tier (lock held)"""
+        self._memory[key] = (expires, content)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+    
+    # ============ Disk Tier ============
+    
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+    
+    def _read_disk(self, key: str) -> Optional[dict]:
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+    
+    def _prune_disk(self):
+        """Remove expired entries, then the oldest ones beyond max_disk_entries"""
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.disk_dir):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.disk_dir, name)
+            try:
+                entries.append((os.stat(path).st_mtime, path))
+            except FileNotFoundError:
+                continue
+        entries.sort()
+        
+        excess = len(entries) - self.max_disk_entries
+        for i, (mtime, path) in enumerate(entries):
+            if i < excess:
+                _unlink(path)
+                continue
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    expired = json.load(f)['expires'] <= now
+            except (FileNotFoundError, json.JSONDecodeError, KeyError):
+                expired = True
+            if expired:
+                _unlink(path)
+    
+    # ============ Stats ============
+    
+    def _count(self, tool: str, counter: str):
+        """Bump a per-tool counter (lock held)"""
+        counters = self._counters.setdefault(tool, {
+            'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0
+        })
+        counters[counter] += 1
+    
+    def stats(self) -> dict:
+        """Get hit-rate counters per tool and overall"""
+        with self._lock:
+            tools = {tool: dict(c) for tool, c in self._counters.items()}
+            entries = len(self._memory)
+        
+        for counters in tools.values():
+            lookups = counters['memory_hits'] + counters['disk_hits'] + counters['misses']
+            counters['hit_rate'] = (lookups - counters['misses']) / lookups if lookups else 0.0
+        
+        hits = sum(c['memory_hits'] + c['disk_hits'] for c in tools.values())
+        misses = sum(c['misses'] for c in tools.values())
+        return {
+            'entries': entries,
+            'disk': self.disk_dir is not None,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+            'tools': tools
+        }
+
+
+def _unlink(path: str):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
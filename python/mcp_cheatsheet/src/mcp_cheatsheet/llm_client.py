@@ -0,0 +1,597 @@
+"""
+Shared OpenRouter client
+One keep-alive HTTP session with a sized connection pool for every LLM call
+"""
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from .circuit_breaker import CLOSED, CircuitBreaker
+from .deadline import Deadline
+from .llm_cache import LLMCache, payload_key
+from .model_router import ModelRouter
+from .rate_limit import NORMAL, TOOL_PRIORITIES, RateLimitScheduler, parse_retry_after
+
+
+# Responses worth retrying after a backoff
+RETRY_STATUSES = (429, 502, 503, 504)
+
+
+class LLMError(Exception):
+    """Raised when an LLM call fails (transport error, non-200 or malformed response)"""
+    
+    def __init__(self, message: str, status_code: Optional[int] = None, body: str = ''):
+        super().__init__(message)
+        self.status_code = status_code
+        self.body = body
+
+
+class DeadlineExceeded(LLMError):
+    """Raised when a call's request deadline has run out (before or during the call)"""
+
+
+class CircuitOpen(LLMError):
+    """Raised instead of sending a call while the circuit breaker is open"""
+
+
+class LLMClient:
+    """
+    Client for OpenRouter chat completions
+    
+    All calls share one requests.Session, so TCP+TLS connections are kept
+    alive and reused across calls and threads. Tracks connection reuse and
+    per-tool latency. complete() answers byte-identical requests from an
+    optional response cache; stream() yields the completion token by token
+    as OpenRouter sends it. With a scheduler, every request waits for a
+    rate-limit slot in priority order and throttled requests are retried
+    with backoff.
+    
+    Every request has a connect and read timeout. Inside a deadline()
+    block both are capped by the deadline's remaining budget, and a call
+    made after the deadline has passed fails fast with DeadlineExceeded
+    so the caller takes its fallback path.
+    
+    With hedging on, a complete() call still unanswered after the
+    hedge_percentile of its tool's recent latency is sent a second time,
+    and whichever copy answers first wins. With a circuit breaker, a burst
+    of failed calls makes every call fail fast with CircuitOpen for a
+    cooldown, so callers fall back locally instead of queueing up behind
+    a provider that is down.
+    
+    complete() and stream() fill in each call's model, max_tokens and
+    temperature from the router's route for its tool, and report its
+    latency and token usage back to the router.
+    """
+    
+    def __init__(
+        self, 
+        api_key: str, 
+        openrouter_url: str, 
+        pool_size: int = 10, 
+        cache: Optional[LLMCache] = None, 
+        scheduler: Optional[RateLimitScheduler] = None, 
+        timeout: float = 60.0, 
+        connect_timeout: float = 5.0, 
+        hedge_percentile: Optional[float] = None, 
+        hedge_min_samples: int = 20, 
+        breaker: Optional[CircuitBreaker] = None, 
+        router: Optional[ModelRouter] = None
+    ):
+        """
+        Args:
+            api_key: OpenRouter API key
+            openrouter_url: Chat completions endpoint
+            pool_size: Maximum keep-alive connections (concurrent calls)
+            cache: Response cache for complete() (None to disable)
+            scheduler: Rate limiter every request passes through (None for no limit)
+            timeout: Read timeout of a call in seconds
+            connect_timeout: Connect timeout of a call in seconds
+            hedge_percentile: Latency percentile after which complete()
+                sends a duplicate request (None to disable hedging)
+            hedge_min_samples: Recent calls of a tool needed before its
+                calls are hedged
+            breaker: Circuit breaker every request passes through (None to disable)
+            router: Per-tool model routes (defaults to DEFAULT_ROUTES)
+        """
+        self.api_key = api_key
+        self.openrouter_url = openrouter_url
+        self.cache = cache
+        self.scheduler = scheduler
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker = breaker
+        self.router = router or ModelRouter()
+        self._local = threading.local()  # per-thread priority override and deadline
+        
+        self.session = requests.Session()
+        self._adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=False)
+        self.session.mount('https://', self._adapter)
+        self.session.mount('http://', self._adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        })
+        
+        self._stats_lock = threading.Lock()
+        self._calls = 0
+        self._errors = 0
+        self._deadline_exceeded = 0
+        self._latency: Dict[str, dict] = {}  # tool -> latency stats
+        self._recent = deque(maxlen=200)  # recent latencies (seconds), all tools
+        self._recent_by_tool: Dict[str, deque] = {}  # tool -> recent successful complete() latencies
+        self._hedged = 0
+        self._hedge_wins = 0
+        
+        self._hedge_pool = None
+        if hedge_percentile is not None:
+            self._hedge_pool = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='llm-hedge')
+    
+    # ============ Calls ============
+    
+    @contextmanager
+    def priority(self, level: int):
+        """Run this thread's LLM calls at a given scheduler priority"""
+        previous = getattr(self._local, 'priority', None)
+        self._local.priority = level
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+    
+    @contextmanager
+    def deadline(self, deadline: Optional[Deadline]):
+        """
+        Bound this thread's LLM calls by a request deadline
+        
+        Args:
+            deadline: Deadline of the request being served (None leaves
+                the current one in place)
+        """
+        previous = getattr(self._local, 'deadline', None)
+        if deadline is not None:
+            self._local.deadline = deadline
+        try:
+            yield
+        finally:
+            self._local.deadline = previous
+    
+    def current_deadline(self) -> Optional[Deadline]:
+        """Deadline of this thread's deadline() block, if any"""
+        return getattr(self._local, 'deadline', None)
+    
+    def _check_deadline(self, tool: str) -> Optional[Deadline]:
+        """Raise DeadlineExceeded if this thread's deadline has passed"""
+        deadline = self.current_deadline()
+        if deadline is not None and deadline.expired:
+            raise self._deadline_error(f"Request deadline exceeded before {tool} call")
+        return deadline
+    
+    def _deadline_error(self, message: str) -> DeadlineExceeded:
+        with self._stats_lock:
+            self._deadline_exceeded += 1
+        return DeadlineExceeded(message)
+    
+    def post(
+        self, 
+        payload: dict, 
+        tool: str = 'default', 
+        priority: Optional[int] = None, 
+        **kwargs
+    ) -> requests.Response:
+        """
+        POST a chat completion payload through the shared session
+        
+        Args:
+            payload: OpenRouter request body
+            tool: Name used for latency stats and the default priority
+            priority: Scheduler priority (defaults to the thread's
+                priority() block, then the tool's priority)
+            **kwargs: Extra arguments for Session.post (an explicit timeout
+                overrides the client's and the deadline's)
+        
+        Returns:
+            The HTTP response (any status; the last one if retries ran out,
+            or the last one before the deadline)
+        
+        Raises:
+            DeadlineExceeded: If the deadline passes before the call is sent
+                or while it runs
+            CircuitOpen: If the circuit breaker is open
+            requests.RequestException: On other transport errors
+        """
+        if priority is None:
+            priority = getattr(self._local, 'priority', None)
+        if priority is None:
+            priority = TOOL_PRIORITIES.get(tool, NORMAL)
+        
+        explicit_timeout = kwargs.pop('timeout', None)
+        attempt = 0
+        while True:
+            deadline = self._check_deadline(tool)
+            if self.breaker is not None and not self.breaker.allow():
+                raise CircuitOpen(f"LLM circuit open; skipping {tool} call")
+            if self.scheduler is not None:
+                if not self.scheduler.acquire(priority, timeout=deadline.remaining() if deadline else None):
+                    raise self._deadline_error(f"Request deadline exceeded waiting to send {tool} call")
+            
+            timeout = explicit_timeout
+            if timeout is None:
+                timeout = ((self.connect_timeout, self.timeout) if deadline is None
+                           else deadline.timeout(self.connect_timeout, self.timeout))
+            
+            start = time.monotonic()
+            try:
+                response = self.session.post(self.openrouter_url, json=payload, timeout=timeout, **kwargs)
+            except requests.RequestException as e:
+                self._record(tool, time.monotonic() - start, ok=False)
+                if isinstance(e, requests.Timeout) and deadline is not None and deadline.expired:
+                    # Our budget ran out, which says nothing about the provider
+                    raise self._deadline_error(f"Request deadline exceeded during {tool} call") from e
+                if self.breaker is not None:
+                    self.breaker.record_failure()
+                raise
+            elapsed = time.monotonic() - start
+            self._record(tool, elapsed, ok=response.status_code == 200)
+            if response.status_code == 200 and not kwargs.get('stream'):
+                self._record_sample(tool, elapsed)
+            if self.breaker is not None:
+                if response.status_code in RETRY_STATUSES or response.status_code >= 500:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+            
+            if (self.scheduler is None
+                    or response.status_code not in RETRY_STATUSES
+                    or attempt >= self.scheduler.max_retries):
+                return response
+            
+            delay = self.scheduler.backoff(attempt, parse_retry_after(response.headers.get('Retry-After')))
+            if deadline is not None and delay >= deadline.remaining():
+                return response  # no time left to wait out the backoff
+            print(f"[LLM] {tool} got HTTP {response.status_code}; retrying in {delay:.1f}s")
+            response.close()
+            time.sleep(delay)
+            attempt += 1
+    
+    def complete(self, payload: dict, tool: str = 'default', cache: bool = True, **kwargs) -> str:
+        """
+        Run a chat completion and return the message content
+        
+        Args:
+            payload: OpenRouter request body
+            tool: Name used for latency stats and cache TTLs
+            cache: Set False for calls that must return a fresh completion
+            **kwargs: Extra arguments for Session.post (e.g. timeout)
+        
+        Returns:
+            Content of the first choice's message
+        
+        Raises:
+            LLMError: On transport errors, non-200 or malformed responses
+                (DeadlineExceeded once the thread's deadline has passed)
+        """
+        payload = self.router.apply(payload, tool)
+        key = None
+        if cache and self.cache is not None and self.cache.ttl(tool) > 0:
+            key = payload_key(payload)
+            content = self.cache.get(key, tool)
+            if content is not None:
+                return content
+        
+        start = time.monotonic()
+        try:
+            hedge_after = self._hedge_delay(tool)
+            if hedge_after is not None:
+                response = self._post_hedged(payload, tool, hedge_after, **kwargs)
+            else:
+                response = self.post(payload, tool, **kwargs)
+        except requests.RequestException as e:
+            raise LLMError(f"LLM request failed: {e}") from e
+        
+        if response.status_code != 200:
+            raise LLMError(
+                f"LLM API call failed: {response.status_code}",
+                status_code=response.status_code,
+                body=response.text
+            )
+        
+        content, usage = self._parse_completion(response, tool)
+        self.router.record(tool, payload.get('model'), time.monotonic() - start, usage)
+        if key is not None and content:
+            self.cache.put(key, content, tool)
+        return content
+    
+    def _parse_completion(self, response: requests.Response, tool: str) -> tuple:
+        """
+        (content, usage) of a 200 chat completion response
+        
+        Raises:
+            LLMError: If the body is not a completion (HTML, truncated JSON,
+                an error object or missing choices); counted as a breaker failure
+        """
+        try:
+            result = response.json()
+            error = result.get('error')
+            if error:
+                message = error.get('message', error) if isinstance(error, dict) else error
+                raise LLMError(
+                    f"LLM API call failed: {message}",
+                    status_code=response.status_code,
+                    body=response.text
+                )
+            content = result['choices'][0]['message'].get('content') or ''
+            usage = result.get('usage')
+        except LLMError:
+            if self.breaker is not None:
+                self.breaker.record_failure()
+            raise
+        except (ValueError, KeyError, IndexError, TypeError, AttributeError) as e:
+            if self.breaker is not None:
+                self.breaker.record_failure()
+            raise LLMError(
+                f"LLM {tool} call returned a malformed response: {e!r}",
+                status_code=response.status_code,
+                body=response.text[:500]
+            ) from e
+        return content, usage
+    
+    def stream(self, payload: dict, tool: str = 'default', cache: bool = True, **kwargs) -> Iterator[str]:
+        """
+        Run a chat completion with stream: true and yield content deltas
+        
+        Throttled responses are retried before any token is yielded, so a
+        retry never repeats text. A cache hit is yielded as one delta, and
+        a completed stream is stored like a complete() result.
+        
+        Args:
+            payload: OpenRouter request body (stream is set here)
+            tool: Name used for latency stats and cache TTLs
+            cache: Set False for calls that must return a fresh completion
+            **kwargs: Extra arguments for Session.post (e.g. timeout)
+        
+        Yields:
+            Content deltas in arrival order
+        
+        Raises:
+            LLMError: On transport errors, non-200 responses or an error
+                event in the stream (DeadlineExceeded if the thread's
+                deadline passes before the stream ends)
+        """
+        payload = self.router.apply(payload, tool)
+        key = None
+        if cache and self.cache is not None and self.cache.ttl(tool) > 0:
+            key = payload_key(payload)
+            content = self.cache.get(key, tool)
+            if content is not None:
+                yield content
+                return
+        
+        start = time.monotonic()
+        try:
+            response = self.post({**payload, 'stream': True}, tool, stream=True, **kwargs)
+        except requests.RequestException as e:
+            raise LLMError(f"LLM request failed: {e}") from e
+        
+        parts = []
+        usage = None
+        try:
+            if response.status_code != 200:
+                raise LLMError(
+                    f"LLM API call failed: {response.status_code}",
+                    status_code=response.status_code,
+                    body=response.text
+                )
+            
+            response.encoding = 'utf-8'
+            for line in response.iter_lines(decode_unicode=True):
+                # Blank lines separate events; ':' lines are keep-alive comments
+                if not line or not line.startswith('data:'):
+                    continue
+                data = line[5:].strip()
+                if data == '[DONE]':
+                    break
+                
+                try:
+                    chunk = json.loads(data)
+                except json.JSONDecodeError:
+                    continue
+                if not isinstance(chunk, dict):
+                    continue
+                error = chunk.get('error')
+                if error:
+                    message = error.get('message', error) if isinstance(error, dict) else error
+                    raise LLMError(f"LLM stream failed: {message}")
+                self._check_deadline(tool)
+                usage = chunk.get('usage') or usage  # sent with the last chunk
+                
+                choice = (chunk.get('choices') or [{}])[0]
+                delta = (choice.get('delta') or {}).get('content') or ''
+                if delta:
+                    if not parts:
+                        self._record_first_token(tool, time.monotonic() - start)
+                    parts.append(delta)
+                    yield delta
+        except requests.RequestException as e:
+            self._check_deadline(tool)
+            raise LLMError(f"LLM stream interrupted: {e}") from e
+        finally:
+            response.close()
+        
+        self.router.record(tool, payload.get('model'), time.monotonic() - start, usage)
+        if key is not None and parts:
+            self.cache.put(key, ''.join(parts), tool)
+    
+    # ============ Hedging ============
+    
+    def _hedge_delay(self, tool: str) -> Optional[float]:
+        """Seconds after which a tool's call is hedged, None if it shouldn't be"""
+        if self._hedge_pool is None:
+            return None
+        if self.breaker is not None and self.breaker.state != CLOSED:
+            return None  # don't double the load on a struggling provider
+        with self._stats_lock:
+            samples = self._recent_by_tool.get(tool)
+            if not samples or len(samples) < self.hedge_min_samples:
+                return None
+        return self.latency_percentile(self.hedge_percentile, tool)
+    
+    def _post_hedged(self, payload: dict, tool: str, hedge_after: float, **kwargs) -> requests.Response:
+        """
+        post() with a duplicate request sent if the first is slower than hedge_after
+        
+        Returns:
+            The first 200 response, else the first response to arrive
+        
+        Raises:
+            The first copy's exception if both copies raise
+        """
+        # Worker threads don't see this thread's priority() and deadline() blocks
+        priority = getattr(self._local, 'priority', None)
+        deadline = self.current_deadline()
+        
+        def send():
+            with self.deadline(deadline):
+                return self.post(payload, tool, priority=priority, **kwargs)
+        
+        primary = self._hedge_pool.submit(send)
+        done, _ = wait([primary], timeout=hedge_after)
+        if done:
+            return primary.result()
+        
+        hedge = self._hedge_pool.submit(send)
+        with self._stats_lock:
+            self._hedged += 1
+        print(f"[LLM] {tool} call slower than {hedge_after:.1f}s; sent a hedge request")
+        
+        pending = {primary, hedge}
+        first_response, first_error = None, None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except Exception as e:
+                    first_error = first_error or e
+                    continue
+                if response.status_code == 200:
+                    if future is hedge:
+                        with self._stats_lock:
+                            self._hedge_wins += 1
+                    # Runs at once for a copy that already finished
+                    for other in {primary, hedge} - {future}:
+                        other.add_done_callback(self._close_response)
+                    return response
+                if first_response is None:
+                    first_response = response
+        
+        if first_response is not None:
+            return first_response
+        raise first_error
+    
+    @staticmethod
+    def _close_response(future):
+        """Release the connection of a hedge that lost the race"""
+        if not future.cancelled() and future.exception() is None:
+            future.result().close()
+    
+    def close(self):
+        """Close pooled connections"""
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False)
+        self.session.close()
+    
+    # ============ Stats ============
+    
+    def _record(self, tool: str, seconds: float, ok: bool):
+        with self._stats_lock:
+            self._calls += 1
+            if not ok:
+                self._errors += 1
+            self._recent.append(seconds)
+            
+            stats = self._latency.setdefault(tool, {
+                'calls': 0, 'errors': 0, 'total_s': 0.0, 'max_s': 0.0, 'last_s': 0.0
+            })
+            stats['calls'] += 1
+            if not ok:
+                stats['errors'] += 1
+            stats['total_s'] += seconds
+            stats['max_s'] = max(stats['max_s'], seconds)
+            stats['last_s'] = seconds
+    
+    def _record_first_token(self, tool: str, seconds: float):
+        """Record the time from sending a streamed request to its first token"""
+        with self._stats_lock:
+            stats = self._latency.setdefault(tool, {
+                'calls': 0, 'errors': 0, 'total_s': 0.0, 'max_s': 0.0, 'last_s': 0.0
+            })
+            stats['streams'] = stats.get('streams', 0) + 1
+            stats['first_token_total_s'] = stats.get('first_token_total_s', 0.0) + seconds
+            stats['first_token_last_s'] = seconds
+    
+    def _record_sample(self, tool: str, seconds: float):
+        """Record a successful complete() latency for the tool's percentiles"""
+        with self._stats_lock:
+            self._recent_by_tool.setdefault(tool, deque(maxlen=100)).append(seconds)
+    
+    def latency_percentile(self, percentile: float, tool: Optional[str] = None) -> Optional[float]:
+        """
+        Latency (seconds) at a percentile of recent calls, None if no calls yet
+        
+        Args:
+            percentile: 0-100
+            tool: Only count this tool's successful complete() calls
+        """
+        with self._stats_lock:
+            samples = sorted(self._recent if tool is None else self._recent_by_tool.get(tool, ()))
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(len(samples) * percentile / 100))
+        return samples[index]
+    
+    def stats(self) -> dict:
+        """Get connection reuse and per-tool latency stats"""
+        pools = []
+        if self._adapter.poolmanager is not None:
+            container = self._adapter.poolmanager.pools
+            # The pool container refuses direct iteration; keys() is thread-safe
+            pools = [container[key] for key in container.keys() if key in container]
+        new_connections = sum(getattr(pool, 'num_connections', 0) for pool in pools)
+        http_requests = sum(getattr(pool, 'num_requests', 0) for pool in pools)
+        
+        with self._stats_lock:
+            per_tool = {
+                tool: {
+                    **s,
+                    'avg_s': s['total_s'] / s['calls'] if s['calls'] else 0.0,
+                    **({'first_token_avg_s': s['first_token_total_s'] / s['streams']}
+                       if s.get('streams') else {})
+                }
+                for tool, s in self._latency.items()
+            }
+            calls, errors = self._calls, self._errors
+            deadline_exceeded = self._deadline_exceeded
+            hedged, hedge_wins = self._hedged, self._hedge_wins
+        
+        return {
+            'calls': calls,
+            'errors': errors,
+            'deadline_exceeded': deadline_exceeded,
+            'hedged': hedged,
+            'hedge_wins': hedge_wins,
+            'circuit': self.breaker.stats() if self.breaker is not None else None,
+            'routes': self.router.stats(),
+            'connections_opened': new_connections,
+            'connections_reused': max(http_requests - new_connections, 0),
+            'p50_s': self.latency_percentile(50),
+            'p95_s': self.latency_percentile(95),
+            'tools': per_tool,
+            'cache': self.cache.stats() if self.cache is not None else None
+        }
@@ -0,0 +1,171 @@
+"""
+Local fast-path grading for short answers
+Scores an answer by similarity to the expected answer and concept text;
+only answers in the uncertain band go on to the LLM
+"""
+import re
+import threading
+from typing import List, Optional
+from .models import EvaluationResult
+from .text_similarity import TfidfModel, term_forms, tokenize
+
+
+# Answers that say nothing, whatever the question
+NON_ANSWERS = re.compile(
+    r"^\s*(?:i\s+(?:do\s*n[o']?t|dont)\s+know|idk|no\s+idea|not\s+sure|pass|skip|n/?a|\?+|-+|\.+)\s*[.!?]*\s*$",
+    re.IGNORECASE
+)
+
+
+class LocalGrader:
+    """
+    Grades short answers without an LLM when the result is clear-cut
+    
+    The local score (0-1) blends three signals:
+        overlap  - share of the reference's content words the answer uses
+        cosine   - TF-IDF cosine between the answer and the reference (or
+                   the concept text, whichever is closer)
+        coverage - share of the reference's top keywords the answer mentions
+    The reference is the quiz's expected answer, or the concept's text if
+    there is none. An answer scoring at least accept_threshold is graded
+    correct, one at or below reject_threshold (or an empty/non-answer)
+    incorrect; anything in between returns None so the caller asks the LLM.
+    """
+    
+    def __init__(
+        self,
+        accept_threshold: float = 0.8,
+        reject_threshold: float = 0.15,
+        keywords: int = 5,
+        weights: tuple = (0.3, 0.4, 0.3)
+    ):
+        """
+        Args:
+            accept_threshold: Local score at or above which an answer is correct
+            reject_threshold: Local score at or below which an answer is incorrect
+            keywords: Reference keywords checked for coverage
+            weights: (overlap, cosine, coverage) weights, summing to 1
+        """
+        if not 0 <= reject_threshold < accept_threshold <= 1:
+            raise ValueError("Grader thresholds must satisfy 0 <= reject < accept <= 1")
+        self.accept_threshold = accept_threshold
+        self.reject_threshold = reject_threshold
+        self.keywords = keywords
+        self.weights = weights
+        
+        self._lock = threading.Lock()
+        self.accepted = 0
+        self.rejected = 0
+        self.uncertain = 0
+    
+    def score(self, model: TfidfModel, answer: str, reference: str, context: Optional[str] = None) -> dict:
+        """
+        Compute the local similarity signals
+        
+        Args:
+            model: TF-IDF model fitted on the course's concepts
+            answer: Student answer
+            reference: Expected answer or concept text
+            context: Concept text, if the reference is an expected answer
+        
+        Returns:
+            Dict with overlap, cosine, coverage, score and the missing
+            keywords (as written in the reference)
+        """
+        answer_terms = set(tokenize(answer))
+        reference_terms = set(tokenize(reference))
+        keywords = model.keywords(reference, self.keywords)
+        
+        overlap = len(answer_terms & reference_terms) / len(reference_terms) if reference_terms else 0.0
+        similarity = model.similarity(answer, reference)
+        if context:
+            similarity = max(similarity, model.similarity(answer, context))
+        covered = [k for k in keywords if k in answer_terms]
+        coverage = len(covered) / len(keywords) if keywords else 0.0
+        
+        w_overlap, w_cosine, w_coverage = self.weights
+        forms = term_forms(reference)
+        return {
+            'overlap': overlap,
+            'cosine': similarity,
+            'coverage': coverage,
+            'score': w_overlap * overlap + w_cosine * similarity + w_coverage * coverage,
+            'missing': [forms.get(k, k) for k in keywords if k not in answer_terms]
+        }
+    
+    def grade(
+        self,
+        model: TfidfModel,
+        answer: str,
+        concept_title: str,
+        concept_content: List[str],
+        expected_answer: Optional[str] = None
+    ) -> Optional[EvaluationResult]:
+        """
+        Grade an answer locally if the result is clear-cut
+        
+        Args:
+            model: TF-IDF model fitted on the course's concepts
+            answer: Student answer
+            concept_title: Concept title
+            concept_content: Concept content lines
+            expected_answer: The quiz's expected answer, if known
+        
+        Returns:
+            EvaluationResult, or None if the LLM should decide
+        """
+        if not tokenize(answer) or NON_ANSWERS.match(answer or ''):
+            self._count('rejected')
+            return EvaluationResult(
+                score=0,
+                is_correct=False,
+                feedback=f"No answer given yet. Review {concept_title} and try putting the key idea in your own words."
+            )
+        
+        concept_text = ' '.join([concept_title, *concept_content])
+        if expected_answer:
+            signals = self.score(model, answer, expected_answer, context=concept_text)
+        else:
+            signals = self.score(model, answer, concept_text)
+        local_score = signals['score']
+        
+        if local_score >= self.accept_threshold:
+            self._count('accepted')
+            return EvaluationResult(
+                score=min(100, round(local_score * 100)),
+                is_correct=True,
+                feedback="Correct! Your answer covers the key points."
+            )
+        
+        if local_score <= self.reject_threshold:
+            self._count('rejected')
+            hint = ', '.join(signals['missing'][:2])
+            feedback = f"Not quite. Review {concept_title}"
+            feedback += f", focusing on: {hint}." if hint else "."
+            return EvaluationResult(
+                score=round(local_score * 100),
+                is_correct=False,
+                feedback=feedback
+            )
+        
+        self._count('uncertain')
+        return None
+    
+    def _count(self, outcome: str):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+    
+    def stats(self) -> dict:
+        """Get how many evaluations were resolved without the LLM"""
+        with self._lock:
+            total = self.accepted + self.rejected + self.uncertain
+            local = self.accepted + self.rejected
+            return {
+                'evaluations': total,
+                'accepted': self.accepted,
+                'rejected': self.rejected,
+                'sent_to_llm': self.uncertain,
+                'resolved_locally': local / total if total else 0.0,
+                'accept_threshold': self.accept_threshold,
+                'reject_threshold': self.reject_threshold
+            }
@@ -0,0 +1,90 @@
+"""
+One-shot migration from the JSON data files to the SQLite backend
+
+Usage:
+    python -m mcp_cheatsheet.migrate --data-dir data [--output data/cheatsheet.db] [--force]
+"""
+import argparse
+import os
+import sys
+from typing import Optional
+from .database import Database
+from .sqlite_database import SQLiteDatabase
+
+
+def migrate_json_to_sqlite(
+    data_dir: str,
+    sqlite_path: Optional[str] = None,
+    force: bool = False
+) -> dict:
+    """
+    Import db.json, cur_progress.json and knowledge_distributed_map.json
+    into a SQLite database
+    
+    The progress journal is compacted into cur_progress.json first.
+    
+    Args:
+        data_dir: Directory holding the JSON files
+        sqlite_path: Target SQLite file (defaults to <data_dir>/cheatsheet.db)
+        force: Replace the contents of an existing SQLite database
+    
+    Returns:
+        Counts of imported courses, concepts, progress entries and log lines,
+        and the journal sequence number the progress was taken at
+    
+    Raises:
+        FileExistsError: If the target exists and force is False
+    """
+    sqlite_path = sqlite_path or os.path.join(data_dir, 'cheatsheet.db')
+    if os.path.exists(sqlite_path) and not force:
+        raise FileExistsError(f"{sqlite_path} already exists (use --force to replace its contents)")
+    
+    # Journaled, so answers still in cur_progress.journal are carried over
+    source = Database(data_dir, journaled=True)
+    with source.lock(source.progress_path):
+        source.journal.compact()
+        progress = source.load_progress()
+        journal_seq = source.journal.seq
+        if source.journal.pending_records():
+            raise RuntimeError(f"Progress journal still has records after seq {journal_seq}")
+    db = source.load_db()
+    knowledge_map = source.load_knowledge_map()
+    
+    target = SQLiteDatabase(sqlite_path)
+    target.import_documents(db, progress, knowledge_map)
+    target.close()
+    
+    feedback = progress.get('AI_FEEDBACK', {})
+    return {
+        'courses': len(db.get('COURSES', {})),
+        'concepts': sum(len(concepts) for concepts in db.get('COURSES', {}).values()),
+        'progress_entries': len(feedback),
+        'log_lines': sum(len(entry.get('log', [])) for entry in feedback.values()),
+        'journal_seq': journal_seq,
+        'sqlite_path': sqlite_path
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Migrate CheatSheet JSON data files to SQLite")
+    parser.add_argument('--data-dir', required=True, help="Directory holding db.json and friends")
+    parser.add_argument('--output', help="SQLite file to create (default: <data-dir>/cheatsheet.db)")
+    parser.add_argument('--force', action='store_true', help="Replace an existing SQLite database")
+    args = parser.parse_args(argv)
+    
+    try:
+        counts = migrate_json_to_sqlite(args.data_dir, args.output, args.force)
+    except FileExistsError as e:
+        print(f"[MIGRATE] {e}", file=sys.stderr)
+        return 1
+    
+    print(f"[MIGRATE] Wrote {counts['sqlite_path']}")
+    print(f"[MIGRATE] {counts['courses']} courses, {counts['concepts']} concepts, "
+          f"{counts['progress_entries']} progress entries, {counts['log_lines']} log lines "
+          f"(journal seq {counts['journal_seq']})")
+    print("[MIGRATE] Set CHEATSHEET_DB_BACKEND=sqlite to use it")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Per-tool model routing
+Picks the model, max_tokens and temperature of each LLM call by tool, and
+tracks latency, token usage and cost per route
+"""
+import threading
+from typing import Dict, Optional
+
+
+DEFAULT_MODEL = "openai/gpt-4o"
+
+# Request options per tool (None leaves the option to the provider's default)
+DEFAULT_ROUTES = {
+    'quiz': {'temperature': 0.7},
+    'quiz_batch': {'temperature': 0.7},
+    'evaluate': {'temperature': 0.3},
+    'assessment': {'max_tokens': 350, 'temperature': 0.3},
+    'instant_feedback': {'max_tokens': 80, 'temperature': 0.7},
+    'explanation': {'max_tokens': 300, 'temperature': 0.5},
+    'intelligent_log': {'max_tokens': 200, 'temperature': 0.7},
+    'pdf_extraction': {},
+    'agent': {'max_tokens': 4000, 'temperature': 0.7},
+}
+
+ROUTE_KEYS = ('model', 'max_tokens', 'temperature')
+
+
+class ModelRouter:
+    """
+    Routing table from tool name to request options
+    
+    apply() fills in the route's model, max_tokens and temperature; options
+    the caller already set in the payload win. It also asks OpenRouter for
+    usage accounting so each response carries its token counts and cost.
+    Each route may also carry prices (USD per million prompt/completion
+    tokens) to cost calls whose response doesn't report a cost itself.
+    """
+    
+    def __init__(self, routes: Optional[Dict[str, dict]] = None, default_model: str = DEFAULT_MODEL):
+        """
+        Args:
+            routes: tool -> {model, max_tokens, temperature, prompt_price,
+                completion_price}, merged over DEFAULT_ROUTES
+            default_model: Model of routes that don't name one
+        """
+        self.default_model = default_model
+        self.routes: Dict[str, dict] = {}
+        for tool in {*DEFAULT_ROUTES, *(routes or {})}:
+            route = {**DEFAULT_ROUTES.get(tool, {}), **(routes or {}).get(tool, {})}
+            route['model'] = route.get('model') or default_model
+            self.routes[tool] = route
+        
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, dict] = {}  # tool -> usage counters
+    
+    def route(self, tool: str) -> dict:
+        """Request options of a tool (the default model for unknown tools)"""
+        return self.routes.get(tool) or {'model': self.default_model}
+    
+    def apply(self, payload: dict, tool: str) -> dict:
+        """Payload with the tool's route filled in"""
+        route = self.route(tool)
+        options = {k: route[k] for k in ROUTE_KEYS if route.get(k) is not None and k not in payload}
+        if 'usage' not in payload:
+            options['usage'] = {'include': True}  # OpenRouter then reports tokens and cost
+        return {**payload, **options}
+    
+    def record(self, tool: str, model: str, seconds: float, usage: Optional[dict]):
+        """
+        Record one completed call
+        
+        Args:
+            tool: Route the call went through
+            model: Model the request asked for
+            seconds: Time from sending the request to the full response
+            usage: Response usage block (prompt_tokens, completion_tokens,
+                and cost when the provider reports it)
+        """
+        usage = usage or {}
+        prompt_tokens = usage.get('prompt_tokens') or 0
+        completion_tokens = usage.get('completion_tokens') or 0
+        cost = usage.get('cost')
+        if cost is None:
+            route = self.route(tool)
+            if route.get('prompt_price') is not None or route.get('completion_price') is not None:
+                cost = (prompt_tokens * (route.get('prompt_price') or 0)
+                        + completion_tokens * (route.get('completion_price') or 0)) / 1_000_000
+        
+        with self._lock:
+            metrics = self._metrics.setdefault(tool, {
+                'model': model, 'calls': 0, 'total_s': 0.0, 'prompt_tokens': 0,
+                'completion_tokens': 0, 'cost_usd': 0.0, 'costed_calls': 0
+            })
+            metrics['model'] = model
+            metrics['calls'] += 1
+            metrics['total_s'] += seconds
+            metrics['prompt_tokens'] += prompt_tokens
+            metrics['completion_tokens'] += completion_tokens
+            if cost is not None:
+                metrics['cost_usd'] += cost
+                metrics['costed_calls'] += 1
+    
+    def stats(self) -> dict:
+        """Get each route's options with its latency, token and cost totals"""
+        with self._lock:
+            metrics = {tool: dict(m) for tool, m in self._metrics.items()}
+        
+        stats = {}
+        for tool in sorted({*self.routes, *metrics}):
+            route = self.route(tool)
+            m = metrics.get(tool)
+            stats[tool] = {
+                **{k: route.get(k) for k in ROUTE_KEYS},
+                **({
+                    'served_by': m['model'],
+                    'calls': m['calls'],
+                    'avg_s': m['total_s'] / m['calls'],
+                    'prompt_tokens': m['prompt_tokens'],
+                    'completion_tokens': m['completion_tokens'],
+                    'cost_usd': round(m['cost_usd'], 6) if m['costed_calls'] else None,
+                    'avg_cost_usd': m['cost_usd'] / m['costed_calls'] if m['costed_calls'] else None
+                } if m else {'calls': 0})
+            }
+        return stats
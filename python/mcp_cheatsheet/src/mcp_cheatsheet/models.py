@@ -167,7 +167,7 @@ class ProgressEntry:
     def from_dict(cls, data: dict):
         return cls(
             freshness=data.get('freshness', 0.0),
-            log=data.get('log', [])
+            log=list(data.get('log', []))
         )
 
 
@@ -0,0 +1,185 @@
+"""
+Token-budgeted system prompt builder
+Ranks resolved concepts and trims them to fit an LLM context budget
+"""
+import threading
+from collections import OrderedDict
+from typing import Optional
+from .database import timestamp_to_epoch
+
+
+CATEGORIES = ('TODAY', 'LONG_TERM', 'SHORT_TERM')
+
+# Rough token estimate: ~4 characters per token for English text
+CHARS_PER_TOKEN = 4
+# Per-concept overhead for keys, flags and punctuation in the rendered JSON
+ITEM_OVERHEAD_TOKENS = 16
+# Don't bother including a concept with less content than this
+MIN_CONTENT_TOKENS = 16
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of a string"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to roughly max_tokens, on a word boundary where possible"""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars - 1]
+    space = cut.rfind(' ')
+    if space > max_chars // 2:
+        cut = cut[:space]
+    return cut.rstrip(' ,;:') + '…'
+
+
+class PromptBuilder:
+    """
+    Builds the getSystemPrompt payload within a token budget
+    
+    Concepts are ranked TODAY first, then by lowest freshness (learning
+    progress if any, else the stored concept freshness), then most recent.
+    Content is shared out across the ranked concepts and truncated to fit.
+    Results are memoized on the database's data version, so repeated calls
+    between writes reuse the rendered payload.
+    """
+    
+    def __init__(self, database, memo_size: int = 8):
+        """
+        Args:
+            database: Database or SQLiteDatabase instance
+            memo_size: Number of (data version, budget) results to keep
+        """
+        self.db = database
+        self.memo_size = memo_size
+        self._memo: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def build(self, token_budget: Optional[int] = None) -> dict:
+        """
+        Build the system prompt payload
+        
+        Args:
+            token_budget: Approximate token limit (None for no limit)
+        
+        Returns:
+            Dict with TODAY, LONG_TERM, SHORT_TERM, USER_PROFILE and a
+            BUDGET summary of what was included, truncated and omitted
+        """
+        key = (self.db.data_version(), token_budget)
+        with self._lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                self.hits += 1
+                return self._memo[key]
+            self.misses += 1
+        
+        prompt_data = self._render(token_budget)
+        
+        with self._lock:
+            self._memo[key] = prompt_data
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        return prompt_data
+    
+    def stats(self) -> dict:
+        """Get memoization hit/miss counters"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'memoized': len(self._memo)}
+    
+    # ============ Rendering ============
+    
+    def _render(self, token_budget: Optional[int]) -> dict:
+        knowledge_map = self.db.load_knowledge_map()
+        profile = self.db.get_user_profile().to_dict()
+        feedback = self.db.load_progress().get('AI_FEEDBACK', {})
+        
+        bucket_refs = {
+            'TODAY': knowledge_map.today,
+            'LONG_TERM': knowledge_map.long_term,
+            'SHORT_TERM': knowledge_map.short_term
+        }
+        concepts = self.db.get_concepts(
+            [ref for category in CATEGORIES for ref in bucket_refs[category]]
+        )
+        
+        items = []
+        for category in CATEGORIES:
+            for ref in bucket_refs[category]:
+                concept = concepts.get(ref)
+                if not concept:
+                    continue
+                progress = feedback.get(ref)
+                items.append({
+                    'category': category,
+                    'ref': ref,
+                    'concept': concept,
+                    'freshness': progress.get('freshness', 0.0) if progress else concept.freshness,
+                    'epoch': _safe_epoch(concept.timestamp)
+                })
+        items.sort(key=lambda item: (
+            item['category'] != 'TODAY',
+            item['freshness'],
+            -item['epoch']
+        ))
+        
+        prompt_data = {category: [] for category in CATEGORIES}
+        prompt_data['USER_PROFILE'] = profile
+        
+        remaining = None
+        if token_budget is not None:
+            remaining = token_budget - estimate_tokens(str(profile))
+        
+        truncated = 0
+        included = 0
+        for i, item in enumerate(items):
+            concept = item['concept']
+            content = concept.content
+            
+            if remaining is not None:
+                title_tokens = (
+                    estimate_tokens(concept.title) + estimate_tokens(item['ref']) + ITEM_OVERHEAD_TOKENS
+                )
+                available = remaining - title_tokens
+                if available < MIN_CONTENT_TOKENS:
+                    break
+                
+                # Fair share of what's left, so high-ranked concepts can't
+                # starve the rest; unused share rolls over to later items
+                share = max(MIN_CONTENT_TOKENS, available // (len(items) - i))
+                text = ' '.join(content)
+                if estimate_tokens(text) > share:
+                    content = [truncate_to_tokens(text, share)]
+                    truncated += 1
+                remaining -= title_tokens + estimate_tokens(' '.join(content))
+            
+            entry = {
+                'ref': item['ref'],
+                'title': concept.title,
+                'content': content,
+                'freshness': concept.freshness
+            }
+            if content is not concept.content:
+                entry['truncated'] = True
+            prompt_data[item['category']].append(entry)
+            included += 1
+        
+        prompt_data['BUDGET'] = {
+            'token_budget': token_budget,
+            'estimated_tokens': (token_budget - remaining) if remaining is not None else None,
+            'included': included,
+            'truncated': truncated,
+            'omitted': len(items) - included
+        }
+        return prompt_data
+
+
+def _safe_epoch(timestamp: str) -> int:
+    try:
+        return timestamp_to_epoch(timestamp) or 0
+    except ValueError:
+        return 0
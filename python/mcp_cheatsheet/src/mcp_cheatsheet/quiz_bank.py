@@ -0,0 +1,303 @@
+"""
+Persistent quiz bank
+Stores generated questions per concept and quiz type and rotates through them
+"""
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+from .storage import FileLock, atomic_write_json, file_signature
+
+
+def concept_hash(concept) -> str:
+    """Hash of a concept's title and content; questions are tied to it"""
+    text = json.dumps([concept.title, concept.content], ensure_ascii=False)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+
+class QuizBank:
+    """
+    Question variants keyed by concept ref + quiz type, stored in quiz_bank.json
+    
+    take() serves the least-served variant, so users cycle through every
+    stored question before seeing a repeat. Each key remembers the concept
+    hash its questions were written for; a mismatch drops the key. refill()
+    tops a key up in the background once few unseen variants remain.
+    
+    Serving a variant only bumps an in-memory counter; the counters are
+    written to the file in batches (every flush_every serves or
+    flush_interval seconds, with the next add(), and on close()).
+    
+    Document layout:
+        {"BANK": {"<ref>|<quiz_type>": {
+            "concept_hash": "...",
+            "variants": [{"quiz": {...}, "served": 0}, ...]
+        }}}
+    """
+    
+    def __init__(
+        self,
+        path: str,
+        variants: int = 3,
+        low_water: int = 1,
+        max_variants: int = 6,
+        workers: int = 2,
+        flush_every: int = 20,
+        flush_interval: float = 30.0
+    ):
+        """
+        Args:
+            path: quiz_bank.json path
+            variants: Unseen variants to keep per key
+            low_water: Refill once this few unseen variants are left
+            max_variants: Variants kept per key (most-served are dropped)
+            workers: Background refill threads
+            flush_every: Write served counters after this many serves
+            flush_interval: Write served counters at least this often (seconds)
+        """
+        self.path = path
+        self.variants = variants
+        self.low_water = low_water
+        self.max_variants = max_variants
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        
+        self._lock = FileLock(path)
+        self._doc: Optional[dict] = None
+        self._signature: Optional[tuple] = None
+        # Serves not yet written: key -> variant_id -> count
+        self._served: Dict[str, Dict[str, int]] = {}
+        self._unflushed = 0
+        self._flushed_at = time.monotonic()
+        
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='quiz-bank')
+        self._inflight = set()
+        self._inflight_lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.refilled = 0
+    
+    @staticmethod
+    def key(concept_ref: str, quiz_type: str) -> str:
+        return f"{concept_ref}|{quiz_type}"
+    
+    @staticmethod
+    def variant_id(quiz: dict) -> str:
+        text = json.dumps(quiz, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+    
+    # ============ Storage ============
+    
+    def _load(self) -> dict:
+        """Get the bank document, re-reading it only if the file changed (lock held)"""
+        signature = file_signature(self.path)
+        if self._doc is None or signature != self._signature:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._doc = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                self._doc = {"BANK": {}}
+            self._signature = signature
+        return self._doc
+    
+    def _save(self, doc: dict):
+        """Write the bank document with the unflushed served counters folded in (lock held)"""
+        if self._served:
+            bank = dict(doc['BANK'])
+            for key, counts in self._served.items():
+                entry = bank.get(key)
+                if entry is None:
+                    continue
+                bank[key] = {**entry, 'variants': [
+                    {**v, 'served': v['served'] + counts.get(self.variant_id(v['quiz']), 0)}
+                    for v in entry['variants']
+                ]}
+            doc = {**doc, 'BANK': bank}
+            self._served = {}
+            self._unflushed = 0
+        atomic_write_json(self.path, doc)
+        self._doc = doc
+        self._signature = file_signature(self.path)
+        self._flushed_at = time.monotonic()
+    
+    def _served_count(self, key: str, variant: dict) -> int:
+        """Times a variant was served, including unflushed serves (lock held)"""
+        pending = self._served.get(key)
+        return variant['served'] + (pending.get(self.variant_id(variant['quiz']), 0) if pending else 0)
+    
+    def flush(self):
+        """Write unflushed served counters to the file"""
+        with self._lock:
+            if self._unflushed:
+                self._save(self._load())
+    
+    # ============ Bank Operations ============
+    
+    def take(self, concept_ref: str, quiz_type: str, content_hash: str) -> Optional[dict]:
+        """
+        Serve the next variant for a concept and quiz type
+        
+        Args:
+            concept_ref: Concept reference
+            quiz_type: single_choice, multi_choice or short_answer
+            content_hash: concept_hash() of the concept as it is now
+        
+        Returns:
+            Stored quiz dict (without the concept), or None if the bank has
+            nothing valid for this key
+        """
+        key = self.key(concept_ref, quiz_type)
+        with self._lock:
+            doc = self._load()
+            entry = doc['BANK'].get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            if entry.get('concept_hash') != content_hash:
+                # The concept was edited; its old questions may be wrong now
+                bank = dict(doc['BANK'])
+                del bank[key]
+                self._served.pop(key, None)
+                self._save({**doc, 'BANK': bank})
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            
+            variants = entry['variants']
+            if not variants:
+                self.misses += 1
+                return None
+            
+            # Least served first; among equals, the oldest
+            chosen = variants[min(range(len(variants)), key=lambda i: self._served_count(key, variants[i]))]
+            counts = self._served.setdefault(key, {})
+            variant_id = self.variant_id(chosen['quiz'])
+            counts[variant_id] = counts.get(variant_id, 0) + 1
+            self._unflushed += 1
+            if self._unflushed >= self.flush_every or \
+                    time.monotonic() - self._flushed_at >= self.flush_interval:
+                self._save(doc)
+            self.hits += 1
+            return chosen['quiz']
+    
+    def add(self, concept_ref: str, quiz_type: str, content_hash: str, quiz: dict, served: bool = False):
+        """
+        Store a new variant
+        
+        Args:
+            concept_ref: Concept reference
+            quiz_type: single_choice, multi_choice or short_answer
+            content_hash: concept_hash() of the concept the quiz was written for
+            quiz: Quiz dict (the concept itself is not stored)
+            served: True if the quiz is being shown right now
+        """
+        key = self.key(concept_ref, quiz_type)
+        quiz = {k: v for k, v in quiz.items() if k != 'concept'}
+        with self._lock:
+            doc = self._load()
+            entry = doc['BANK'].get(key)
+            if entry is None or entry.get('concept_hash') != content_hash:
+                variants = []
+                self._served.pop(key, None)
+            else:
+                variants = [
+                    {**v, 'served': self._served_count(key, v)}
+                    for v in entry['variants'] if v['quiz'] != quiz
+                ]
+                self._served.pop(key, None)  # folded into the variants above
+            variants.append({'quiz': quiz, 'served': 1 if served else 0})
+            
+            if len(variants) > self.max_variants:
+                # Drop the most-served (oldest first among equals)
+                drop = max(range(len(variants)), key=lambda i: (variants[i]['served'], -i))
+                variants.pop(drop)
+            
+            bank = {**doc['BANK'], key: {'concept_hash': content_hash, 'variants': variants}}
+            self._save({**doc, 'BANK': bank})
+    
+    def unseen(self, concept_ref: str, quiz_type: str) -> int:
+        """Number of stored variants for a key that have never been served"""
+        key = self.key(concept_ref, quiz_type)
+        with self._lock:
+            entry = self._load()['BANK'].get(key)
+            if entry is None:
+                return 0
+            return sum(1 for v in entry['variants'] if self._served_count(key, v) == 0)
+    
+    # ============ Background Refill ============
+    
+    def refill(
+        self,
+        concept_ref: str,
+        quiz_type: str,
+        content_hash: str,
+        generate: Callable[[], Optional[dict]]
+    ) -> bool:
+        """
+        Top up a key in the background if it is running low
+        
+        Args:
+            concept_ref: Concept reference
+            quiz_type: single_choice, multi_choice or short_answer
+            content_hash: concept_hash() of the current concept
+            generate: Returns one fresh quiz dict, or None on failure
+        
+        Returns:
+            True if a refill was scheduled
+        """
+        missing = self.variants - self.unseen(concept_ref, quiz_type)
+        if missing <= 0 or missing < self.variants - self.low_water:
+            return False
+        
+        key = self.key(concept_ref, quiz_type)
+        with self._inflight_lock:
+            if key in self._inflight:
+                return False
+            self._inflight.add(key)
+        
+        def run():
+            try:
+                for _ in range(missing):
+                    quiz = generate()
+                    if quiz is None:
+                        break
+                    self.add(concept_ref, quiz_type, content_hash, quiz)
+                    with self._inflight_lock:
+                        self.refilled += 1
+            except Exception as e:
+                print(f"[QUIZ_BANK] Refill failed for {key}: {e}")
+            finally:
+                with self._inflight_lock:
+                    self._inflight.discard(key)
+        
+        self._executor.submit(run)
+        return True
+    
+    def stats(self) -> dict:
+        """Get bank size and hit/miss counters"""
+        with self._lock:
+            bank = self._load()['BANK']
+            variants = sum(len(entry['variants']) for entry in bank.values())
+            unflushed = self._unflushed
+        with self._inflight_lock:
+            refilling = len(self._inflight)
+        return {
+            'keys': len(bank),
+            'variants': variants,
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'refilled': self.refilled,
+            'refilling': refilling,
+            'unflushed_serves': unflushed
+        }
+    
+    def close(self):
+        """Stop the refill workers (pending refills are finished first) and flush counters"""
+        self._executor.shutdown(wait=True)
+        self.flush()
@@ -0,0 +1,216 @@
+"""
+Rate limiting for outgoing LLM requests
+Token buckets, a priority queue of waiting callers and 429-aware backoff
+"""
+import heapq
+import itertools
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+
+# Priorities, most urgent first
+INTERACTIVE = 0  # the user is waiting on the answer screen
+NORMAL = 1       # quiz generation the user asked for
+BACKGROUND = 2   # prefetch, quiz bank refills, progress logs
+
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', NORMAL: 'normal', BACKGROUND: 'background'}
+
+TOOL_PRIORITIES = {
+    'evaluate': INTERACTIVE,
+    'assessment': INTERACTIVE,
+    'instant_feedback': INTERACTIVE,
+    'explanation': INTERACTIVE,
+    'agent': INTERACTIVE,
+    'pdf_extraction': INTERACTIVE,
+    'quiz': NORMAL,
+    'quiz_batch': NORMAL,
+    'intelligent_log': BACKGROUND,
+}
+
+
+class TokenBucket:
+    """Bucket of capacity tokens refilled continuously at capacity per period"""
+    
+    def __init__(self, capacity: int, period: float):
+        """
+        Args:
+            capacity: Maximum burst (and tokens granted per period)
+            period: Refill period in seconds
+        """
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+    
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def wait_time(self, now: float) -> float:
+        """Seconds until one token is available (0 if available now)"""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+    
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimitScheduler:
+    """
+    Admits LLM requests within per-minute and per-hour budgets
+    
+    Callers block in acquire() until both buckets have a token and no
+    caller of higher priority (or the same priority, arriving earlier) is
+    waiting. A 429 pauses every caller for its Retry-After (or backoff)
+    delay, so one throttled request doesn't set off a burst of others.
+    """
+    
+    def __init__(
+        self,
+        max_per_minute: int,
+        max_per_hour: int,
+        max_retries: int = 3,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0
+    ):
+        """
+        Args:
+            max_per_minute: Requests allowed per minute (and burst size)
+            max_per_hour: Requests allowed per hour
+            max_retries: Retries of a throttled request before giving up
+            base_delay: First backoff delay in seconds
+            max_delay: Backoff cap in seconds
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        
+        self._minute = TokenBucket(max_per_minute, 60.0)
+        self._hour = TokenBucket(max_per_hour, 3600.0)
+        self._waiting = []  # heap of (priority, seq)
+        self._seq = itertools.count()
+        self._cooldown_until = 0.0
+        self._cond = threading.Condition()
+        
+        self.granted = 0
+        self.waited_s = 0.0
+        self.peak_queue_depth = 0
+        self.throttled = 0
+        self.retries = 0
+        self.timed_out = 0
+    
+    def acquire(self, priority: int = NORMAL, timeout: Optional[float] = None) -> bool:
+        """
+        Block until this caller may send one request
+        
+        Args:
+            priority: Lower values are admitted first
+            timeout: Seconds to wait at most (None to wait indefinitely)
+        
+        Returns:
+            True once admitted, False if the timeout ran out first
+        """
+        start = time.monotonic()
+        give_up = start + timeout if timeout is not None else None
+        entry = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+            self.peak_queue_depth = max(self.peak_queue_depth, len(self._waiting))
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = self._cooldown_until - now
+                    if wait <= 0 and self._waiting[0] == entry:
+                        wait = max(self._minute.wait_time(now), self._hour.wait_time(now))
+                        if wait <= 0:
+                            self._minute.take(now)
+                            self._hour.take(now)
+                            heapq.heappop(self._waiting)
+                            self.granted += 1
+                            self.waited_s += now - start
+                            self._cond.notify_all()
+                            return True
+                    if give_up is not None:
+                        if now >= give_up:
+                            self._waiting.remove(entry)
+                            heapq.heapify(self._waiting)
+                            self.timed_out += 1
+                            self._cond.notify_all()
+                            return False
+                        wait = min(wait, give_up - now) if wait > 0 else give_up - now
+                    # Not at the head: sleep until the head is admitted
+                    self._cond.wait(timeout=wait if wait > 0 else None)
+            except BaseException:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+                raise
+    
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Record a throttled response and pause all callers
+        
+        Args:
+            attempt: 0 for the first retry of this request, 1 for the next...
+            retry_after: Server-requested delay in seconds, if any
+        
+        Returns:
+            Seconds the caller should wait before retrying
+        """
+        if retry_after is not None:
+            delay = min(retry_after, self.max_delay)
+        else:
+            # Exponential backoff with jitter so retries don't line up
+            ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+            delay = random.uniform(ceiling / 2, ceiling)
+        
+        with self._cond:
+            self.throttled += 1
+            self.retries += 1
+            self._cooldown_until = max(self._cooldown_until, time.monotonic() + delay)
+            self._cond.notify_all()
+        return delay
+    
+    def stats(self) -> dict:
+        """Get queue depth and admission counters"""
+        with self._cond:
+            now = time.monotonic()
+            by_priority = {}
+            for priority, _ in self._waiting:
+                name = PRIORITY_NAMES.get(priority, str(priority))
+                by_priority[name] = by_priority.get(name, 0) + 1
+            self._minute._refill(now)
+            self._hour._refill(now)
+            return {
+                'queue_depth': len(self._waiting),
+                'queue_by_priority': by_priority,
+                'peak_queue_depth': self.peak_queue_depth,
+                'granted': self.granted,
+                'avg_wait_s': self.waited_s / self.granted if self.granted else 0.0,
+                'throttled': self.throttled,
+                'retries': self.retries,
+                'timed_out': self.timed_out,
+                'cooldown_s': max(0.0, self._cooldown_until - now),
+                'minute_tokens': round(self._minute.tokens, 2),
+                'hour_tokens': round(self._hour.tokens, 2)
+            }
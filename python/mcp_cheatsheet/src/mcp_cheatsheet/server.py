@@ -1,22 +1,153 @@
 """
 FastMCP server factory for CheatSheet educational system
 """
+import atexit
+import os
+from typing import Optional
+from .circuit_breaker import CircuitBreaker
 from .database import Database
+from .job_queue import JobQueue
+from .llm_cache import LLMCache
+from .llm_client import LLMClient
+from .local_grader import LocalGrader
+from .model_router import DEFAULT_MODEL, ModelRouter
+from .quiz_bank import QuizBank
+from .rate_limit import RateLimitScheduler
+from .sqlite_database import SQLiteDatabase
+from .concept_index import ConceptIndex
+from .template_quiz import TemplateQuizGenerator
 from .tools import CheatSheetTools
 
 
+def create_database(
+    data_dir: str, 
+    backend: str = 'json', 
+    db_cache: bool = False, 
+    sqlite_path: Optional[str] = None, 
+    progress_journal: bool = False
+):
+    """
+    Create the database for a storage backend
+    
+    Args:
+        data_dir: Data directory
+        backend: 'json' (db.json and friends) or 'sqlite'
+        db_cache: Enable the in-memory document cache (JSON backend only)
+        sqlite_path: SQLite file (defaults to <data_dir>/cheatsheet.db)
+        progress_journal: Journal progress updates and compact them in the
+            background (JSON backend only; SQLite already appends log rows)
+    
+    Returns:
+        Database or SQLiteDatabase instance
+    
+    Raises:
+        ValueError: If backend is unknown
+    """
+    if backend == 'json':
+        database = Database(data_dir, cached=db_cache, journaled=progress_journal)
+        if database.journal is not None:
+            database.journal.start_compactor()
+        return database
+    if backend == 'sqlite':
+        return SQLiteDatabase(sqlite_path or os.path.join(data_dir, 'cheatsheet.db'))
+    raise ValueError(f"Unknown database backend '{backend}'. Available backends: ['json', 'sqlite']")
+
+
 class MCPCheatSheetServer:
     """MCP Server for educational quiz system"""
     
-    def __init__(self, data_dir: str, api_key: str, openrouter_url: str):
-        self.database = Database(data_dir)
-        self.tools = CheatSheetTools(self.database, api_key, openrouter_url)
+    def __init__(
+        self, 
+        data_dir: str, 
+        api_key: str, 
+        openrouter_url: str, 
+        db_cache: bool = False, 
+        db_backend: str = 'json', 
+        sqlite_path: Optional[str] = None, 
+        progress_journal: bool = False, 
+        prompt_token_budget: Optional[int] = None, 
+        llm_pool_size: int = 10, 
+        llm_model: str = DEFAULT_MODEL, 
+        model_routes: Optional[dict] = None, 
+        llm_timeout: float = 60.0, 
+        llm_connect_timeout: float = 5.0, 
+        llm_hedge_percentile: Optional[float] = None, 
+        breaker_failures: int = 5, 
+        breaker_window: float = 30.0, 
+        breaker_cooldown: float = 30.0, 
+        llm_cache: bool = True, 
+        llm_cache_size: int = 512, 
+        llm_cache_disk: bool = False, 
+        quiz_bank: bool = True, 
+        quiz_bank_variants: int = 3, 
+        rate_limit_per_minute: Optional[int] = None, 
+        rate_limit_per_hour: Optional[int] = None, 
+        rate_limit_retries: int = 3, 
+        log_write_behind: bool = True, 
+        log_workers: int = 2, 
+        local_grader: bool = True, 
+        grader_accept: float = 0.8, 
+        grader_reject: float = 0.15, 
+        quiz_engine: str = 'llm', 
+        quiz_templates: bool = True
+    ):
+        if quiz_engine not in ('llm', 'template'):
+            raise ValueError(f"Unknown quiz engine '{quiz_engine}'. Available engines: ['llm', 'template']")
+        self.database = create_database(
+            data_dir, db_backend, db_cache, sqlite_path, progress_journal
+        )
+        cache = None
+        if llm_cache:
+            cache = LLMCache(
+                max_entries=llm_cache_size,
+                disk_dir=os.path.join(data_dir, 'llm_cache') if llm_cache_disk else None
+            )
+        scheduler = None
+        if rate_limit_per_minute or rate_limit_per_hour:
+            scheduler = RateLimitScheduler(
+                rate_limit_per_minute or rate_limit_per_hour,
+                rate_limit_per_hour or rate_limit_per_minute * 60,
+                max_retries=rate_limit_retries
+            )
+        breaker = None
+        if breaker_failures:
+            breaker = CircuitBreaker(breaker_failures, window=breaker_window, cooldown=breaker_cooldown)
+        self.llm = LLMClient(
+            api_key, openrouter_url, pool_size=llm_pool_size, cache=cache, scheduler=scheduler,
+            timeout=llm_timeout, connect_timeout=llm_connect_timeout,
+            hedge_percentile=llm_hedge_percentile, breaker=breaker,
+            router=ModelRouter(model_routes, default_model=llm_model)
+        )
+        self.quiz_bank = None
+        if quiz_bank:
+            self.quiz_bank = QuizBank(
+                os.path.join(data_dir, 'quiz_bank.json'), variants=quiz_bank_variants
+            )
+            # Served counters are written in batches; keep the last batch on exit
+            atexit.register(self.quiz_bank.flush)
+        self.log_queue = None
+        if log_write_behind:
+            self.log_queue = JobQueue(
+                os.path.join(data_dir, 'log_jobs.json'), workers=log_workers, name='log_queue'
+            )
+        self.grader = None
+        if local_grader:
+            self.grader = LocalGrader(accept_threshold=grader_accept, reject_threshold=grader_reject)
+        # Per-course TF-IDF models for the local grader and the quiz templates
+        self.concept_index = ConceptIndex(self.database)
+        self.quiz_templates = None
+        if quiz_templates or quiz_engine == 'template':
+            self.quiz_templates = TemplateQuizGenerator(self.concept_index)
+        self.tools = CheatSheetTools(
+            self.database, api_key, openrouter_url, prompt_token_budget, self.llm, self.quiz_bank, 
+            self.log_queue, self.grader, self.quiz_templates, quiz_engine, self.concept_index
+        )
     
     def get_tools(self) -> CheatSheetTools:
         """Get the tools instance"""
         return self.tools
     
-    def get_database(self) -> Database:
+    def get_database(self):
         """Get the database instance"""
         return self.database
     
@@ -34,18 +165,46 @@ class MCPCheatSheetServer:
         """Tool 3: Get current progress"""
         return self.tools.get_cur_progress()
     
-    def get_system_prompt(self):
+    def get_system_prompt(self, token_budget: Optional[int] = None):
         """Tool 4: Get system prompt"""
-        return self.tools.get_system_prompt()
+        return self.tools.get_system_prompt(token_budget)
     
     def evaluate_answer(self, user_answer: str, correct_answer: any, concept_id: str):
         """Tool 5: Evaluate answer"""
         return self.tools.evaluate_answer(user_answer, correct_answer, concept_id)
     
+    def stream_evaluation(self, user_answer: str, concept_id: str, expected_answer: Optional[str] = None):
+        """Tool 5, streamed: yield ('feedback', delta)... then ('result', evaluation)"""
+        return self.tools.stream_evaluation(user_answer, concept_id, expected_answer)
+    
+    def stream_instant_feedback(self, concept: dict, is_correct: bool, user_answer: str):
+        """Yield feedback text for a pre-graded answer as the LLM writes it"""
+        return self.tools.stream_instant_feedback(concept, is_correct, user_answer)
+    
     def update_freshness_and_log(self, concept_id: str, evaluation_result):
         """Tool 6: Update freshness and log"""
         return self.tools.update_freshness_and_log(concept_id, evaluation_result)
     
+    def assess_answer(
+        self, 
+        user_answer: str, 
+        concept_id: str, 
+        is_correct: Optional[bool] = None, 
+        expected_answer: Optional[str] = None
+    ):
+        """Tools 5+6 in one LLM call: grade, write feedback and log progress"""
+        return self.tools.assess_answer(user_answer, concept_id, is_correct, expected_answer)
+    
+    def stream_assessment(
+        self, 
+        user_answer: str, 
+        concept_id: str, 
+        is_correct: Optional[bool] = None, 
+        expected_answer: Optional[str] = None
+    ):
+        """assess_answer, streamed: yield ('feedback', delta)... then ('result', evaluation)"""
+        return self.tools.stream_assessment(user_answer, concept_id, is_correct, expected_answer)
+    
     def decide_next(self, cur_progress: dict):
         """Tool 7: Decide next action"""
         return self.tools.decide_next(cur_progress)
@@ -54,6 +213,10 @@ class MCPCheatSheetServer:
         """Tool 8: Generate explanation"""
         return self.tools.generate_explaination(concept_id)
     
+    def stream_explaination(self, concept_id: str):
+        """Tool 8, streamed: yield explanation text as the LLM writes it"""
+        return self.tools.stream_explaination(concept_id)
+    
     def generate_que_single_choice(self, concept_id: str):
         """Tool 9: Generate single choice question"""
         return self.tools.generate_que_single_choice(concept_id)
@@ -65,4 +228,8 @@ class MCPCheatSheetServer:
     def generate_que_short_answer(self, concept_id: str):
         """Tool 11: Generate short answer question"""
         return self.tools.generate_que_short_answer(concept_id)
+    
+    def generate_quiz_batch(self, requests: list):
+        """Generate quizzes for several (concept_id, quiz_type) pairs in one LLM call"""
+        return self.tools.generate_quiz_batch(requests)
 
@@ -0,0 +1,589 @@
+"""
+SQLite database backend for CheatSheet
+Drop-in replacement for the JSON-file Database
+"""
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+from datetime import datetime
+from .database import DAY_SECONDS, Database, group_refs_by_course
+from .models import (
+    Concept, Course, UserProfile, KnowledgeDistribution,
+    ProgressEntry
+)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS courses (
+    name TEXT PRIMARY KEY
+);
+
+CREATE TABLE IF NOT EXISTS concepts (
+    course TEXT NOT NULL REFERENCES courses(name),
+    concept_id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    title_key TEXT NOT NULL,
+    content TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    ts_epoch INTEGER,
+    freshness REAL NOT NULL DEFAULT 0.0,
+    PRIMARY KEY (course, concept_id)
+);
+CREATE INDEX IF NOT EXISTS idx_concepts_title ON concepts (course, title_key);
+CREATE INDEX IF NOT EXISTS idx_concepts_ts ON concepts (ts_epoch);
+
+-- CONCEPTS_VERSION changes only when concept rows do (progress writes leave it alone)
+CREATE TRIGGER IF NOT EXISTS concepts_version_insert AFTER INSERT ON concepts BEGIN
+    INSERT INTO meta (key, value) VALUES ('CONCEPTS_VERSION', '1')
+    ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS concepts_version_update AFTER UPDATE ON concepts BEGIN
+    INSERT INTO meta (key, value) VALUES ('CONCEPTS_VERSION', '1')
+    ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS concepts_version_delete AFTER DELETE ON concepts BEGIN
+    INSERT INTO meta (key, value) VALUES ('CONCEPTS_VERSION', '1')
+    ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1;
+END;
+
+CREATE TABLE IF NOT EXISTS progress (
+    concept_ref TEXT PRIMARY KEY,
+    freshness REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS progress_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    concept_ref TEXT NOT NULL,
+    line TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_progress_log_ref ON progress_log (concept_ref, id);
+
+CREATE TABLE IF NOT EXISTS knowledge_map (
+    bucket TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    concept_ref TEXT NOT NULL,
+    PRIMARY KEY (bucket, position)
+);
+"""
+
+BUCKETS = ('TODAY', 'SHORT_TERM', 'LONG_TERM')
+
+# Iterate concepts course by course, matching db.json's nesting order
+ORDER_BY_COURSE = (
+    'ORDER BY (SELECT rowid FROM courses WHERE courses.name = concepts.course), concepts.rowid'
+)
+
+
+class SQLiteDatabase:
+    """Manages SQLite-based database operations (same interface as Database)"""
+    
+    backend = 'sqlite'
+    
+    def __init__(self, db_path: str):
+        """
+        Args:
+            db_path: Path of the SQLite database file (created if missing)
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+        self._connect().executescript(SCHEMA)
+    
+    # ============ Connection Handling ============
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            self._local.conn = conn
+            self._local.depth = 0
+        return conn
+    
+    @contextmanager
+    def _transaction(self):
+        """
+        Run a block in a write transaction (BEGIN IMMEDIATE)
+        
+        Nested uses join the outermost transaction.
+        """
+        conn = self._connect()
+        if self._local.depth:
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+        
+        conn.execute('BEGIN IMMEDIATE')
+        self._local.depth = 1
+        try:
+            yield conn
+            # Every write transaction bumps the data version
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('DATA_VERSION', '1') "
+                "ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+            )
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        else:
+            conn.execute('COMMIT')
+        finally:
+            self._local.depth = 0
+    
+    def close(self):
+        """Close this thread's connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+    
+    def cache_stats(self) -> dict:
+        """Get cache counters (SQLite has no document cache)"""
+        return {'backend': self.backend, 'enabled': False, 'hits': 0, 'misses': 0}
+    
+    def data_version(self) -> int:
+        """Counter incremented by every committed write transaction"""
+        row = self._connect().execute(
+            "SELECT value FROM meta WHERE key = 'DATA_VERSION'"
+        ).fetchone()
+        return int(row[0]) if row else 0
+    
+    def concepts_version(self) -> int:
+        """Counter incremented whenever a concept is added, edited or removed"""
+        row = self._connect().execute(
+            "SELECT value FROM meta WHERE key = 'CONCEPTS_VERSION'"
+        ).fetchone()
+        return int(row[0]) if row else 0
+    
+    def invalidate_cache(self):
+        """No-op: SQLite reads are always current"""
+    
+    # ============ Whole-Document Operations ============
+    
+    def load_db(self) -> dict:
+        """Materialize the main database in db.json layout"""
+        conn = self._connect()
+        db = {"USER_PROFILE": self.get_user_profile().to_dict(), "COURSES": {}}
+        for (name,) in conn.execute('SELECT name FROM courses ORDER BY rowid'):
+            db['COURSES'][name] = {}
+        for row in conn.execute(
+            'SELECT course, concept_id, title, content, timestamp, freshness '
+            'FROM concepts ' + ORDER_BY_COURSE
+        ):
+            course_name, concept_id, title, content, timestamp, freshness = row
+            db['COURSES'].setdefault(course_name, {})[concept_id] = {
+                'title': title,
+                'content': json.loads(content),
+                'timestamp': timestamp,
+                'freshness': freshness
+            }
+        return db
+    
+    def save_db(self, db: dict):
+        """Replace the main database with a document in db.json layout"""
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM concepts')
+            conn.execute('DELETE FROM courses')
+            self._write_profile(conn, db.get('USER_PROFILE', {}))
+            for course_name, concepts in db.get('COURSES', {}).items():
+                conn.execute('INSERT INTO courses (name) VALUES (?)', (course_name,))
+                for concept_id, concept_data in concepts.items():
+                    self._insert_concept(conn, course_name, Concept.from_dict(concept_id, concept_data))
+    
+    def load_knowledge_map(self) -> KnowledgeDistribution:
+        """Load knowledge distribution map"""
+        data = {bucket: [] for bucket in BUCKETS}
+        for bucket, concept_ref in self._connect().execute(
+            'SELECT bucket, concept_ref FROM knowledge_map ORDER BY bucket, position'
+        ):
+            data.setdefault(bucket, []).append(concept_ref)
+        return KnowledgeDistribution.from_dict(data)
+    
+    def save_knowledge_map(self, knowledge_map: KnowledgeDistribution):
+        """Save knowledge distribution map"""
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM knowledge_map')
+            for bucket, refs in knowledge_map.to_dict().items():
+                conn.executemany(
+                    'INSERT INTO knowledge_map (bucket, position, concept_ref) VALUES (?, ?, ?)',
+                    [(bucket, i, ref) for i, ref in enumerate(refs)]
+                )
+    
+    def load_progress(self) -> dict:
+        """Materialize current progress in cur_progress.json layout"""
+        conn = self._connect()
+        feedback = {}
+        for concept_ref, freshness in conn.execute(
+            'SELECT concept_ref, freshness FROM progress ORDER BY rowid'
+        ):
+            feedback[concept_ref] = {'freshness': freshness, 'log': []}
+        for concept_ref, line in conn.execute(
+            'SELECT concept_ref, line FROM progress_log ORDER BY id'
+        ):
+            if concept_ref in feedback:
+                feedback[concept_ref]['log'].append(line)
+        return {"AI_FEEDBACK": feedback}
+    
+    def save_progress(self, progress: dict):
+        """Replace current progress with a document in cur_progress.json layout"""
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM progress_log')
+            conn.execute('DELETE FROM progress')
+            for concept_ref, entry_data in progress.get('AI_FEEDBACK', {}).items():
+                self._write_progress(conn, concept_ref, ProgressEntry.from_dict(entry_data))
+    
+    # ============ User Profile Operations ============
+    
+    def get_user_profile(self) -> UserProfile:
+        """Get user profile"""
+        row = self._connect().execute(
+            "SELECT value FROM meta WHERE key = 'USER_PROFILE'"
+        ).fetchone()
+        return UserProfile.from_dict(json.loads(row[0]) if row else {})
+    
+    def save_user_profile(self, profile: UserProfile):
+        """Save user profile"""
+        with self._transaction() as conn:
+            self._write_profile(conn, profile.to_dict())
+    
+    # ============ Course Operations ============
+    
+    def get_courses(self) -> List[str]:
+        """Get list of course names"""
+        return [name for (name,) in self._connect().execute('SELECT name FROM courses ORDER BY rowid')]
+    
+    def get_course(self, course_name: str) -> Optional[Course]:
+        """Get a specific course"""
+        rows = self._connect().execute(
+            'SELECT concept_id, title, content, timestamp, freshness '
+            'FROM concepts WHERE course = ? ORDER BY rowid',
+            (course_name,)
+        ).fetchall()
+        if not rows:
+            return None
+        
+        course = Course(name=course_name)
+        for row in rows:
+            course.add_concept(self._row_to_concept(row))
+        return course
+    
+    def save_course(self, course: Course):
+        """Save a course"""
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM concepts WHERE course = ?', (course.name,))
+            conn.execute('INSERT OR IGNORE INTO courses (name) VALUES (?)', (course.name,))
+            for concept in course.concepts.values():
+                self._insert_concept(conn, course.name, concept)
+    
+    def course_exists(self, course_name: str) -> bool:
+        """Check if course exists"""
+        row = self._connect().execute(
+            'SELECT 1 FROM courses WHERE name = ?', (course_name,)
+        ).fetchone()
+        return row is not None
+    
+    # ============ Concept Operations ============
+    
+    def add_concept(self, course_name: str, concept: Concept) -> bool:
+        """Add a concept to a course"""
+        with self._transaction() as conn:
+            if self.check_duplicate(course_name, concept.title):
+                return False
+            conn.execute('INSERT OR IGNORE INTO courses (name) VALUES (?)', (course_name,))
+            self._insert_concept(conn, course_name, concept)
+            return True
+    
+    def get_concept(self, concept_ref: str) -> Optional[Concept]:
+        """Get a concept by reference (e.g., 'COURSES/COURSE_NAME/concept-id')"""
+        parts = concept_ref.split('/')
+        if len(parts) != 3 or parts[0] != 'COURSES':
+            return None
+        
+        row = self._connect().execute(
+            'SELECT concept_id, title, content, timestamp, freshness '
+            'FROM concepts WHERE course = ? AND concept_id = ?',
+            (parts[1], parts[2])
+        ).fetchone()
+        return self._row_to_concept(row) if row else None
+    
+    def get_concepts(self, concept_refs: List[str]) -> Dict[str, Concept]:
+        """
+        Resolve many concept references with one query per course
+        
+        Args:
+            concept_refs: References like 'COURSES/COURSE_NAME/concept-id'
+        
+        Returns:
+            Dict of ref -> Concept in input order; unresolvable refs are omitted
+        """
+        conn = self._connect()
+        resolved = {}
+        for course_name, refs in group_refs_by_course(concept_refs).items():
+            by_id = {concept_id: concept_ref for concept_ref, concept_id in refs}
+            ids = list(by_id)
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                for row in conn.execute(
+                    'SELECT concept_id, title, content, timestamp, freshness FROM concepts '
+                    f"WHERE course = ? AND concept_id IN ({','.join('?' * len(chunk))})",
+                    (course_name, *chunk)
+                ):
+                    resolved[by_id[row[0]]] = self._row_to_concept(row)
+        return {ref: resolved[ref] for ref in concept_refs if ref in resolved}
+    
+    def add_concepts(
+        self,
+        course_name: str,
+        concepts: List[dict],
+        timestamp: Optional[str] = None
+    ) -> List[dict]:
+        """
+        Add several concepts to a course in a single transaction
+        
+        Args:
+            course_name: Name of the course
+            concepts: List of concept dicts with title and content
+            timestamp: ISO timestamp shared by the batch (defaults to now)
+        
+        Returns:
+            One result dict per input concept, in input order, with
+            status 'added' (and the new concept_id) or 'skipped' (and a reason)
+        """
+        if timestamp is None:
+            timestamp = datetime.now().isoformat() + 'Z'
+        
+        results = []
+        with self._transaction() as conn:
+            conn.execute('INSERT OR IGNORE INTO courses (name) VALUES (?)', (course_name,))
+            for concept_data in concepts:
+                title = (concept_data.get('title') or '').strip()
+                if not title:
+                    results.append({'title': title, 'status': 'skipped', 'reason': 'missing title'})
+                    continue
+                
+                if self.check_duplicate(course_name, title):
+                    results.append({'title': title, 'status': 'skipped', 'reason': 'duplicate'})
+                    continue
+                
+                content = concept_data.get('content', [])
+                concept = Concept(
+                    concept_id=self.generate_concept_id(course_name, timestamp),
+                    title=title,
+                    content=content if isinstance(content, list) else [content],
+                    timestamp=timestamp,
+                    freshness=0.0
+                )
+                self._insert_concept(conn, course_name, concept)
+                results.append({'title': title, 'status': 'added', 'concept_id': concept.concept_id})
+            
+            if not any(r['status'] == 'added' for r in results):
+                # Don't leave an empty course behind for an all-duplicate batch
+                conn.execute(
+                    'DELETE FROM courses WHERE name = ? AND NOT EXISTS '
+                    '(SELECT 1 FROM concepts WHERE course = ?)',
+                    (course_name, course_name)
+                )
+        return results
+    
+    def check_duplicate(self, course_name: str, title: str) -> bool:
+        """Check if a concept with this title already exists in the course"""
+        row = self._connect().execute(
+            'SELECT 1 FROM concepts WHERE course = ? AND title_key = ? LIMIT 1',
+            (course_name, Database.normalize_title(title))
+        ).fetchone()
+        return row is not None
+    
+    def generate_concept_id(self, course_name: str, timestamp: str) -> str:
+        """Generate unique concept ID"""
+        prefix = Database._concept_id_prefix(course_name, timestamp)
+        course_seq: Dict[str, int] = {}
+        # Range scan on the (course, concept_id) primary key
+        for (concept_id,) in self._connect().execute(
+            'SELECT concept_id FROM concepts WHERE course = ? AND concept_id >= ? AND concept_id < ?',
+            (course_name, prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1))
+        ):
+            Database._index_concept_id(course_seq, concept_id)
+        return f"{prefix}{course_seq.get(prefix, 0) + 1:03d}"
+    
+    def get_all_concepts_refs(self) -> List[str]:
+        """Get all concept references"""
+        return [
+            f"COURSES/{course_name}/{concept_id}"
+            for course_name, concept_id in self._connect().execute(
+                'SELECT course, concept_id FROM concepts ' + ORDER_BY_COURSE
+            )
+        ]
+    
+    # ============ Knowledge Distribution ============
+    
+    def distribute_knowledge(self) -> KnowledgeDistribution:
+        """
+        Distribute concepts to TODAY, SHORT_TERM, and LONG_TERM
+        based on timestamps
+        """
+        now = int(time.time())
+        long_cut, today_cut = now - 31 * DAY_SECONDS, now - DAY_SECONDS
+        
+        # Same buckets and order as the JSON backend: timestamp ranges read
+        # through idx_concepts_ts, ties in db.json order, future timestamps
+        # after the rest of SHORT_TERM
+        conn = self._connect()
+        knowledge_map = KnowledgeDistribution(
+            today=self._refs_by_time(conn, today_cut, now),
+            short_term=self._refs_by_time(conn, long_cut, today_cut) + self._refs_by_time(conn, now, None),
+            long_term=self._refs_by_time(conn, None, long_cut)
+        )
+        
+        if knowledge_map != self.load_knowledge_map():
+            self.save_knowledge_map(knowledge_map)
+        return knowledge_map
+    
+    @staticmethod
+    def _refs_by_time(conn: sqlite3.Connection, after: Optional[int], until: Optional[int]) -> List[str]:
+        """Refs of concepts with after < ts_epoch <= until (None: unbounded), oldest first"""
+        bounds, params = ['ts_epoch IS NOT NULL'], []
+        if after is not None:
+            bounds.append('ts_epoch > ?')
+            params.append(after)
+        if until is not None:
+            bounds.append('ts_epoch <= ?')
+            params.append(until)
+        rows = conn.execute(
+            'SELECT concepts.course, concepts.concept_id FROM concepts '
+            'JOIN courses ON courses.name = concepts.course '
+            'WHERE ' + ' AND '.join(bounds) + ' '
+            'ORDER BY ts_epoch, courses.rowid, concepts.rowid',
+            params
+        )
+        return [f"COURSES/{course_name}/{concept_id}" for course_name, concept_id in rows]
+    
+    # ============ Progress Operations ============
+    
+    def get_progress_entry(self, concept_ref: str) -> Optional[ProgressEntry]:
+        """Get progress entry for a concept"""
+        conn = self._connect()
+        row = conn.execute(
+            'SELECT freshness FROM progress WHERE concept_ref = ?', (concept_ref,)
+        ).fetchone()
+        if row is None:
+            return None
+        log = [line for (line,) in conn.execute(
+            'SELECT line FROM progress_log WHERE concept_ref = ? ORDER BY id', (concept_ref,)
+        )]
+        return ProgressEntry(freshness=row[0], log=log)
+    
+    def update_progress(self, concept_ref: str, entry: ProgressEntry):
+        """Update progress for a concept"""
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM progress_log WHERE concept_ref = ?', (concept_ref,))
+            self._write_progress(conn, concept_ref, entry)
+    
+    def modify_progress_entry(
+        self,
+        concept_ref: str,
+        updater: Callable[[Optional[ProgressEntry]], ProgressEntry]
+    ) -> ProgressEntry:
+        """Atomically read, update and save the progress entry for a concept"""
+        with self._transaction() as conn:
+            current = self.get_progress_entry(concept_ref)
+            known_lines = len(current.log) if current else 0
+            entry = updater(current)
+            
+            if current is not None and entry.log[:known_lines] == current.log[:known_lines]:
+                # Append-only change: write just the new log lines
+                conn.execute(
+                    'UPDATE progress SET freshness = ? WHERE concept_ref = ?',
+                    (entry.freshness, concept_ref)
+                )
+                conn.executemany(
+                    'INSERT INTO progress_log (concept_ref, line) VALUES (?, ?)',
+                    [(concept_ref, line) for line in entry.log[known_lines:]]
+                )
+            else:
+                self.update_progress(concept_ref, entry)
+            return entry
+    
+    # ============ Migration ============
+    
+    def import_documents(
+        self,
+        db: dict,
+        progress: Optional[dict] = None,
+        knowledge_map: Optional[KnowledgeDistribution] = None
+    ):
+        """
+        Replace all contents with JSON-layout documents in one transaction
+        
+        Args:
+            db: Document in db.json layout
+            progress: Document in cur_progress.json layout
+            knowledge_map: Knowledge distribution map
+        """
+        with self._transaction():
+            self.save_db(db)
+            self.save_progress(progress or {"AI_FEEDBACK": {}})
+            self.save_knowledge_map(knowledge_map or KnowledgeDistribution())
+    
+    # ============ Row Helpers ============
+    
+    @staticmethod
+    def _row_to_concept(row: tuple) -> Concept:
+        concept_id, title, content, timestamp, freshness = row
+        return Concept(
+            concept_id=concept_id,
+            title=title,
+            content=json.loads(content),
+            timestamp=timestamp,
+            freshness=freshness
+        )
+    
+    @staticmethod
+    def _insert_concept(conn: sqlite3.Connection, course_name: str, concept: Concept):
+        conn.execute(
+            'INSERT OR REPLACE INTO concepts '
+            '(course, concept_id, title, title_key, content, timestamp, ts_epoch, freshness) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (
+                course_name,
+                concept.concept_id,
+                concept.title,
+                Database.normalize_title(concept.title),
+                json.dumps(concept.content, ensure_ascii=False),
+                concept.timestamp,
+                Database._parse_epoch(concept.timestamp),
+                concept.freshness
+            )
+        )
+    
+    @staticmethod
+    def _write_profile(conn: sqlite3.Connection, profile_data: dict):
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('USER_PROFILE', ?)",
+            (json.dumps(profile_data, ensure_ascii=False),)
+        )
+    
+    @staticmethod
+    def _write_progress(conn: sqlite3.Connection, concept_ref: str, entry: ProgressEntry):
+        conn.execute(
+            'INSERT INTO progress (concept_ref, freshness) VALUES (?, ?) '
+            'ON CONFLICT (concept_ref) DO UPDATE SET freshness = excluded.freshness',
+            (concept_ref, entry.freshness)
+        )
+        conn.executemany(
+            'INSERT INTO progress_log (concept_ref, line) VALUES (?, ?)',
+            [(concept_ref, line) for line in entry.log]
+        )
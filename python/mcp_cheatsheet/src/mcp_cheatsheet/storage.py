@@ -0,0 +1,132 @@
+"""
+Crash-safe JSON file storage for CheatSheet
+Atomic replace-on-write plus advisory inter-process file locks
+"""
+import json
+import os
+import stat
+import tempfile
+import threading
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
+
+def file_signature(path: str) -> Optional[tuple]:
+    """Identify the current on-disk version of a file (None if missing)"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def atomic_write_json(path: str, data):
+    """
+    Write a JSON document so readers see either the old or the new file
+    
+    The document is written to a temp file in the same directory, fsynced
+    and renamed over the target, then the directory entry is fsynced.
+    A crash at any point leaves the previous file intact.
+    
+    Args:
+        path: Target file path
+        data: JSON-serializable document
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory,
+        prefix=f".{os.path.basename(path)}.",
+        suffix='.tmp'
+    )
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        
+        # Keep the permissions of the file being replaced
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            mode = 0o644
+        os.chmod(tmp_path, mode)
+        
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    
+    _fsync_directory(directory)
+
+
+def _fsync_directory(directory: str):
+    """Persist a rename by syncing its directory (no-op where unsupported)"""
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
+
+class FileLock:
+    """
+    Re-entrant exclusive lock guarding read-modify-write cycles on a file
+    
+    Serializes threads in this process with an RLock and other processes
+    with an advisory fcntl lock on a sidecar '<path>.lock' file. On
+    platforms without fcntl only the in-process lock is taken.
+    """
+    
+    def __init__(self, path: str):
+        self.lock_path = f"{path}.lock"
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+    
+    def acquire(self):
+        """Acquire the lock, blocking until it is available"""
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            except BaseException:
+                self._thread_lock.release()
+                raise
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+            except BaseException:
+                os.close(fd)
+                self._thread_lock.release()
+                raise
+            self._fd = fd
+        self._depth += 1
+    
+    def release(self):
+        """Release one level of the lock"""
+        self._depth -= 1
+        if self._depth == 0:
+            fd, self._fd = self._fd, None
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+        self._thread_lock.release()
+    
+    def __enter__(self):
+        self.acquire()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
@@ -0,0 +1,277 @@
+"""
+Template-based quiz generation
+Builds cloze, definition-matching and true/false questions from concept text
+without an LLM; distractors come from similar concepts of the same course
+"""
+import random
+import re
+import threading
+from collections import Counter
+from typing import List, Optional, Tuple
+from .concept_index import ConceptIndex, CourseIndex, concept_text
+from .text_similarity import stem, term_forms, tokenize
+
+
+_WORD = re.compile(r"[A-Za-z0-9]+(?:'[A-Za-z]+)?")
+_BLANKS = re.compile(r"___(?:[\s-]+___)+")
+BLANK = "___"
+
+
+def blank_terms(text: str, terms: set) -> str:
+    """Replace every word whose stem is in terms with a blank (runs become one blank)"""
+    def replace(match):
+        word = match.group(0).lower()
+        return BLANK if stem(word.split("'")[0]) in terms else match.group(0)
+    return _BLANKS.sub(BLANK, _WORD.sub(replace, text))
+
+
+class TemplateQuizGenerator:
+    """
+    Offline quiz questions for the single_choice, multi_choice and
+    short_answer types
+    
+    Templates:
+        definition  - pick the statement describing a concept (single choice)
+        term        - pick the concept a statement describes (single choice)
+        cloze       - fill in a key term removed from a statement (single
+                      choice, or short answer with the term as expected answer)
+        true_false  - is a statement about the concept? (single choice with
+                      True/False options)
+        statements  - select every statement describing the concept (multi choice)
+        explain     - explain the concept in your own words (short answer)
+    Title words are blanked out of statements so options don't give the
+    answer away. Distractors are the nearest neighbours in the course's
+    ConceptIndex, so wrong options come from related topics.
+    """
+    
+    def __init__(self, index: ConceptIndex, options: int = 4, seed: Optional[int] = None):
+        """
+        Args:
+            index: Per-course similarity index
+            options: Options per choice question
+            seed: Random seed (for reproducible questions)
+        """
+        self.index = index
+        self.options = options
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.generated: Counter = Counter()
+        self.failed = 0
+    
+    def generate(self, concept_ref: str, quiz_type: str) -> Optional[dict]:
+        """
+        Build a quiz for a concept
+        
+        Args:
+            concept_ref: Concept reference
+            quiz_type: single_choice, multi_choice or short_answer
+        
+        Returns:
+            Quiz data dict (question, options, correct_answer, expected_answer),
+            or None if the concept or its course has too little text
+        """
+        course = self.index.for_concept(concept_ref)
+        if course is None:
+            with self._lock:
+                self.failed += 1
+            return None
+        
+        if quiz_type == 'single_choice':
+            templates = [self._definition, self._term, self._cloze_choice, self._true_false]
+            with self._lock:
+                self._random.shuffle(templates)
+        elif quiz_type == 'multi_choice':
+            templates = [self._statements]
+        else:
+            templates = [self._cloze_short, self._explain]
+        
+        for template in templates:
+            quiz_data = template(course, concept_ref)
+            if quiz_data is not None:
+                with self._lock:
+                    self.generated[template.__name__.lstrip('_')] += 1
+                return quiz_data
+        
+        with self._lock:
+            self.failed += 1
+        return None
+    
+    # ============ Templates ============
+    
+    def _definition(self, course: CourseIndex, ref: str) -> Optional[dict]:
+        sentences = course.sentences[ref]
+        distractors = self._distractor_statements(course, ref, self.options - 1)
+        if not sentences or len(distractors) < self.options - 1:
+            return None
+        
+        concept = course.concepts[ref]
+        correct = blank_terms(self._choice(sentences), self._title_terms(concept.title))
+        options, answer = self._shuffled(correct, distractors)
+        return {
+            'question': f"Which statement describes {concept.title}?",
+            'options': options,
+            'correct_answer': answer
+        }
+    
+    def _term(self, course: CourseIndex, ref: str) -> Optional[dict]:
+        sentences = course.sentences[ref]
+        concept = course.concepts[ref]
+        titles, seen = [], {concept.title.lower()}
+        for neighbour in course.similar(ref):
+            if neighbour.title.lower() not in seen:
+                seen.add(neighbour.title.lower())
+                titles.append(neighbour.title)
+        if not sentences or len(titles) < self.options - 1:
+            return None
+        
+        statement = blank_terms(self._choice(sentences), self._title_terms(concept.title))
+        options, answer = self._shuffled(concept.title, self._sample(titles, self.options - 1))
+        return {
+            'question': f"Which concept does this statement describe?\n\n\"{statement}\"",
+            'options': options,
+            'correct_answer': answer
+        }
+    
+    def _cloze_choice(self, course: CourseIndex, ref: str) -> Optional[dict]:
+        cloze = self._cloze(course, ref)
+        if cloze is None:
+            return None
+        statement, term, surface = cloze
+        
+        exclude = set(tokenize(statement)) | {term}
+        words, seen = [], set()
+        for neighbour in course.similar(ref):
+            text = concept_text(neighbour)
+            forms = term_forms(text)
+            for keyword in course.model.keywords(text, 5):
+                word = forms.get(keyword, keyword)
+                if keyword not in exclude and keyword not in seen and len(word) >= 4:
+                    seen.add(keyword)
+                    words.append(word)
+                    break
+        if len(words) < self.options - 1:
+            return None
+        
+        options, answer = self._shuffled(surface, self._sample(words, self.options - 1))
+        return {
+            'question': f"Fill in the blank ({course.concepts[ref].title}):\n\n\"{statement}\"",
+            'options': options,
+            'correct_answer': answer
+        }
+    
+    def _true_false(self, course: CourseIndex, ref: str) -> Optional[dict]:
+        concept = course.concepts[ref]
+        with self._lock:
+            truthful = self._random.random() < 0.5
+        
+        if truthful:
+            if not course.sentences[ref]:
+                return None
+            statement = blank_terms(self._choice(course.sentences[ref]), self._title_terms(concept.title))
+        else:
+            distractors = self._distractor_statements(course, ref, 1)
+            if not distractors:
+                return None
+            statement = distractors[0]
+        return {
+            'question': f"True or false: this statement describes {concept.title}.\n\n\"{statement}\"",
+            'options': ["True", "False"],
+            'correct_answer': 0 if truthful else 1
+        }
+    
+    def _statements(self, course: CourseIndex, ref: str) -> Optional[dict]:
+        concept = course.concepts[ref]
+        title_terms = self._title_terms(concept.title)
+        own = course.sentences[ref][:self.options - 2]
+        if not own:
+            return None
+        distractors = self._distractor_statements(course, ref, self.options - len(own))
+        if len(distractors) < self.options - len(own):
+            return None
+        
+        options = [(blank_terms(s, title_terms), True) for s in own] + [(s, False) for s in distractors]
+        with self._lock:
+            self._random.shuffle(options)
+        return {
+            'question': f"Which of these statements describe {concept.title}? Select all that apply.",
+            'options': [text for text, _ in options],
+            'correct_answer': [i for i, (_, correct) in enumerate(options) if correct]
+        }
+    
+    def _cloze_short(self, course: CourseIndex, ref: str) -> Optional[dict]:
+        cloze = self._cloze(course, ref)
+        if cloze is None:
+            return None
+        statement, _, surface = cloze
+        return {
+            'question': f"Fill in the missing term ({course.concepts[ref].title}):\n\n\"{statement}\"",
+            'expected_answer': surface
+        }
+    
+    def _explain(self, course: CourseIndex, ref: str) -> Optional[dict]:
+        concept = course.concepts[ref]
+        if not concept.content:
+            return None
+        return {
+            'question': f"Explain {concept.title} in your own words.",
+            'expected_answer': ' '.join(concept.content)
+        }
+    
+    # ============ Helpers ============
+    
+    @staticmethod
+    def _title_terms(title: str) -> set:
+        return set(tokenize(title))
+    
+    def _cloze(self, course: CourseIndex, ref: str) -> Optional[Tuple[str, str, str]]:
+        """Blank out one of a statement's top keywords: (statement, term, word as written)"""
+        title_terms = self._title_terms(course.concepts[ref].title)
+        candidates = []
+        for sentence in course.sentences[ref]:
+            forms = term_forms(sentence)
+            for keyword in course.model.keywords(sentence, 3):
+                if keyword not in title_terms and len(forms.get(keyword, '')) >= 4:
+                    candidates.append((sentence, keyword, forms[keyword]))
+        if not candidates:
+            return None
+        
+        sentence, keyword, surface = self._choice(candidates)
+        statement = blank_terms(sentence, title_terms | {keyword})
+        return statement, keyword, surface
+    
+    def _distractor_statements(self, course: CourseIndex, ref: str, count: int) -> List[str]:
+        """Statements from the nearest other concepts, their own titles blanked"""
+        statements, seen = [], set(course.sentences[ref])
+        for neighbour_ref in course.neighbours_of(ref):
+            neighbour = course.concepts[neighbour_ref]
+            for sentence in course.sentences[neighbour_ref][:1]:
+                if sentence not in seen:
+                    seen.add(sentence)
+                    statements.append(blank_terms(sentence, self._title_terms(neighbour.title)))
+        # The closest neighbours make the hardest distractors; sample among a few more for variety
+        return self._sample(statements[:count + 2], count)
+    
+    def _choice(self, items: list):
+        with self._lock:
+            return self._random.choice(items)
+    
+    def _sample(self, items: list, count: int) -> list:
+        with self._lock:
+            return self._random.sample(items, min(count, len(items)))
+    
+    def _shuffled(self, correct: str, distractors: List[str]) -> Tuple[List[str], int]:
+        """Options with the correct one at a random position, and that position"""
+        options = [correct, *(d for d in distractors if d != correct)]
+        with self._lock:
+            self._random.shuffle(options)
+        return options, options.index(correct)
+    
+    def stats(self) -> dict:
+        """Get how many questions each template produced"""
+        with self._lock:
+            return {
+                'generated': sum(self.generated.values()),
+                'by_template': dict(self.generated),
+                'failed': self.failed,
+                'courses_indexed': self.index.builds
+            }
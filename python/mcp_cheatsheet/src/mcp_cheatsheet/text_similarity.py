@@ -0,0 +1,101 @@
+"""
+Lightweight text similarity
+Tokenizing, TF-IDF vectors and cosine similarity without external dependencies
+"""
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List
+
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being
+below between both but by can could did do does doing down during each either few for from further
+had has have having he her here hers him his how i if in into is it its itself just let like may me
+might more most must my no nor not now of off on once only or other our ours out over own same she
+should so some such than that the their theirs them then there these they this those through thus
+to too under until up upon us very was we were what when where which while who whom why will with
+would yet you your yours
+""".split())
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+_SUFFIXES = ('ations', 'ation', 'ings', 'ing', 'ies', 'ied', 'ers', 'er', 'es', 'ed', 'ly', 's')
+
+
+def stem(word: str) -> str:
+    """Strip a common English suffix so 'threads', 'threading' and 'thread' match"""
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            if suffix in ('ies', 'ied'):
+                return word[:-len(suffix)] + 'y'
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased, stemmed content words of a text (stopwords dropped)"""
+    words = _TOKEN.findall((text or '').lower())
+    return [stem(w.split("'")[0]) for w in words if w not in STOPWORDS and len(w) > 1]
+
+
+def term_forms(text: str) -> Dict[str, str]:
+    """Map each term tokenize() produces to the first word it came from"""
+    forms = {}
+    for word in _TOKEN.findall((text or '').lower()):
+        if word not in STOPWORDS and len(word) > 1:
+            forms.setdefault(stem(word.split("'")[0]), word)
+    return forms
+
+
+def cosine(a: Dict[str, float], b: Dict[str, float]) -> float:
+    """Cosine similarity of two sparse vectors"""
+    if not a or not b:
+        return 0.0
+    if len(a) > len(b):
+        a, b = b, a
+    dot = sum(weight * b.get(term, 0.0) for term, weight in a.items())
+    norm = math.sqrt(sum(w * w for w in a.values())) * math.sqrt(sum(w * w for w in b.values()))
+    return dot / norm if norm else 0.0
+
+
+class TfidfModel:
+    """
+    Inverse document frequencies fitted on a corpus of short texts
+    
+    Terms never seen in the corpus get the highest IDF, so rare words in
+    an answer still count.
+    """
+    
+    def __init__(self, documents: Iterable[str]):
+        """
+        Args:
+            documents: Corpus texts (e.g. every concept's title and content)
+        """
+        document_freq: Counter = Counter()
+        count = 0
+        for document in documents:
+            document_freq.update(set(tokenize(document)))
+            count += 1
+        self.documents = count
+        # Smoothed IDF, as in scikit-learn: ln((1 + n) / (1 + df)) + 1
+        self.idf = {
+            term: math.log((1 + count) / (1 + df)) + 1 for term, df in document_freq.items()
+        }
+        self.default_idf = math.log(1 + count) + 1
+    
+    def vector(self, text: str) -> Dict[str, float]:
+        """TF-IDF vector of a text (sublinear term frequency)"""
+        counts = Counter(tokenize(text))
+        return {
+            term: (1 + math.log(tf)) * self.idf.get(term, self.default_idf)
+            for term, tf in counts.items()
+        }
+    
+    def similarity(self, a: str, b: str) -> float:
+        """TF-IDF cosine similarity of two texts"""
+        return cosine(self.vector(a), self.vector(b))
+    
+    def keywords(self, text: str, limit: int = 5) -> List[str]:
+        """Highest-weighted terms of a text, best first"""
+        vector = self.vector(text)
+        return sorted(vector, key=lambda term: (-vector[term], term))[:limit]
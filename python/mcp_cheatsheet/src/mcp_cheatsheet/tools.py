@@ -1,11 +1,19 @@
 """
 11 MCP tools implementation for CheatSheet educational system
 """
-import requests
 import json
 import re
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional
+from .concept_index import ConceptIndex, concept_text
 from .database import Database
+from .job_queue import JobQueue
+from .llm_client import LLMClient, LLMError
+from .local_grader import LocalGrader
+from .prompt_builder import PromptBuilder
+from .quiz_bank import QuizBank, concept_hash
+from .rate_limit import BACKGROUND
+from .template_quiz import TemplateQuizGenerator
+from .text_similarity import TfidfModel
 from .models import (
     QuizQuestion, EvaluationResult, DecisionResult, ProgressEntry
 )
@@ -14,10 +22,38 @@ from .models import (
 class CheatSheetTools:
     """Implementation of 11 MCP tools for educational quiz system"""
     
-    def __init__(self, database: Database, api_key: str, openrouter_url: str):
+    def __init__(
+        self, 
+        database: Database, 
+        api_key: str, 
+        openrouter_url: str, 
+        prompt_token_budget: Optional[int] = None,
+        llm_client: Optional[LLMClient] = None,
+        quiz_bank: Optional[QuizBank] = None,
+        log_queue: Optional[JobQueue] = None,
+        grader: Optional[LocalGrader] = None,
+        quiz_templates: Optional[TemplateQuizGenerator] = None,
+        quiz_engine: str = 'llm',
+        concept_index: Optional[ConceptIndex] = None
+    ):
         self.db = database
         self.api_key = api_key
         self.openrouter_url = openrouter_url
+        self.llm = llm_client or LLMClient(api_key, openrouter_url)
+        self.prompt_token_budget = prompt_token_budget
+        self.prompt_builder = PromptBuilder(database)
+        self.quiz_bank = quiz_bank
+        self.log_queue = log_queue
+        if log_queue is not None:
+            log_queue.start(self._write_queued_log)
+        self.grader = grader
+        # Per-course TF-IDF models, shared by the local grader and the quiz templates
+        self.concept_index = concept_index or (
+            quiz_templates.index if quiz_templates is not None else ConceptIndex(database)
+        )
+        # 'llm': LLM first, templates when it fails; 'template': templates first
+        self.quiz_templates = quiz_templates
+        self.quiz_engine = quiz_engine
     
     # ============ Tool 1: distributeData ============
     
@@ -75,40 +111,21 @@ class CheatSheetTools:
     
     # ============ Tool 4: getSystemPrompt ============
     
-    def get_system_prompt(self) -> dict:
+    def get_system_prompt(self, token_budget: Optional[int] = None) -> dict:
         """
         Generate system prompt by resolving references from knowledge_distributed_map
         
+        Args:
+            token_budget: Approximate token limit for the payload (defaults to
+                the tools' prompt_token_budget; None means unlimited)
+        
         Returns:
-            System prompt with resolved TODAY, LONG_TERM, SHORT_TERM, and USER_PROFILE data
+            System prompt with resolved TODAY, LONG_TERM, SHORT_TERM, and USER_PROFILE data,
+            ranked and trimmed to the budget (see BUDGET for what was cut)
         """
-        db_data = self.db.load_db()
-        knowledge_map = self.db.load_knowledge_map()
-        
-        prompt_data = {
-            "TODAY": [],
-            "LONG_TERM": [],
-            "SHORT_TERM": [],
-            "USER_PROFILE": db_data.get('USER_PROFILE', {})
-        }
-        
-        # Resolve references for each category
-        for category, refs in [
-            ('TODAY', knowledge_map.today),
-            ('LONG_TERM', knowledge_map.long_term),
-            ('SHORT_TERM', knowledge_map.short_term)
-        ]:
-            for ref in refs:
-                concept = self.db.get_concept(ref)
-                if concept:
-                    prompt_data[category].append({
-                        'ref': ref,
-                        'title': concept.title,
-                        'content': concept.content,
-                        'freshness': concept.freshness
-                    })
-        
-        return prompt_data
+        if token_budget is None:
+            token_budget = self.prompt_token_budget
+        return self.prompt_builder.build(token_budget)
     
     # ============ Tool 5: evaluateAnswer ============
     
@@ -137,27 +154,125 @@ class CheatSheetTools:
                 feedback="Concept not found"
             )
         
+        # Clear-cut answers are graded locally; the LLM gets the rest
+        local = self._grade_locally(user_answer, concept_id, concept, correct_answer)
+        if local is not None:
+            return local
+        
         # Use LLM for evaluation
         return self._evaluate_with_llm(user_answer, concept)
     
+    def _grade_locally(
+        self, 
+        user_answer: str, 
+        concept_ref: str, 
+        concept, 
+        expected_answer: any = None
+    ) -> Optional[EvaluationResult]:
+        """Local fast-path grade, or None if there is no grader or the answer needs the LLM"""
+        if self.grader is None:
+            return None
+        result = self.grader.grade(
+            self._get_text_model(concept_ref, concept),
+            user_answer,
+            concept.title,
+            concept.content or [],
+            expected_answer if isinstance(expected_answer, str) else None
+        )
+        if result is not None:
+            print(f"[GRADER] Graded locally: score {result.score}, correct: {result.is_correct}")
+        return result
+    
+    def _get_text_model(self, concept_ref: str, concept) -> TfidfModel:
+        """TF-IDF model of the concept's course (refitted by ConceptIndex when the course changes)"""
+        course = self.concept_index.for_concept(concept_ref)
+        if course is not None:
+            return course.model
+        return TfidfModel([concept_text(concept)])
+    
     def _evaluate_with_llm(self, user_answer: str, concept) -> EvaluationResult:
         """Evaluate answer using LLM"""
         try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            content_str = concept.content[0] if concept.content else ""
-            
-            messages = [
-                {
-                    "role": "system",
-                    "content": "You are an educational assessment AI. Evaluate student answers and provide constructive feedback."
-                },
-                {
-                    "role": "user",
-                    "content": f"""Evaluate this student answer:
+            payload = self._evaluation_payload(user_answer, concept)
+            content = self.llm.complete(payload, tool='evaluate')
+            return self._parse_evaluation(content)
+        
+        except Exception as e:
+            return EvaluationResult(
+                score=50,
+                is_correct=False,
+                feedback=f"Evaluation error: {str(e)}"
+            )
+    
+    def stream_evaluation(
+        self, 
+        user_answer: str, 
+        concept_id: str, 
+        expected_answer: Optional[str] = None
+    ) -> Iterator[tuple]:
+        """
+        Streaming variant of evaluate_answer
+        
+        The evaluation JSON puts feedback last, so its text is forwarded
+        while the model is still writing it.
+        
+        Args:
+            user_answer: User's submitted answer
+            concept_id: ID of the concept being tested
+            expected_answer: The quiz's expected answer, if known
+        
+        Yields:
+            ('feedback', delta) as the feedback text arrives, then
+            ('result', EvaluationResult) once the response is complete
+        """
+        concept = self.db.get_concept(concept_id)
+        if not concept:
+            result = EvaluationResult(score=0, is_correct=False, feedback="Concept not found")
+            yield ('feedback', result.feedback)
+            yield ('result', result)
+            return
+        
+        local = self._grade_locally(user_answer, concept_id, concept, expected_answer)
+        if local is not None:
+            yield ('feedback', local.feedback)
+            yield ('result', local)
+            return
+        
+        content = ''
+        streamed = ''
+        try:
+            payload = self._evaluation_payload(user_answer, concept)
+            for delta in self.llm.stream(payload, tool='evaluate'):
+                content += delta
+                feedback = self._partial_json_string(content, 'feedback')
+                if len(feedback) > len(streamed):
+                    yield ('feedback', feedback[len(streamed):])
+                    streamed = feedback
+            result = self._parse_evaluation(content)
+        except Exception as e:
+            result = EvaluationResult(
+                score=50,
+                is_correct=False,
+                feedback=f"Evaluation error: {str(e)}"
+            )
+        
+        if not streamed:
+            yield ('feedback', result.feedback)
+        elif result.feedback.startswith(streamed) and result.feedback != streamed:
+            yield ('feedback', result.feedback[len(streamed):])
+        yield ('result', result)
+    
+    def _evaluation_payload(self, user_answer: str, concept) -> dict:
+        content_str = concept.content[0] if concept.content else ""
+        
+        messages = [
+            {
+                "role": "system",
+                "content": "You are an educational assessment AI. Evaluate student answers and provide constructive feedback."
+            },
+            {
+                "role": "user",
+                "content": f"""Evaluate this student answer:
 
 Concept: {concept.title}
 Expected Understanding: {content_str}
@@ -170,40 +285,71 @@ Provide a JSON response with:
     "is_correct": <true/false>,
     "feedback": "<brief feedback>"
 }}"""
-                }
-            ]
-            
-            payload = {
-                "model": "openai/gpt-4o",
-                "messages": messages,
-                "temperature": 0.3
             }
-            
-            response = requests.post(self.openrouter_url, headers=headers, json=payload)
-            
-            if response.status_code == 200:
-                result = response.json()
-                content = result.get('choices', [{}])[0].get('message', {}).get('content', '')
-                
-                # Parse JSON from response
-                json_match = re.search(r'\{.*\}', content, re.DOTALL)
-                if json_match:
-                    eval_data = json.loads(json_match.group(0))
-                    return EvaluationResult.from_dict(eval_data)
-            
-            # Fallback
-            return EvaluationResult(
-                score=50,
-                is_correct=False,
-                feedback="Unable to evaluate answer"
-            )
-            
-        except Exception as e:
-            return EvaluationResult(
-                score=50,
-                is_correct=False,
-                feedback=f"Evaluation error: {str(e)}"
-            )
+        ]
+        
+        return {
+            "messages": messages
+        }
+    
+    @staticmethod
+    def _parse_evaluation(content: str) -> EvaluationResult:
+        # Parse JSON from response
+        json_match = re.search(r'\{.*\}', content, re.DOTALL)
+        if json_match:
+            eval_data = json.loads(json_match.group(0))
+            return EvaluationResult.from_dict(eval_data)
+        
+        # Fallback
+        return EvaluationResult(
+            score=50,
+            is_correct=False,
+            feedback="Unable to evaluate answer"
+        )
+    
+    @staticmethod
+    def _partial_json_string(text: str, field: str) -> str:
+        """
+        Decode as much of a JSON string field as has arrived so far
+        
+        Args:
+            text: Possibly incomplete JSON text
+            field: Name of a string-valued field
+        
+        Returns:
+            The field's decoded value up to the last complete character
+            ('' if the field hasn't started yet)
+        """
+        match = re.search(r'"' + re.escape(field) + r'"\s*:\s*"', text)
+        if not match:
+            return ''
+        
+        escapes = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+        out = []
+        i = match.end()
+        while i < len(text):
+            ch = text[i]
+            if ch == '"':
+                break
+            if ch != '\\':
+                out.append(ch)
+                i += 1
+                continue
+            if i + 1 >= len(text):
+                break  # escape split across deltas
+            code = text[i + 1]
+            if code == 'u':
+                if i + 6 > len(text):
+                    break
+                try:
+                    out.append(chr(int(text[i + 2:i + 6], 16)))
+                except ValueError:
+                    pass
+                i += 6
+            else:
+                out.append(escapes.get(code, code))
+                i += 2
+        return ''.join(out)
     
     # ============ Tool 6: updateFreshnessAndLog ============
     
@@ -215,22 +361,27 @@ Provide a JSON response with:
         """
         Update freshness score and log in cur_progress.json
         
+        With a log queue, only the freshness is updated here; the log entry
+        is generated by a queue worker and appended when it is ready.
+        
         Args:
             concept_id: Concept reference
             evaluation_result: Result from evaluateAnswer
         """
-        # Get existing progress or create new
-        entry = self.db.get_progress_entry(concept_id)
+        def apply_freshness(current: Optional[ProgressEntry]) -> ProgressEntry:
+            return self._apply_score(current, evaluation_result.score)
         
-        if entry is None:
-            entry = ProgressEntry(
-                freshness=evaluation_result.score / 100.0,
-                log=[]
-            )
-        else:
-            # Average with previous freshness
-            new_freshness = evaluation_result.score / 100.0
-            entry.freshness = (entry.freshness + new_freshness) / 2
+        if self.log_queue is not None:
+            entry = self.db.modify_progress_entry(concept_id, apply_freshness)
+            self.log_queue.submit({
+                'concept_id': concept_id,
+                'evaluation': evaluation_result.to_dict(),
+                'progress': entry.to_dict()  # snapshot used as LLM context
+            })
+            return
+        
+        # Get existing progress or create new (snapshot used as LLM context)
+        entry = apply_freshness(self.db.get_progress_entry(concept_id))
         
         # Generate intelligent log entry using LLM
         log_entry = self._generate_intelligent_log(
@@ -238,10 +389,51 @@ Provide a JSON response with:
             evaluation_result, 
             entry
         )
-        entry.log.append(log_entry)
         
-        # Save updated progress
-        self.db.update_progress(concept_id, entry)
+        # Re-apply against the latest stored entry so updates made by other
+        # workers while the log was generated are not lost
+        def apply_update(current: Optional[ProgressEntry]) -> ProgressEntry:
+            current = apply_freshness(current)
+            current.log.append(log_entry)
+            return current
+        
+        self.db.modify_progress_entry(concept_id, apply_update)
+    
+    @staticmethod
+    def _apply_score(current: Optional[ProgressEntry], score: int) -> ProgressEntry:
+        """Fold a new score into a progress entry's freshness"""
+        new_freshness = score / 100.0
+        if current is None:
+            return ProgressEntry(freshness=new_freshness, log=[])
+        # Average with previous freshness
+        current.freshness = (current.freshness + new_freshness) / 2
+        return current
+    
+    def _write_queued_log(self, job: dict, final: bool):
+        """
+        Log queue handler: generate a log entry and append it
+        
+        Raises LLMError (so the job is retried) unless this is the final
+        attempt, which falls back to the simple log.
+        """
+        concept_id = job['concept_id']
+        evaluation_result = EvaluationResult.from_dict(job['evaluation'])
+        snapshot = ProgressEntry.from_dict(job['progress'])
+        
+        log_entry = self._generate_intelligent_log(
+            concept_id,
+            evaluation_result,
+            snapshot,
+            fallback=final
+        )
+        
+        def append_log(current: Optional[ProgressEntry]) -> ProgressEntry:
+            if current is None:
+                current = ProgressEntry(freshness=snapshot.freshness, log=[])
+            current.log.append(log_entry)
+            return current
+        
+        self.db.modify_progress_entry(concept_id, append_log)
     
     def _generate_instant_feedback(
         self,
@@ -261,16 +453,39 @@ Provide a JSON response with:
             Brief, encouraging feedback string (1-2 sentences)
         """
         try:
-            concept_title = concept.get('title', '')
-            concept_content = concept.get('content', [''])[0] if isinstance(concept.get('content'), list) else concept.get('content', '')
-            
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            if is_correct:
-                prompt = f"""Generate brief, encouraging feedback (1-2 sentences, max 30 words) for a student who answered correctly.
+            payload = self._instant_feedback_payload(concept, is_correct, user_answer)
+            feedback = self.llm.complete(payload, tool='instant_feedback').strip()
+            feedback = feedback.strip('"').strip()
+            print(f"[FEEDBACK] Generated: {feedback}")
+            return feedback
+        
+        except Exception as e:
+            print(f"[FEEDBACK] Error generating feedback: {e}")
+        
+        return self._fallback_feedback(is_correct)
+    
+    def stream_instant_feedback(
+        self,
+        concept: dict,
+        is_correct: bool,
+        user_answer: str
+    ) -> Iterator[str]:
+        """
+        Streaming variant of _generate_instant_feedback
+        
+        Yields:
+            Feedback text deltas as the LLM produces them (the fallback text
+            if the call fails before the first token)
+        """
+        payload = self._instant_feedback_payload(concept, is_correct, user_answer)
+        yield from self._stream_or_fallback(payload, 'instant_feedback', self._fallback_feedback(is_correct))
+    
+    def _instant_feedback_payload(self, concept: dict, is_correct: bool, user_answer: str) -> dict:
+        concept_title = concept.get('title', '')
+        concept_content = concept.get('content', [''])[0] if isinstance(concept.get('content'), list) else concept.get('content', '')
+        
+        if is_correct:
+            prompt = f"""Generate brief, encouraging feedback (1-2 sentences, max 30 words) for a student who answered correctly.
 
 Concept: {concept_title}
 Description: {concept_content}
@@ -278,8 +493,8 @@ Description: {concept_content}
 Acknowledge their understanding and optionally mention a key insight they demonstrated.
 
 Your feedback:"""
-            else:
-                prompt = f"""Generate brief, constructive feedback (1-2 sentences, max 30 words) for a student who answered incorrectly.
+        else:
+            prompt = f"""Generate brief, constructive feedback (1-2 sentences, max 30 words) for a student who answered incorrectly.
 
 Concept: {concept_title}
 Description: {concept_content}
@@ -288,45 +503,46 @@ Their answer: {user_answer}
 Be encouraging and hint at what to review, without giving away the full answer.
 
 Your feedback:"""
-
-            messages = [
-                {
-                    "role": "system",
-                    "content": "You are a supportive educational AI that provides concise, actionable feedback."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ]
-            
-            payload = {
-                "model": "openai/gpt-4o",
-                "messages": messages,
-                "temperature": 0.7,
-                "max_tokens": 80
+        
+        messages = [
+            {
+                "role": "system",
+                "content": "You are a supportive educational AI that provides concise, actionable feedback."
+            },
+            {
+                "role": "user",
+                "content": prompt
             }
-            
-            response = requests.post(self.openrouter_url, headers=headers, json=payload)
-            
-            if response.status_code == 200:
-                result = response.json()
-                feedback = result.get('choices', [{}])[0].get('message', {}).get('content', '').strip()
-                feedback = feedback.strip('"').strip()
-                print(f"[FEEDBACK] Generated: {feedback}")
-                return feedback
-                
-        except Exception as e:
-            print(f"[FEEDBACK] Error generating feedback: {e}")
+        ]
         
-        # Fallback
+        return {
+            "messages": messages
+        }
+    
+    @staticmethod
+    def _fallback_feedback(is_correct: bool) -> str:
         return "Great job!" if is_correct else "Not quite right. Review the concept and try to identify the key distinctions."
     
+    def _stream_or_fallback(self, payload: dict, tool: str, fallback: str) -> Iterator[str]:
+        """Yield an LLM stream, or the fallback text if it fails before any token"""
+        started = False
+        try:
+            for delta in self.llm.stream(payload, tool=tool):
+                started = True
+                yield delta
+        except LLMError as e:
+            print(f"[STREAM] {tool} stream failed: {e}")
+            if started:
+                return
+        if not started:
+            yield fallback
+    
     def _generate_intelligent_log(
         self,
         concept_id: str,
         evaluation_result: EvaluationResult,
-        progress_entry: ProgressEntry
+        progress_entry: ProgressEntry,
+        fallback: bool = True
     ) -> str:
         """
         Generate intelligent, context-aware log entry using LLM
@@ -335,9 +551,14 @@ Your feedback:"""
             concept_id: Concept reference
             evaluation_result: Current evaluation result
             progress_entry: Existing progress entry
+            fallback: Return a simple log if the LLM call fails (otherwise
+                the LLMError is raised)
         
         Returns:
             Detailed log entry string
+        
+        Raises:
+            LLMError: If the LLM call fails and fallback is False
         """
         try:
             # Get concept details
@@ -345,10 +566,6 @@ Your feedback:"""
             if not concept:
                 return f"[Score: {evaluation_result.score}] {evaluation_result.feedback}"
             
-            # Get related concepts from knowledge map
-            knowledge_map = self.db.load_knowledge_map()
-            db_data = self.db.load_db()
-            
             # Build context for LLM
             context = {
                 "concept_title": concept.title,
@@ -362,11 +579,6 @@ Your feedback:"""
             }
             
             # Call LLM to generate insightful log
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
             prompt = f"""As an educational AI tutor, analyze this student's learning progress and generate a concise, insightful log entry.
 
 Concept: {context['concept_title']}
@@ -393,7 +605,7 @@ Categories: [Concept], [Vocabulary], [Examples], [Mental Model], [Workflow], [Ha
 Example: "[Concept] Initially conflated concurrency with parallelism; after timeline + interleaving demo, can now define both distinctly but still occasionally says 'simultaneous' for concurrency."
 
 Your log entry:"""
-
+            
             messages = [
                 {
                     "role": "system",
@@ -406,32 +618,246 @@ Your log entry:"""
             ]
             
             payload = {
-                "model": "openai/gpt-4o",
-                "messages": messages,
-                "temperature": 0.7,
-                "max_tokens": 200
+                "messages": messages
             }
             
-            response = requests.post(self.openrouter_url, headers=headers, json=payload)
-            
-            if response.status_code == 200:
-                result = response.json()
-                log_content = result.get('choices', [{}])[0].get('message', {}).get('content', '').strip()
-                
+            try:
+                log_content = self.llm.complete(payload, tool='intelligent_log').strip()
+            except LLMError:
+                if not fallback:
+                    raise
+                print(f"[LOG] LLM call failed, using simple log")
+            else:
                 # Clean up the response (remove extra quotes, etc)
                 log_content = log_content.strip('"').strip()
                 
                 print(f"[LOG] Generated intelligent log: {log_content[:80]}...")
                 return log_content
-            else:
-                print(f"[LOG] LLM call failed, using simple log")
-                
+        
+        except LLMError:
+            raise
         except Exception as e:
             print(f"[LOG] Error generating intelligent log: {e}")
         
         # Fallback to simple log
         return f"[Score: {evaluation_result.score}] {evaluation_result.feedback}"
     
+    # ============ assessAnswer: evaluate + feedback + log in one call ============
+    
+    def assess_answer(
+        self, 
+        user_answer: str, 
+        concept_id: str, 
+        is_correct: Optional[bool] = None, 
+        expected_answer: Optional[str] = None
+    ) -> EvaluationResult:
+        """
+        Grade an answer, write feedback and the progress log in one LLM call
+        
+        Replaces evaluateAnswer (or instant feedback for choice questions)
+        followed by updateFreshnessAndLog. Progress is updated before
+        returning. If the combined call fails, the per-step tools are used.
+        Short answers the local grader resolves skip the LLM here; their
+        log goes through updateFreshnessAndLog.
+        
+        Args:
+            user_answer: User's submitted answer
+            concept_id: Concept reference
+            is_correct: Grade of a choice question (None to let the LLM
+                grade a short answer)
+            expected_answer: The short-answer quiz's expected answer, if known
+        
+        Returns:
+            Evaluation result with score, feedback, and is_correct flag
+        """
+        concept = self.db.get_concept(concept_id)
+        if not concept:
+            return EvaluationResult(score=0, is_correct=False, feedback="Concept not found")
+        
+        if is_correct is None:
+            local = self._grade_locally(user_answer, concept_id, concept, expected_answer)
+            if local is not None:
+                self.update_freshness_and_log(concept_id, local)
+                return local
+        
+        payload = self._assessment_payload(user_answer, concept, self.db.get_progress_entry(concept_id), is_correct)
+        try:
+            content = self.llm.complete(payload, tool='assessment')
+            evaluation, log_entry = self._parse_assessment(content, is_correct)
+        except (LLMError, ValueError) as e:
+            print(f"[ASSESS] Combined assessment failed ({e}); using per-step tools")
+            return self._assess_per_step(user_answer, concept_id, concept, is_correct)
+        
+        self._record_assessment(concept_id, evaluation, log_entry)
+        return evaluation
+    
+    def stream_assessment(
+        self, 
+        user_answer: str, 
+        concept_id: str, 
+        is_correct: Optional[bool] = None, 
+        expected_answer: Optional[str] = None
+    ) -> Iterator[tuple]:
+        """
+        Streaming variant of assess_answer
+        
+        Yields:
+            ('feedback', delta) as the feedback text arrives, then
+            ('result', EvaluationResult) once progress has been updated
+        """
+        concept = self.db.get_concept(concept_id)
+        if not concept:
+            result = EvaluationResult(score=0, is_correct=False, feedback="Concept not found")
+            yield ('feedback', result.feedback)
+            yield ('result', result)
+            return
+        
+        if is_correct is None:
+            local = self._grade_locally(user_answer, concept_id, concept, expected_answer)
+            if local is not None:
+                self.update_freshness_and_log(concept_id, local)
+                yield ('feedback', local.feedback)
+                yield ('result', local)
+                return
+        
+        payload = self._assessment_payload(user_answer, concept, self.db.get_progress_entry(concept_id), is_correct)
+        content = ''
+        streamed = ''
+        try:
+            for delta in self.llm.stream(payload, tool='assessment'):
+                content += delta
+                feedback = self._partial_json_string(content, 'feedback')
+                if len(feedback) > len(streamed):
+                    yield ('feedback', feedback[len(streamed):])
+                    streamed = feedback
+            evaluation, log_entry = self._parse_assessment(content, is_correct)
+        except (LLMError, ValueError) as e:
+            print(f"[ASSESS] Combined assessment failed ({e}); using per-step tools")
+            evaluation = self._assess_per_step(user_answer, concept_id, concept, is_correct)
+        else:
+            self._record_assessment(concept_id, evaluation, log_entry)
+        
+        if not streamed:
+            yield ('feedback', evaluation.feedback)
+        elif evaluation.feedback.startswith(streamed) and evaluation.feedback != streamed:
+            yield ('feedback', evaluation.feedback[len(streamed):])
+        yield ('result', evaluation)
+    
+    def _assessment_payload(
+        self, 
+        user_answer: str, 
+        concept, 
+        progress_entry: Optional[ProgressEntry], 
+        is_correct: Optional[bool]
+    ) -> dict:
+        content_str = concept.content[0] if concept.content else ""
+        previous_freshness = progress_entry.freshness if progress_entry else 0
+        attempt_count = len(progress_entry.log) if progress_entry else 0
+        previous_logs = progress_entry.log[-2:] if progress_entry else []
+        
+        if is_correct is None:
+            grading = "Grade the answer against the expected understanding."
+        else:
+            grading = (
+                f"This was a multiple-choice question and the answer has already been graded "
+                f"as {'CORRECT' if is_correct else 'INCORRECT'}. Use that grade; do not re-grade it."
+            )
+        
+        prompt = f"""Assess this student answer.
+
+Concept: {concept.title}
+Expected Understanding: {content_str}
+
+Student Answer: {user_answer}
+{grading}
+
+Learning History:
+- Previous Freshness: {previous_freshness:.2f}
+- Attempt #: {attempt_count + 1}
+- Recent Progress: {previous_logs}
+
+Provide a JSON response with exactly these fields, in this order:
+{{
+    "score": <0-100>,
+    "is_correct": <true/false>,
+    "feedback": "<1-2 sentences (max 30 words) for the student: encouraging if correct, a hint at what to review if not, without giving away the full answer>",
+    "log": "<single-line tutor log entry (60-100 words): [Category] what the student understands or misunderstands, patterns across attempts, and next steps>"
+}}
+
+Log categories: [Concept], [Vocabulary], [Examples], [Mental Model], [Workflow], [Habits], [Pitfall], [Recognition], [Next]"""
+        
+        messages = [
+            {
+                "role": "system",
+                "content": "You are an educational assessment AI. Grade student answers, give concise feedback and keep actionable learning logs."
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+        
+        return {
+            "messages": messages
+        }
+    
+    @staticmethod
+    def _parse_assessment(content: str, is_correct: Optional[bool]) -> tuple:
+        """
+        Split a combined assessment into an EvaluationResult and a log line
+        
+        Raises:
+            ValueError: If the response holds no JSON object
+        """
+        json_match = re.search(r'\{.*\}', content, re.DOTALL)
+        if not json_match:
+            raise ValueError("no JSON object in assessment response")
+        data = json.loads(json_match.group(0))
+        
+        if is_correct is not None:
+            # Choice questions are graded client-side; the LLM only writes text
+            data['is_correct'] = is_correct
+            data['score'] = 100 if is_correct else 0
+        evaluation = EvaluationResult.from_dict(data)
+        evaluation.feedback = str(evaluation.feedback).strip().strip('"').strip()
+        
+        log_entry = str(data.get('log') or '').strip().strip('"').strip()
+        if not log_entry:
+            log_entry = f"[Score: {evaluation.score}] {evaluation.feedback}"
+        return evaluation, log_entry
+    
+    def _record_assessment(self, concept_id: str, evaluation: EvaluationResult, log_entry: str):
+        """Update freshness and append the log line in one progress write"""
+        def apply_update(current: Optional[ProgressEntry]) -> ProgressEntry:
+            current = self._apply_score(current, evaluation.score)
+            current.log.append(log_entry)
+            return current
+        
+        self.db.modify_progress_entry(concept_id, apply_update)
+        print(f"[ASSESS] {concept_id}: score {evaluation.score}, log: {log_entry[:80]}...")
+    
+    def _assess_per_step(
+        self, 
+        user_answer: str, 
+        concept_id: str, 
+        concept, 
+        is_correct: Optional[bool]
+    ) -> EvaluationResult:
+        """Fallback: the separate evaluate/feedback and updateFreshnessAndLog tools"""
+        if is_correct is None:
+            evaluation = self._evaluate_with_llm(user_answer, concept)
+        else:
+            feedback = self._generate_instant_feedback(
+                {'title': concept.title, 'content': concept.content}, is_correct, user_answer
+            )
+            evaluation = EvaluationResult(
+                score=100 if is_correct else 0,
+                is_correct=is_correct,
+                feedback=feedback
+            )
+        self.update_freshness_and_log(concept_id, evaluation)
+        return evaluation
+    
     # ============ Tool 7: decideNext ============
     
     def decide_next(self, cur_progress: dict) -> DecisionResult:
@@ -509,6 +935,46 @@ Your log entry:"""
             "explanation": f"This concept covers {concept.title}. {content_str}"
         }
     
+    def stream_explaination(self, concept_id: str) -> Iterator[str]:
+        """
+        Stream an LLM-written explanation of a concept
+        
+        Args:
+            concept_id: Concept reference
+        
+        Yields:
+            Explanation text deltas (the generate_explaination() recap if
+            the LLM call fails before the first token)
+        """
+        concept = self.db.get_concept(concept_id)
+        fallback = self.generate_explaination(concept_id)['explanation']
+        if not concept:
+            yield fallback
+            return
+        
+        content_str = '\n'.join(concept.content) if concept.content else ""
+        prompt = f"""Explain the following concept to a student reviewing for an exam (3-5 sentences).
+Start with the core idea, then give one concrete example. Use plain text, no markdown.
+
+Concept: {concept.title}
+Notes: {content_str}
+
+Your explanation:"""
+        
+        payload = {
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "You are a patient tutor who explains concepts clearly and concisely."
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ]
+        }
+        yield from self._stream_or_fallback(payload, 'explanation', fallback)
+    
     # ============ Tool 9: generateQue_singleChoice ============
     
     def generate_que_single_choice(self, concept_id: str) -> Optional[QuizQuestion]:
@@ -551,24 +1017,265 @@ Your log entry:"""
         """
         return self._generate_quiz(concept_id, 'short_answer')
     
+    # ============ Batched Quiz Generation ============
+    
+    def generate_quiz_batch(self, requests: List[tuple]) -> List[Optional[QuizQuestion]]:
+        """
+        Create quizzes for several concepts with one LLM call
+        
+        Items the quiz bank can serve are taken from it; the rest are asked
+        for in a single completion returning a JSON array. Each returned
+        item is validated on its own, and only items that are missing or
+        malformed are regenerated one by one.
+        
+        Args:
+            requests: (concept_ref, quiz_type) pairs
+        
+        Returns:
+            Quiz questions in request order (None where a concept is missing)
+        """
+        if self.quiz_engine == 'template':
+            # Templates are local and instant: nothing to batch
+            return [self._generate_quiz(ref, quiz_type) for ref, quiz_type in requests]
+        
+        concepts = self.db.get_concepts([ref for ref, _ in requests])
+        results: List[Optional[QuizQuestion]] = [None] * len(requests)
+        
+        pending = []  # indexes still needing a question
+        from_bank = 0
+        for i, (ref, quiz_type) in enumerate(requests):
+            concept = concepts.get(ref)
+            if not concept:
+                continue
+            if self.quiz_bank is not None:
+                stored = self.quiz_bank.take(ref, quiz_type, concept_hash(concept))
+                if stored is not None and self._valid_quiz_data(stored, quiz_type):
+                    self._refill_quiz_bank(ref, quiz_type, concept_hash(concept))
+                    results[i] = self._quiz_from_data(stored, ref, quiz_type, concept)
+                    from_bank += 1
+                    continue
+            pending.append(i)
+        
+        generated = self._request_quiz_batch(
+            [(requests[i][0], requests[i][1], concepts[requests[i][0]]) for i in pending]
+        ) if pending else []
+        
+        retried = 0
+        for i, quiz in zip(pending, generated):
+            ref, quiz_type = requests[i]
+            if quiz is None:
+                # Invalid or missing in the batch reply: fall back to a single call
+                retried += 1
+                results[i] = self._generate_quiz(ref, quiz_type)
+                continue
+            if self.quiz_bank is not None:
+                content_hash = concept_hash(concepts[ref])
+                self.quiz_bank.add(ref, quiz_type, content_hash, quiz.to_dict(), served=True)
+                self._refill_quiz_bank(ref, quiz_type, content_hash)
+            results[i] = quiz
+        
+        print(f"[QUIZ_BATCH] {len(requests)} requested, {from_bank} from bank, "
+              f"{len(pending) - retried} from one batch call, {retried} retried singly")
+        return results
+    
+    def _request_quiz_batch(self, items: List[tuple]) -> List[Optional[QuizQuestion]]:
+        """
+        Generate quizzes for (concept_ref, quiz_type, concept) items in one call
+        
+        Returns:
+            One entry per item: the quiz, or None if that item was not valid
+        """
+        formats = {
+            'single_choice': '"options": [4 strings], "correct_answer": <index 0-3> '
+                             '(exactly one option is correct; the others are plausible but incorrect)',
+            'multi_choice': '"options": [4 strings], "correct_answer": [<indices of correct options>] '
+                            '(2-3 options are correct)',
+            'short_answer': '"expected_answer": "<expected answer>" (the question should test deep understanding)'
+        }
+        
+        concept_lines = []
+        for n, (ref, quiz_type, concept) in enumerate(items):
+            content_str = concept.content[0] if concept.content else ""
+            concept_lines.append(f"""[{n}] type: {quiz_type}
+Title: {concept.title}
+Content: {content_str}""")
+        
+        concepts_text = "\n\n".join(concept_lines)
+        prompt = f"""Create one quiz question for each of these {len(items)} concepts:
+
+{concepts_text}
+
+Return a JSON array with exactly {len(items)} objects, in the same order. Each object has:
+- "index": the concept's number in brackets
+- "question": the question text
+- for single_choice: {formats['single_choice']}
+- for multi_choice: {formats['multi_choice']}
+- for short_answer: {formats['short_answer']}"""
+        
+        messages = [
+            {
+                "role": "system",
+                "content": "You are an educational quiz generator. Create high-quality assessment questions."
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+        
+        payload = {
+            "messages": messages
+        }
+        
+        results: List[Optional[QuizQuestion]] = [None] * len(items)
+        try:
+            content = self.llm.complete(payload, tool='quiz_batch')
+            json_match = re.search(r'\[.*\]', content, re.DOTALL)
+            quiz_list = json.loads(json_match.group(0)) if json_match else []
+        except (LLMError, json.JSONDecodeError) as e:
+            print(f"[QUIZ_BATCH] Batch request failed: {e}")
+            return results
+        
+        if not isinstance(quiz_list, list):
+            return results
+        
+        for position, quiz_data in enumerate(quiz_list):
+            if not isinstance(quiz_data, dict):
+                continue
+            n = quiz_data.get('index', position)
+            if not isinstance(n, int) or not 0 <= n < len(items) or results[n] is not None:
+                continue
+            ref, quiz_type, concept = items[n]
+            if self._valid_quiz_data(quiz_data, quiz_type):
+                results[n] = self._quiz_from_data(quiz_data, ref, quiz_type, concept)
+        return results
+    
+    @staticmethod
+    def _valid_quiz_data(quiz_data: dict, quiz_type: str) -> bool:
+        """Check one generated quiz item has the fields its type needs"""
+        question = quiz_data.get('question')
+        if not isinstance(question, str) or not question.strip():
+            return False
+        
+        if quiz_type == 'short_answer':
+            expected = quiz_data.get('expected_answer')
+            return isinstance(expected, str) and bool(expected.strip())
+        
+        options = quiz_data.get('options')
+        if not isinstance(options, list) or len(options) < 2 or not all(isinstance(o, str) for o in options):
+            return False
+        answer = quiz_data.get('correct_answer')
+        if quiz_type == 'single_choice':
+            return isinstance(answer, int) and not isinstance(answer, bool) and 0 <= answer < len(options)
+        return (isinstance(answer, list) and len(answer) > 0
+                and all(isinstance(a, int) and not isinstance(a, bool) and 0 <= a < len(options) for a in answer))
+    
+    @staticmethod
+    def _quiz_from_data(quiz_data: dict, concept_ref: str, quiz_type: str, concept) -> QuizQuestion:
+        return QuizQuestion(
+            question_type=quiz_type,
+            question=quiz_data.get('question', ''),
+            options=quiz_data.get('options'),
+            correct_answer=quiz_data.get('correct_answer'),
+            expected_answer=quiz_data.get('expected_answer'),
+            concept_ref=concept_ref,
+            concept=concept.to_dict()
+        )
+    
     # ============ Helper Method for Quiz Generation ============
     
     def _generate_quiz(self, concept_ref: str, quiz_type: str) -> Optional[QuizQuestion]:
-        """Generate quiz using LLM"""
+        """
+        Serve a quiz from the quiz bank, generating one with the LLM on a miss
+        
+        With the 'template' engine a template question is tried first. If the
+        LLM fails, a template question is used before the last-resort
+        "What is ...?" question.
+        """
         concept = self.db.get_concept(concept_ref)
         if not concept:
             return None
         
         try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
+            if self.quiz_engine == 'template':
+                quiz = self._template_quiz(concept, concept_ref, quiz_type)
+                if quiz is not None:
+                    return quiz
             
-            content_str = concept.content[0] if concept.content else ""
+            content_hash = concept_hash(concept)
+            if self.quiz_bank is not None:
+                stored = self.quiz_bank.take(concept_ref, quiz_type, content_hash)
+                # Banks written before quizzes were validated may hold malformed ones
+                if stored is not None and self._valid_quiz_data(stored, quiz_type):
+                    print(f"[QUIZ_BANK] Served {quiz_type} quiz for {concept_ref} from the bank")
+                    self._refill_quiz_bank(concept_ref, quiz_type, content_hash)
+                    return self._quiz_from_data(stored, concept_ref, quiz_type, concept)
+            
+            # Bypass the response cache when banking: a cached reply would repeat a banked variant
+            quiz = self._request_quiz(concept, concept_ref, quiz_type, cache=self.quiz_bank is None)
+            if quiz is not None:
+                if self.quiz_bank is not None:
+                    self.quiz_bank.add(concept_ref, quiz_type, content_hash, quiz.to_dict(), served=True)
+                    self._refill_quiz_bank(concept_ref, quiz_type, content_hash)
+                return quiz
             
-            if quiz_type == 'single_choice':
-                prompt = f"""Create a single-choice quiz question for this concept:
+            if self.quiz_engine != 'template':
+                quiz = self._template_quiz(concept, concept_ref, quiz_type)
+                if quiz is not None:
+                    return quiz
+            
+            # Fallback: simple question
+            content_str = concept.content[0] if concept.content else ""
+            print(f"[DEBUG] Using fallback quiz for {concept.title}")
+            return QuizQuestion(
+                question_type=quiz_type,
+                question=f"What is {concept.title}?",
+                options=[content_str, "Incorrect answer", "Another wrong answer", "Not this one"] if quiz_type != 'short_answer' else None,
+                correct_answer=0 if quiz_type == 'single_choice' else ([0] if quiz_type == 'multi_choice' else content_str),
+                expected_answer=content_str if quiz_type == 'short_answer' else None,
+                concept_ref=concept_ref,
+                concept=concept.to_dict()
+            )
+        
+        except Exception as e:
+            print(f"Error generating quiz: {e}")
+            return None
+    
+    def _template_quiz(self, concept, concept_ref: str, quiz_type: str) -> Optional[QuizQuestion]:
+        """Build a quiz from the concept text with no LLM call (None if no template fits)"""
+        if self.quiz_templates is None:
+            return None
+        quiz_data = self.quiz_templates.generate(concept_ref, quiz_type)
+        if quiz_data is None or not self._valid_quiz_data(quiz_data, quiz_type):
+            return None
+        print(f"[QUIZ_TEMPLATE] Built {quiz_type} quiz for {concept_ref} from templates")
+        return self._quiz_from_data(quiz_data, concept_ref, quiz_type, concept)
+    
+    def _refill_quiz_bank(self, concept_ref: str, quiz_type: str, content_hash: str):
+        """Top up the bank's unseen variants for a key in the background"""
+        def generate():
+            concept = self.db.get_concept(concept_ref)
+            if not concept or concept_hash(concept) != content_hash:
+                return None
+            # Bypass the response cache: every variant must be a new question
+            with self.llm.priority(BACKGROUND):
+                quiz = self._request_quiz(concept, concept_ref, quiz_type, cache=False)
+            return quiz.to_dict() if quiz else None
+        
+        self.quiz_bank.refill(concept_ref, quiz_type, content_hash, generate)
+    
+    def _request_quiz(
+        self, 
+        concept, 
+        concept_ref: str, 
+        quiz_type: str, 
+        cache: bool = True
+    ) -> Optional[QuizQuestion]:
+        """Generate a quiz with the LLM (None if the call or parsing fails)"""
+        content_str = concept.content[0] if concept.content else ""
+        
+        if quiz_type == 'single_choice':
+            prompt = f"""Create a single-choice quiz question for this concept:
 
 Title: {concept.title}
 Content: {content_str}
@@ -581,9 +1288,9 @@ Generate a JSON response with:
 }}
 
 Make sure one option is clearly correct and others are plausible but incorrect."""
-
-            elif quiz_type == 'multi_choice':
-                prompt = f"""Create a multiple-choice quiz question for this concept:
+        
+        elif quiz_type == 'multi_choice':
+            prompt = f"""Create a multiple-choice quiz question for this concept:
 
 Title: {concept.title}
 Content: {content_str}
@@ -596,9 +1303,9 @@ Generate a JSON response with:
 }}
 
 Make sure 2-3 options are correct and others are incorrect."""
-
-            else:  # short_answer
-                prompt = f"""Create a short-answer quiz question for this concept:
+        
+        else:  # short_answer
+            prompt = f"""Create a short-answer quiz question for this concept:
 
 Title: {concept.title}
 Content: {content_str}
@@ -610,67 +1317,47 @@ Generate a JSON response with:
 }}
 
 The question should test deep understanding."""
-
-            messages = [
-                {
-                    "role": "system",
-                    "content": "You are an educational quiz generator. Create high-quality assessment questions."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ]
-            
-            payload = {
-                "model": "openai/gpt-4o",
-                "messages": messages,
-                "temperature": 0.7
+        
+        messages = [
+            {
+                "role": "system",
+                "content": "You are an educational quiz generator. Create high-quality assessment questions."
+            },
+            {
+                "role": "user",
+                "content": prompt
             }
-            
-            response = requests.post(self.openrouter_url, headers=headers, json=payload)
-            
-            if response.status_code == 200:
-                result = response.json()
-                content = result.get('choices', [{}])[0].get('message', {}).get('content', '')
-                
-                print(f"\n[DEBUG] LLM Response for {quiz_type}:")
-                print(f"Content: {content[:200]}...")  # Print first 200 chars
-                
-                # Parse JSON from response
-                json_match = re.search(r'\{.*\}', content, re.DOTALL)
-                if json_match:
-                    quiz_data = json.loads(json_match.group(0))
-                    print(f"[DEBUG] Successfully parsed quiz data")
-                    
-                    return QuizQuestion(
-                        question_type=quiz_type,
-                        question=quiz_data.get('question', ''),
-                        options=quiz_data.get('options'),
-                        correct_answer=quiz_data.get('correct_answer'),
-                        expected_answer=quiz_data.get('expected_answer'),
-                        concept_ref=concept_ref,
-                        concept=concept.to_dict()
-                    )
-                else:
-                    print(f"[DEBUG] Failed to parse JSON from response")
-            else:
-                print(f"[DEBUG] API request failed with status: {response.status_code}")
-                print(f"[DEBUG] Response: {response.text[:200]}")
-            
-            # Fallback: simple question
-            print(f"[DEBUG] Using fallback quiz for {concept.title}")
-            return QuizQuestion(
-                question_type=quiz_type,
-                question=f"What is {concept.title}?",
-                options=[content_str, "Incorrect answer", "Another wrong answer", "Not this one"] if quiz_type != 'short_answer' else None,
-                correct_answer=0 if quiz_type == 'single_choice' else ([0] if quiz_type == 'multi_choice' else content_str),
-                expected_answer=content_str if quiz_type == 'short_answer' else None,
-                concept_ref=concept_ref,
-                concept=concept.to_dict()
-            )
-            
-        except Exception as e:
-            print(f"Error generating quiz: {e}")
+        ]
+        
+        payload = {
+            "messages": messages
+        }
+        
+        try:
+            content = self.llm.complete(payload, tool='quiz', cache=cache)
+        except LLMError as e:
+            print(f"[DEBUG] API request failed with status: {e.status_code}")
+            print(f"[DEBUG] Response: {e.body[:200]}")
+            return None
+        
+        print(f"\n[DEBUG] LLM Response for {quiz_type}:")
+        print(f"Content: {content[:200]}...")  # Print first 200 chars
+        
+        # Parse JSON from response
+        json_match = re.search(r'\{.*\}', content, re.DOTALL)
+        if not json_match:
+            print(f"[DEBUG] Failed to parse JSON from response")
+            return None
+        
+        try:
+            quiz_data = json.loads(json_match.group(0))
+        except json.JSONDecodeError as e:
+            print(f"[DEBUG] Failed to parse JSON from response: {e}")
+            return None
+        if not isinstance(quiz_data, dict) or not self._valid_quiz_data(quiz_data, quiz_type):
+            print(f"[DEBUG] Generated {quiz_type} quiz is missing fields, discarding it")
             return None
+        print(f"[DEBUG] Successfully parsed quiz data")
+        
+        return self._quiz_from_data(quiz_data, concept_ref, quiz_type, concept)
 
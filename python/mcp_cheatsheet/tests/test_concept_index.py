@@ -0,0 +1,108 @@
+"""
+Concept index: per-course models follow concept edits, and local grading uses them
+"""
+import random
+import time
+
+import pytest
+
+from mcp_cheatsheet.concept_index import ConceptIndex, CourseIndex
+from mcp_cheatsheet.database import Database
+from mcp_cheatsheet.local_grader import LocalGrader
+from mcp_cheatsheet.models import Concept, ProgressEntry
+from mcp_cheatsheet.sqlite_database import SQLiteDatabase
+from mcp_cheatsheet.tools import CheatSheetTools
+
+
+REF = 'COURSES/CS101/cs101-001'
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def db(request, tmp_path):
+    if request.param == 'sqlite':
+        return SQLiteDatabase(str(tmp_path / 'cheatsheet.db'))
+    return Database(str(tmp_path), cached=True)
+
+
+def add(db, concept_id, title, content):
+    db.add_concept('CS101', Concept(concept_id, title, content, '2025-01-11T10:00:00Z'))
+
+
+def test_index_is_reused_until_the_course_changes(db):
+    add(db, 'cs101-001', 'Stack', ['A stack is a last in first out collection.'])
+    add(db, 'cs101-002', 'Queue', ['A queue is a first in first out collection.'])
+    index = ConceptIndex(db)
+    
+    first = index.for_concept(REF)
+    assert index.for_concept(REF) is first
+    assert index.builds == 1
+    
+    # Editing a concept (no refs added or removed) refits the course model
+    course = db.get_course('CS101')
+    course.concepts['cs101-002'].content = ['A queue serves elements in arrival order.']
+    db.save_course(course)
+    refitted = index.for_concept(REF)
+    assert refitted is not first
+    assert 'arrival' in refitted.model.idf
+    assert index.builds == 2
+    
+    assert index.for_concept('COURSES/CS101/missing') is None
+    assert index.for_concept('COURSES/OTHER/x') is None
+
+
+def test_progress_writes_do_not_recheck_the_course(db, monkeypatch):
+    add(db, 'cs101-001', 'Stack', ['A stack is a last in first out collection.'])
+    index = ConceptIndex(db)
+    first = index.for_concept(REF)
+    
+    reads = []
+    get_course = db.get_course
+    monkeypatch.setattr(db, 'get_course', lambda name: reads.append(name) or get_course(name))
+    db.update_progress(REF, ProgressEntry(freshness=0.5, log=['reviewed']))
+    assert index.for_concept(REF) is first
+    assert reads == []
+    
+    add(db, 'cs101-002', 'Queue', ['A queue is a first in first out collection.'])
+    assert index.for_concept(REF) is not first
+    assert reads == ['CS101']
+
+
+def test_local_grader_uses_the_course_model(db):
+    add(db, 'cs101-001', 'Stack', ['A stack is a last in first out collection.'])
+    add(db, 'cs101-002', 'Queue', ['A queue is a first in first out collection.'])
+    tools = CheatSheetTools(db, 'key', 'http://llm.invalid', grader=LocalGrader())
+    
+    concept = db.get_concept(REF)
+    assert tools._get_text_model(REF, concept) is tools.concept_index.for_concept(REF).model
+    
+    result = tools._grade_locally('last in first out', REF, concept, 'last in first out')
+    assert result is not None and result.is_correct
+
+
+def test_neighbours_of_a_large_course_are_fast():
+    rng = random.Random(7)
+    vocabulary = [f'term{i}' for i in range(4000)]
+    concepts = {}
+    for i in range(3000):
+        words = rng.sample(vocabulary, 30)
+        concepts[f'c{i:04d}'] = Concept(f'c{i:04d}', ' '.join(words[:2]), [' '.join(words) + '.'], '')
+    
+    start = time.perf_counter()
+    course = CourseIndex('BIG', concepts)
+    for ref in ('c0000', 'c1500', 'c2999'):
+        neighbours = course.neighbours_of(ref)
+        assert len(neighbours) == course.neighbour_count
+        assert ref not in neighbours
+    assert time.perf_counter() - start < 5.0
+    assert course.neighbours_of('c2999') is neighbours  # cached
+
+
+def test_neighbours_rank_shared_terms_first():
+    course = CourseIndex('CS101', {
+        'a': Concept('a', 'Stack', ['A stack pushes and pops elements.'], ''),
+        'b': Concept('b', 'Call stack', ['The call stack pushes frames and pops them on return.'], ''),
+        'c': Concept('c', 'Graph', ['A graph has vertices and edges.'], ''),
+    }, neighbours=2)
+    
+    assert course.neighbours_of('a') == ['b', 'c']
+    assert course.neighbours_of('missing') == []
@@ -0,0 +1,258 @@
+"""
+Parity tests: the JSON and SQLite backends run through the same scenarios
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from mcp_cheatsheet.database import Database
+from mcp_cheatsheet.models import Concept, ProgressEntry
+from mcp_cheatsheet.sqlite_database import SQLiteDatabase
+
+
+BACKENDS = ('json', 'json_cached', 'json_journaled', 'sqlite')
+
+
+@pytest.fixture(params=BACKENDS)
+def db(request, tmp_path):
+    if request.param == 'sqlite':
+        database = SQLiteDatabase(str(tmp_path / 'cheatsheet.db'))
+        yield database
+        database.close()
+    else:
+        yield Database(
+            str(tmp_path),
+            cached=request.param == 'json_cached',
+            journaled=request.param == 'json_journaled'
+        )
+
+
+def iso(days_ago: float = 0) -> str:
+    moment = datetime.now(timezone.utc) - timedelta(days=days_ago)
+    return moment.replace(tzinfo=None).isoformat() + 'Z'
+
+
+def concept(concept_id: str, title: str, days_ago: float = 0, timestamp: str = None) -> Concept:
+    return Concept(
+        concept_id=concept_id,
+        title=title,
+        content=[f"{title} explained.", "Second line."],
+        timestamp=timestamp if timestamp is not None else iso(days_ago)
+    )
+
+
+# ============ Concepts ============
+
+def test_add_and_get_concept(db):
+    assert db.add_concept('CS101', concept('cs101-001', 'Recursion'))
+    
+    fetched = db.get_concept('COURSES/CS101/cs101-001')
+    assert fetched.title == 'Recursion'
+    assert fetched.content == ['Recursion explained.', 'Second line.']
+    assert db.get_concept('COURSES/CS101/missing') is None
+    assert db.get_concept('not-a-ref') is None
+    
+    assert db.course_exists('CS101')
+    assert db.get_courses() == ['CS101']
+    assert list(db.get_course('CS101').concepts) == ['cs101-001']
+    assert db.get_all_concepts_refs() == ['COURSES/CS101/cs101-001']
+
+
+def test_get_concepts_keeps_input_order(db):
+    db.add_concept('CS101', concept('cs101-001', 'Recursion'))
+    db.add_concept('MATH', concept('math-001', 'Limits'))
+    
+    refs = ['COURSES/MATH/math-001', 'COURSES/CS101/missing', 'COURSES/CS101/cs101-001']
+    resolved = db.get_concepts(refs)
+    assert list(resolved) == ['COURSES/MATH/math-001', 'COURSES/CS101/cs101-001']
+    assert resolved['COURSES/MATH/math-001'].title == 'Limits'
+
+
+def test_duplicate_titles(db):
+    assert db.add_concept('CS101', concept('cs101-001', 'Binary Search'))
+    assert not db.add_concept('CS101', concept('cs101-002', '  binary SEARCH '))
+    assert db.check_duplicate('CS101', 'BINARY SEARCH')
+    assert not db.check_duplicate('MATH', 'Binary Search')
+    # The same title is fine in another course
+    assert db.add_concept('MATH', concept('math-001', 'Binary Search'))
+
+
+def test_add_concepts_batch(db):
+    db.add_concept('CS101', concept('cs101-001', 'Recursion'))
+    
+    results = db.add_concepts('CS101', [
+        {'title': 'Stacks', 'content': ['LIFO']},
+        {'title': 'recursion', 'content': ['again']},
+        {'title': '', 'content': ['no title']},
+        {'title': 'Stacks', 'content': ['twice in one batch']},
+        {'title': 'Queues', 'content': 'FIFO'},
+    ], timestamp='2025-01-11T10:00:00Z')
+    
+    assert [r['status'] for r in results] == ['added', 'skipped', 'skipped', 'skipped', 'added']
+    assert [r.get('reason') for r in results if r['status'] == 'skipped'] == \
+        ['duplicate', 'missing title', 'duplicate']
+    added = [r['concept_id'] for r in results if r['status'] == 'added']
+    assert len(set(added)) == 2
+    assert db.get_concept(f"COURSES/CS101/{added[1]}").content == ['FIFO']
+
+
+def test_all_duplicate_batch_leaves_no_course(db):
+    db.add_concept('CS101', concept('cs101-001', 'Recursion'))
+    results = db.add_concepts('NEW', [{'title': ''}])
+    assert results[0]['status'] == 'skipped'
+    assert not db.course_exists('NEW')
+
+
+def test_failed_write_leaves_cached_document_unchanged(tmp_path, monkeypatch):
+    db = Database(str(tmp_path), cached=True)
+    db.add_concept('CS101', concept('cs101-001', 'Recursion'))
+    
+    def fail(path, data):
+        raise OSError('disk full')
+    monkeypatch.setattr('mcp_cheatsheet.database.atomic_write_json', fail)
+    with pytest.raises(OSError):
+        db.add_concepts('CS101', [{'title': 'Stacks', 'content': ['LIFO']}], timestamp='2025-01-11T10:00:00Z')
+    with pytest.raises(OSError):
+        db.add_concept('CS101', concept('cs101-002', 'Queues'))
+    with pytest.raises(OSError):
+        db.add_concept('NEW', concept('new-001', 'Graphs'))
+    
+    assert db.get_all_concepts_refs() == ['COURSES/CS101/cs101-001']
+    assert db.get_courses() == ['CS101']
+    assert not db.check_duplicate('CS101', 'Stacks')
+
+
+def test_generate_concept_id_continues_sequence(db):
+    timestamp = '2025-01-11T10:00:00Z'
+    first = db.generate_concept_id('CS101', timestamp)
+    db.add_concept('CS101', concept(first, 'Recursion', timestamp=timestamp))
+    second = db.generate_concept_id('CS101', timestamp)
+    assert first != second
+    assert second.rsplit('-', 1)[0] == first.rsplit('-', 1)[0]
+    assert int(second.rsplit('-', 1)[1]) == int(first.rsplit('-', 1)[1]) + 1
+
+
+def test_malformed_timestamp_does_not_abort_insert(db):
+    assert db.add_concept('CS101', concept('cs101-001', 'Broken', timestamp='not-a-date'))
+    assert db.add_concept('CS101', concept('cs101-002', 'Fine', days_ago=0))
+    
+    assert db.get_concept('COURSES/CS101/cs101-001').timestamp == 'not-a-date'
+    knowledge_map = db.distribute_knowledge()
+    assert knowledge_map.today == ['COURSES/CS101/cs101-002']
+    assert 'COURSES/CS101/cs101-001' not in knowledge_map.short_term + knowledge_map.long_term
+
+
+# ============ Progress ============
+
+def test_progress_updates(db):
+    ref = 'COURSES/CS101/cs101-001'
+    assert db.get_progress_entry(ref) is None
+    
+    db.update_progress(ref, ProgressEntry(freshness=0.5, log=['first']))
+    entry = db.get_progress_entry(ref)
+    assert entry.freshness == 0.5
+    assert entry.log == ['first']
+    
+    # A full update replaces the log rather than appending to it
+    db.update_progress(ref, ProgressEntry(freshness=0.7, log=['rewritten']))
+    assert db.get_progress_entry(ref).log == ['rewritten']
+    assert db.load_progress() == {'AI_FEEDBACK': {ref: {'freshness': 0.7, 'log': ['rewritten']}}}
+
+
+def test_log_appends(db):
+    ref = 'COURSES/CS101/cs101-001'
+    
+    def append(line, freshness):
+        def updater(entry):
+            entry = entry or ProgressEntry(freshness=0.0, log=[])
+            return ProgressEntry(freshness=freshness, log=entry.log + [line])
+        return updater
+    
+    db.modify_progress_entry(ref, append('one', 0.2))
+    db.modify_progress_entry(ref, append('two', 0.4))
+    entry = db.modify_progress_entry(ref, append('three', 0.6))
+    
+    assert entry.log == ['one', 'two', 'three']
+    stored = db.get_progress_entry(ref)
+    assert stored.freshness == 0.6
+    assert stored.log == ['one', 'two', 'three']
+    
+    # An updater that drops lines is a rewrite, not an append
+    db.modify_progress_entry(ref, lambda e: ProgressEntry(freshness=0.1, log=e.log[-1:]))
+    assert db.get_progress_entry(ref).log == ['three']
+
+
+def test_save_and_load_progress_document(db):
+    progress = {'AI_FEEDBACK': {
+        'COURSES/CS101/a': {'freshness': 0.3, 'log': ['x', 'y']},
+        'COURSES/CS101/b': {'freshness': 0.9, 'log': []},
+    }}
+    db.save_progress(progress)
+    assert db.load_progress() == progress
+
+
+# ============ Knowledge Map ============
+
+def test_knowledge_map_buckets(db):
+    db.add_concept('CS101', concept('cs101-001', 'Today', days_ago=0.1))
+    db.add_concept('CS101', concept('cs101-002', 'Last week', days_ago=7))
+    db.add_concept('MATH', concept('math-001', 'Last year', days_ago=365))
+    db.add_concept('MATH', concept('math-002', 'Last month', days_ago=20))
+    
+    knowledge_map = db.distribute_knowledge()
+    assert knowledge_map.today == ['COURSES/CS101/cs101-001']
+    assert sorted(knowledge_map.short_term) == ['COURSES/CS101/cs101-002', 'COURSES/MATH/math-002']
+    assert knowledge_map.long_term == ['COURSES/MATH/math-001']
+    
+    # The distribution is persisted
+    assert db.load_knowledge_map() == knowledge_map
+
+
+def test_knowledge_map_order_matches_across_backends(tmp_path):
+    tie = iso(10)
+    steps = [
+        ('CS101', concept('cs101-001', 'Old', days_ago=400)),
+        ('MATH', concept('math-001', 'Tie in second course', timestamp=tie)),
+        ('CS101', concept('cs101-002', 'Tie in first course', timestamp=tie)),
+        ('MATH', concept('math-002', 'Tomorrow', days_ago=-1)),
+        ('CS101', concept('cs101-003', 'Future', days_ago=-3)),
+        ('MATH', concept('math-003', 'Earlier today', days_ago=0.5)),
+        ('CS101', concept('cs101-004', 'Just now', days_ago=0.01)),
+        ('MATH', concept('math-004', 'Last month', days_ago=25)),
+        ('CS101', concept('cs101-005', 'Ancient', days_ago=900)),
+        ('MATH', concept('math-005', 'No timestamp', timestamp='')),
+    ]
+    (tmp_path / 'json').mkdir()
+    (tmp_path / 'json_cached').mkdir()
+    backends = [
+        Database(str(tmp_path / 'json')),
+        Database(str(tmp_path / 'json_cached'), cached=True),
+        SQLiteDatabase(str(tmp_path / 'cheatsheet.db')),
+    ]
+    maps = []
+    for database in backends:
+        database.distribute_knowledge()  # built indexes are then updated in place
+        for course_name, c in steps:
+            database.add_concept(course_name, c)
+        maps.append(database.distribute_knowledge())
+    # A fresh JSON instance rebuilds its index from db.json
+    maps.append(Database(str(tmp_path / 'json_cached'), cached=True).distribute_knowledge())
+    
+    assert maps[0].today == ['COURSES/MATH/math-003', 'COURSES/CS101/cs101-004']
+    assert maps[0].short_term == [
+        'COURSES/MATH/math-004', 'COURSES/CS101/cs101-002', 'COURSES/MATH/math-001',
+        'COURSES/MATH/math-002', 'COURSES/CS101/cs101-003',
+    ]
+    assert maps[0].long_term == ['COURSES/CS101/cs101-005', 'COURSES/CS101/cs101-001']
+    for knowledge_map in maps[1:]:
+        assert knowledge_map == maps[0]
+
+
+def test_knowledge_map_follows_new_concepts(db):
+    db.add_concept('CS101', concept('cs101-001', 'Old', days_ago=90))
+    assert db.distribute_knowledge().today == []
+    
+    db.add_concept('CS101', concept('cs101-002', 'New', days_ago=0))
+    knowledge_map = db.distribute_knowledge()
+    assert knowledge_map.today == ['COURSES/CS101/cs101-002']
+    assert knowledge_map.long_term == ['COURSES/CS101/cs101-001']
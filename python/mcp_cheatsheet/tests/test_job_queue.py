@@ -0,0 +1,92 @@
+"""
+Job queue: leases keep processes sharing a job file from running a job twice
+"""
+import threading
+import time
+
+from mcp_cheatsheet.job_queue import JobQueue
+
+
+def test_jobs_run_once_across_queues(tmp_path):
+    path = str(tmp_path / 'jobs.json')
+    seen = []
+    seen_lock = threading.Lock()
+    
+    def handler(payload, final):
+        time.sleep(0.01)
+        with seen_lock:
+            seen.append(payload['n'])
+    
+    first = JobQueue(path, workers=2)
+    first.start(handler)
+    for n in range(20):
+        first.submit({'n': n})
+    
+    # A second process starting over the same file leaves leased jobs alone
+    second = JobQueue(path, workers=2)
+    second.start(handler)
+    
+    assert first.flush(timeout=10) and second.flush(timeout=10)
+    first.close()
+    second.close()
+    assert sorted(seen) == list(range(20))
+    assert first.stats()['pending'] == 0
+
+
+def test_expired_lease_is_reclaimed(tmp_path):
+    path = str(tmp_path / 'jobs.json')
+    stalled = JobQueue(path, lease=0.2)
+    stalled.submit({'n': 1})  # never started, like a process that died mid-job
+    
+    seen = []
+    other = JobQueue(path, lease=0.2)
+    other.start(lambda payload, final: seen.append(payload['n']))
+    assert other.stats()['replayed'] == 0  # still leased to the first queue
+    
+    deadline = time.monotonic() + 5
+    while not seen and time.monotonic() < deadline:
+        time.sleep(0.05)
+    other.flush(timeout=5)
+    other.close()
+    assert seen == [1]
+
+
+def test_close_releases_waiting_retries(tmp_path):
+    path = str(tmp_path / 'jobs.json')
+    
+    def failing(payload, final):
+        raise RuntimeError('provider down')
+    
+    first = JobQueue(path, retry_delay=60)
+    first.start(failing)
+    first.submit({'n': 1})
+    first.flush(timeout=5)
+    first.close()
+    
+    seen = []
+    second = JobQueue(path)
+    second.start(lambda payload, final: seen.append(payload['n']))
+    second.flush(timeout=5)
+    second.close()
+    assert seen == [1]
+
+
+def test_finished_jobs_are_deleted_in_batches(tmp_path):
+    path = str(tmp_path / 'jobs.json')
+    queue = JobQueue(path, workers=2)
+    writes = []
+    save = queue._save
+    queue._save = lambda doc: writes.append(len(doc['JOBS'])) or save(doc)
+    
+    gate = threading.Event()
+    queue.start(lambda payload, final: gate.wait(5))
+    for n in range(40):
+        queue.submit({'n': n})
+    assert len(writes) == 40  # one write per submit, none to claim
+    
+    gate.set()
+    assert queue.flush(timeout=10)
+    assert len(writes) <= 40 + 40 // JobQueue.DELETE_BATCH + 2
+    assert writes[-1] == 0
+    assert queue.stats()['pending'] == 0
+    queue.close()
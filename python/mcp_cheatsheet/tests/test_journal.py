@@ -0,0 +1,68 @@
+"""
+Progress journal: replay, compaction and migration of uncompacted records
+"""
+from mcp_cheatsheet.database import Database
+from mcp_cheatsheet.migrate import migrate_json_to_sqlite
+from mcp_cheatsheet.models import ProgressEntry
+from mcp_cheatsheet.sqlite_database import SQLiteDatabase
+
+
+REF = 'COURSES/CS101/cs101-001'
+
+
+def append_line(db, line, freshness):
+    def updater(entry):
+        entry = entry or ProgressEntry(freshness=0.0, log=[])
+        return ProgressEntry(freshness=freshness, log=entry.log + [line])
+    return db.modify_progress_entry(REF, updater)
+
+
+def test_loaded_documents_are_not_mutated_by_later_records(tmp_path):
+    db = Database(str(tmp_path), journaled=True)
+    db.update_progress(REF, ProgressEntry(freshness=0.1, log=['one']))
+    before = db.load_progress()
+    
+    append_line(db, 'two', 0.2)
+    assert before['AI_FEEDBACK'][REF] == {'freshness': 0.1, 'log': ['one']}
+    assert db.load_progress()['AI_FEEDBACK'][REF] == {'freshness': 0.2, 'log': ['one', 'two']}
+    
+    # Copies handed out can't corrupt the journal state
+    db.get_progress_entry(REF).log.append('stray')
+    assert db.get_progress_entry(REF).log == ['one', 'two']
+
+
+def test_other_process_replays_journal(tmp_path):
+    writer = Database(str(tmp_path), journaled=True)
+    reader = Database(str(tmp_path), journaled=True)
+    
+    writer.update_progress(REF, ProgressEntry(freshness=0.1, log=['one']))
+    assert reader.get_progress_entry(REF).log == ['one']
+    append_line(writer, 'two', 0.3)
+    assert reader.get_progress_entry(REF).log == ['one', 'two']
+    
+    writer.journal.compact()
+    append_line(writer, 'three', 0.5)
+    entry = reader.get_progress_entry(REF)
+    assert entry.log == ['one', 'two', 'three']
+    assert entry.freshness == 0.5
+    assert reader.journal.seq == writer.journal.seq == 3
+
+
+def test_migration_includes_uncompacted_journal(tmp_path):
+    db = Database(str(tmp_path), journaled=True)
+    db.update_progress(REF, ProgressEntry(freshness=0.1, log=['one']))
+    append_line(db, 'two', 0.4)
+    assert db.journal.pending_records() == 2
+    
+    counts = migrate_json_to_sqlite(str(tmp_path))
+    assert counts['journal_seq'] == 2
+    assert counts['log_lines'] == 2
+    
+    target = SQLiteDatabase(counts['sqlite_path'])
+    entry = target.get_progress_entry(REF)
+    assert entry.log == ['one', 'two']
+    assert entry.freshness == 0.4
+    target.close()
+    
+    # The journal was folded into cur_progress.json
+    assert Database(str(tmp_path)).get_progress_entry(REF).log == ['one', 'two']
@@ -0,0 +1,67 @@
+"""
+LLM client: malformed 200 responses and stream errors surface as LLMError
+"""
+import pytest
+import requests
+
+from mcp_cheatsheet.circuit_breaker import CircuitBreaker
+from mcp_cheatsheet.llm_client import LLMClient, LLMError
+
+
+def response(body: str, status: int = 200) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = status
+    resp._content = body.encode('utf-8')
+    resp.encoding = 'utf-8'
+    resp._content_consumed = True  # lets iter_lines() read _content
+    return resp
+
+
+@pytest.fixture
+def client(monkeypatch):
+    llm = LLMClient('key', 'http://llm.invalid/v1/chat/completions', breaker=CircuitBreaker(failure_threshold=2))
+    replies = []
+    monkeypatch.setattr(llm, 'post', lambda payload, tool='default', **kwargs: replies.pop(0))
+    llm.replies = replies
+    return llm
+
+
+@pytest.mark.parametrize('body', [
+    '<html><body>Bad gateway</body></html>',
+    '{"choices": [{"message": {"content": "trunc',
+    '{"choices": []}',
+    '{"id": "gen-1"}',
+    '[]',
+    '{"error": {"message": "Upstream overloaded", "code": 502}}',
+])
+def test_malformed_completion_raises_llm_error(client, body):
+    client.replies.append(response(body))
+    with pytest.raises(LLMError) as excinfo:
+        client.complete({'messages': []}, tool='quiz', cache=False)
+    assert excinfo.value.status_code == 200
+
+
+def test_malformed_completions_trip_the_breaker(client):
+    client.replies.extend([response('<html>'), response('<html>')])
+    for _ in range(2):
+        with pytest.raises(LLMError):
+            client.complete({'messages': []}, tool='quiz', cache=False)
+    assert client.breaker.state == 'open'
+
+
+def test_well_formed_completion(client):
+    client.replies.append(response(
+        '{"choices": [{"message": {"content": "Hello"}}], "usage": {"prompt_tokens": 3, "completion_tokens": 1}}'
+    ))
+    assert client.complete({'messages': []}, tool='quiz', cache=False) == 'Hello'
+    assert client.router.stats()['quiz']['prompt_tokens'] == 3
+
+
+@pytest.mark.parametrize('event', [
+    '{"error": "Upstream overloaded"}',
+    '{"error": {"message": "Upstream overloaded", "code": 502}}',
+])
+def test_stream_error_event_raises_llm_error(client, event):
+    client.replies.append(response(f"data: {event}\n\ndata: [DONE]\n\n"))
+    with pytest.raises(LLMError, match='Upstream overloaded'):
+        list(client.stream({'messages': []}, tool='explain', cache=False))
@@ -0,0 +1,87 @@
+"""
+Quiz bank: rotation through variants with batched served counters
+"""
+import json
+import os
+
+from mcp_cheatsheet.database import Database
+from mcp_cheatsheet.models import Concept, QuizQuestion
+from mcp_cheatsheet.quiz_bank import QuizBank
+from mcp_cheatsheet.tools import CheatSheetTools
+
+
+REF = 'COURSES/CS101/cs101-001'
+
+
+def quiz(n):
+    return {'question': f"Question {n}?", 'expected_answer': f"Answer {n}"}
+
+
+def test_take_rotates_without_rewriting_the_file(tmp_path):
+    path = str(tmp_path / 'quiz_bank.json')
+    bank = QuizBank(path, flush_every=100, flush_interval=3600)
+    for n in range(3):
+        bank.add(REF, 'short_answer', 'h1', quiz(n))
+    mtime = os.stat(path).st_mtime_ns
+    
+    served = [bank.take(REF, 'short_answer', 'h1')['question'] for _ in range(6)]
+    assert sorted(served[:3]) == ['Question 0?', 'Question 1?', 'Question 2?']
+    assert sorted(served[3:]) == sorted(served[:3])
+    assert os.stat(path).st_mtime_ns == mtime
+    assert bank.unseen(REF, 'short_answer') == 0
+    
+    bank.close()
+    with open(path, encoding='utf-8') as f:
+        variants = json.load(f)['BANK'][f"{REF}|short_answer"]['variants']
+    assert [v['served'] for v in variants] == [2, 2, 2]
+
+
+def test_counters_flush_in_batches(tmp_path):
+    path = str(tmp_path / 'quiz_bank.json')
+    bank = QuizBank(path, flush_every=4, flush_interval=3600)
+    bank.add(REF, 'short_answer', 'h1', quiz(0))
+    
+    for _ in range(4):
+        bank.take(REF, 'short_answer', 'h1')
+    assert bank.stats()['unflushed_serves'] == 0
+    assert QuizBank(path).stats()['hits'] == 0  # a fresh instance sees the written counts
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f)['BANK'][f"{REF}|short_answer"]['variants'][0]['served'] == 4
+
+
+def test_add_keeps_unflushed_serves(tmp_path):
+    path = str(tmp_path / 'quiz_bank.json')
+    bank = QuizBank(path, flush_every=100, flush_interval=3600)
+    bank.add(REF, 'short_answer', 'h1', quiz(0))
+    bank.take(REF, 'short_answer', 'h1')
+    bank.add(REF, 'short_answer', 'h1', quiz(1))
+    
+    # The new variant is served next, not the one already shown
+    assert bank.take(REF, 'short_answer', 'h1') == quiz(1)
+
+
+def test_edited_concept_drops_its_variants(tmp_path):
+    bank = QuizBank(str(tmp_path / 'quiz_bank.json'))
+    bank.add(REF, 'short_answer', 'h1', quiz(0))
+    assert bank.take(REF, 'short_answer', 'h2') is None
+    assert bank.take(REF, 'short_answer', 'h1') is None
+    assert bank.stats()['invalidations'] == 1
+
+
+def test_banked_quizzes_bypass_the_response_cache(tmp_path):
+    db = Database(str(tmp_path))
+    db.add_concept('CS101', Concept('cs101-001', 'Stack', ['A stack is last in first out.'], '2025-01-11T10:00:00Z'))
+    bank = QuizBank(str(tmp_path / 'quiz_bank.json'))
+    tools = CheatSheetTools(db, 'key', 'http://llm.invalid', quiz_bank=bank)
+    
+    requests = []
+    def request_quiz(concept, concept_ref, quiz_type, cache=True):
+        requests.append(cache)
+        return QuizQuestion(quiz_type, 'Question?', expected_answer='Answer', concept_ref=concept_ref)
+    tools._request_quiz = request_quiz
+    tools._refill_quiz_bank = lambda *args: None
+    
+    tools.generate_que_short_answer(REF)
+    assert requests == [False]
+    assert bank.unseen(REF, 'short_answer') == 0
+    bank.close()